@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""
+Benchmark lab generation and lab control at scale against a fake Docker socket.
+
+    python3 benchmarks/bench_lab.py --sizes 10,100,1000,5000 --output bench_output.json
+
+Each generate-lab.py phase is timed separately on synthetic fabric and
+random-mesh topologies; start-lab.py status and start/stop paths, and the
+Engine API paths (native deploy, partial bring-up, staged boot, removal), are
+timed against benchmarks/fake_docker.py. Results are written as JSON so runs
+can be compared between commits.
+"""
+
+import argparse
+import contextlib
+import importlib.util
+import io
+import json
+import os
+import platform
+import random
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import yaml
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import compose_yaml
+import deployer
+import docker_api
+import leases
+from boot_scheduler import BootScheduler
+from fake_docker import FakeDockerServer, Inventory
+from lab_state import LabState
+from topology import Topology
+
+
+def load_script(name, filename):
+    spec = importlib.util.spec_from_file_location(name, os.path.join(ROOT, filename))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def fabric(n):
+    """
+    Leaf/spine: every leaf has one uplink to every spine.
+    """
+    spines = max(2, min(8, n // 25))
+    conns = []
+    for leaf in range(1, n - spines + 1):
+        for spine in range(1, spines + 1):
+            conns.append({'device1': f'SPINE{spine}', 'intf1': f'Ethernet{leaf}',
+                          'device2': f'LEAF{leaf}', 'intf2': f'Ethernet{spine}'})
+    return conns
+
+
+def mesh(n, degree=3, seed=1):
+    """
+    Random connected mesh: a ring plus random chords, about `degree` links per device.
+    """
+    rng = random.Random(seed)
+    ports = [0] * n
+    conns = []
+
+    def connect(a, b):
+        ports[a] += 1
+        ports[b] += 1
+        conns.append({'device1': f'R{a}', 'intf1': f'Ethernet{ports[a]}',
+                      'device2': f'R{b}', 'intf2': f'Ethernet{ports[b]}'})
+
+    for i in range(n):
+        connect(i, (i + 1) % n)
+    for _ in range(max(0, n * degree // 2 - n)):
+        a, b = rng.sample(range(n), 2)
+        connect(a, b)
+    return conns
+
+
+SHAPES = {'fabric': fabric, 'mesh': mesh}
+
+
+class Timer:
+    def __init__(self):
+        self.phases = {}
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - t0
+
+
+def bench_generate(gen, shape, size, workdir):
+    topo_path = os.path.join(workdir, 'topology.yml')
+    with open(topo_path, 'w') as f:
+        yaml.safe_dump({'management_network': 'a-135', 'subnet_pool': '10.0.0.0/8', 'link_prefix': 29,
+                        'connections': SHAPES[shape](size)}, f, sort_keys=False)
+
+    timer = Timer()
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            with timer.phase('yaml_load'):
+                raw = compose_yaml.load_file(topo_path)
+            with timer.phase('validation'):
+                topology = Topology.compile(raw)
+            with timer.phase('docker_scan'):
+                networks = leases.docker_snapshot()
+            with timer.phase('subnet_allocation'):
+                leases.assign(topology, raw['subnet_pool'], networks)
+            with timer.phase('device_files'):
+                volume_paths, _ = gen.generate_device_files(topology, 'a-135', dry_run=False)
+            with timer.phase('compose_dump'):
+                gen.generate_compose(topology, 'a-135', volume_paths, 'ceos:4.34.1F', dry_run=False)
+    finally:
+        os.chdir(cwd)
+    return {'shape': shape, 'devices': len(topology.devices), 'links': len(topology.links),
+            'phases': timer.phases, 'total': sum(timer.phases.values())}
+
+
+def bench_control(lab, containers, project):
+    timer = Timer()
+    names = list(containers)
+    with contextlib.redirect_stdout(io.StringIO()):
+        with timer.phase('status_seed'):
+            state = LabState(project, status_file=os.devnull)
+            state.seed()
+        with timer.phase('status_render'):
+            lab.lab_status()
+        with timer.phase('stop_all'):
+            lab.run_parallel('stop', names, "stop")
+        with timer.phase('start_all'):
+            lab.run_parallel('start', names, "start")
+    return {'containers': len(names), 'jobs': lab.JOBS, 'phases': timer.phases}
+
+
+def bench_native(gen, lab, size):
+    """
+    Engine API paths in the current (lab) directory: native deploy, removing a
+    device and its neighbours and adding them back (partial bring-up), a staged
+    boot that waits for every device's ready exec, and removing the lab.
+    """
+    with open('topology.yml', 'w') as f:
+        yaml.safe_dump({'management_network': 'a-135', 'subnet_pool': '10.0.0.0/8', 'link_prefix': 29,
+                        'connections': mesh(size)}, f, sort_keys=False)
+    timer = Timer()
+    with contextlib.redirect_stdout(io.StringIO()):
+        raw = compose_yaml.load_file('topology.yml')
+        topology = Topology.compile(raw)
+        leases.assign(topology, raw['subnet_pool'], leases.docker_snapshot())
+        volume_paths, _ = gen.generate_device_files(topology, 'a-135', dry_run=False)
+        gen.generate_compose(topology, 'a-135', volume_paths, 'ceos:4.34.1F', dry_run=False)
+        project = lab.get_project_name()
+        # The event watcher outlives this directory: keep its status file out of the tree
+        lab._lab_state = LabState(project, status_file=os.devnull).start()
+
+        with timer.phase('deploy_native'):
+            lab.start_lab_native()
+        with timer.phase('partial_remove'):
+            lab.start_lab_partial('-R0+1')
+        with timer.phase('partial_add'):
+            lab.start_lab_partial('+R*')
+        containers = lab.compose_containers(project)
+        lab.run_parallel('stop', list(containers.values()), "stop")
+        with timer.phase('staged_boot'):
+            BootScheduler(containers, {}, config={'wave_size': lab.JOBS, 'device_memory_mb': 1,
+                                                  'max_load': float('inf')}).run()
+        with timer.phase('remove_all'):
+            deployer.Deployer(deployer.load_compose(), project, jobs=lab.JOBS).scale([])
+    return {'devices': len(topology.devices), 'links': len(topology.links), 'running': len(containers),
+            'phases': timer.phases}
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', '-C', ROOT, 'rev-parse', 'HEAD'], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def best_of(runs):
+    best = dict(runs[0])
+    best['phases'] = {k: min(r['phases'][k] for r in runs) for k in runs[0]['phases']}
+    if 'total' in best:
+        best['total'] = sum(best['phases'].values())
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark generate-lab.py and start-lab.py at scale.")
+    parser.add_argument('--sizes', default='10,100,1000,5000', help='Device counts (default: 10,100,1000,5000)')
+    parser.add_argument('--shapes', default='fabric,mesh', help='Topology shapes (default: fabric,mesh)')
+    parser.add_argument('--networks', type=int, default=250, help='Existing Docker networks (default: 250)')
+    parser.add_argument('--containers', type=int, default=30, help='Lab containers for control paths (default: 30)')
+    parser.add_argument('--latency', type=float, default=0.05, help='Fake seconds per start/stop (default: 0.05)')
+    parser.add_argument('--jobs', type=int, default=8, help='start-lab.py --jobs (default: 8)')
+    parser.add_argument('--repeat', type=int, default=1, help='Runs per case; the fastest is kept (default: 1)')
+    parser.add_argument('--output', default='bench_output.json', help='JSON results file')
+    args = parser.parse_args()
+
+    project = 'ceos-lab_docker'
+    socket_path = os.path.join(tempfile.mkdtemp(prefix='fake-docker-'), 'docker.sock')
+    inventory = Inventory(args.networks, args.containers, project, args.latency)
+    os.environ['DOCKER_HOST'] = f'unix://{socket_path}'
+    docker_api._client = None
+
+    report = {
+        'commit': git_commit(),
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'settings': vars(args),
+        'generate': [],
+        'control': None,
+        'native': None,
+    }
+
+    with FakeDockerServer(socket_path, inventory):
+        gen = load_script('generate_lab', 'generate-lab.py')
+        lab = load_script('start_lab', 'start-lab.py')
+        signal.signal(signal.SIGINT, signal.default_int_handler)
+        lab.JOBS = args.jobs
+
+        for shape in args.shapes.split(','):
+            for size in (int(s) for s in args.sizes.split(',')):
+                runs = []
+                for _ in range(args.repeat):
+                    with tempfile.TemporaryDirectory(prefix='bench-lab-') as workdir:
+                        runs.append(bench_generate(gen, shape, size, workdir))
+                result = best_of(runs)
+                report['generate'].append(result)
+                phases = "  ".join(f"{k}={v * 1000:.1f}ms" for k, v in result['phases'].items())
+                print(f"{shape:<7} {result['devices']:>5} devices {result['links']:>6} links  "
+                      f"total={result['total'] * 1000:.1f}ms  {phases}")
+
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory(prefix=project) as tmp:
+            labdir = os.path.join(tmp, project)
+            os.mkdir(labdir)
+            os.chdir(labdir)
+            try:
+                report['control'] = best_of([bench_control(lab, inventory.containers, project)
+                                             for _ in range(args.repeat)])
+            finally:
+                os.chdir(cwd)
+        phases = "  ".join(f"{k}={v * 1000:.1f}ms" for k, v in report['control']['phases'].items())
+        print(f"control {args.containers:>5} containers  {phases}")
+
+        runs = []
+        for _ in range(args.repeat):
+            with tempfile.TemporaryDirectory(prefix='bench-native-') as tmp:
+                labdir = os.path.join(tmp, 'bench-native')
+                os.mkdir(labdir)
+                os.chdir(labdir)
+                try:
+                    runs.append(bench_native(gen, lab, max(3, args.containers)))
+                finally:
+                    os.chdir(cwd)
+        report['native'] = best_of(runs)
+        phases = "  ".join(f"{k}={v * 1000:.1f}ms" for k, v in report['native']['phases'].items())
+        print(f"native  {report['native']['devices']:>5} devices     {phases}")
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"📄 Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+"""
+Fake Docker Engine API on a unix socket, for benchmarks and manual testing.
+
+    python3 benchmarks/fake_docker.py --socket /tmp/fake-docker.sock --networks 250 --containers 30
+    DOCKER_HOST=unix:///tmp/fake-docker.sock python3 start-lab.py
+"""
+
+import argparse
+import http.server
+import ipaddress
+import json
+import itertools
+import os
+import queue
+import re
+import socketserver
+import threading
+import time
+from datetime import datetime, timezone
+from urllib.parse import urlparse, parse_qs, unquote
+
+
+class Inventory:
+    """
+    Realistic host inventory: unrelated bridge networks, a macvlan management
+    network, one image and the containers of one compose project.
+
+    Containers answer exec once they have run for boot_time seconds (the ready
+    check), and every state change is published as a container event.
+    """
+
+    def __init__(self, networks=250, containers=30, project='ceos-lab_docker', action_latency=0.0,
+                 boot_time=0.0, api_version='1.48'):
+        self.action_latency = action_latency
+        self.boot_time = boot_time
+        self.api_version = api_version
+        self.lock = threading.Lock()
+        self.ids = itertools.count(max(networks, containers) + 1)
+        self.execs = {}          # exec id -> container name
+        self.history = []        # every event, for `since`
+        self.subscribers = []    # one queue per open /events stream
+        self.networks = [{
+            'Name': 'a-135', 'Id': f'{0:064x}', 'Driver': 'macvlan', 'Labels': {},
+            'Options': {'parent': 'eth0', 'macvlan_mode': 'private'},
+            'IPAM': {'Config': [{'Subnet': '192.168.150.0/24', 'Gateway': '192.168.150.1'}]},
+        }]
+        pool = ipaddress.ip_network('10.0.0.0/8').subnets(new_prefix=24)
+        for i in range(1, networks):
+            self.networks.append({
+                'Name': f'net{i:04d}', 'Id': f'{i:064x}', 'Driver': 'bridge', 'Labels': {}, 'Options': {},
+                'IPAM': {'Config': [{'Subnet': str(next(pool))}]},
+            })
+        self.containers = {}
+        for i in range(1, containers + 1):
+            service = f'DEV{i:04d}'
+            name = f'{project}-{service}-1'
+            self.containers[name] = {
+                'Id': f'{i:064x}', 'Names': [f'/{name}'], 'Image': 'ceos:4.34.1F', 'State': 'running',
+                'Status': 'Up 5 minutes', 'StartedAt': time.time() - 300,
+                'Labels': {'com.docker.compose.project': project, 'com.docker.compose.service': service},
+            }
+
+    def emit(self, name, action):
+        c = self.containers.get(name) or {'Labels': {}}
+        now = time.time()
+        event = {'Type': 'container', 'Action': action, 'status': action, 'id': c.get('Id', ''),
+                 'time': int(now), 'timeNano': int(now * 1e9),
+                 'Actor': {'ID': c.get('Id', ''), 'Attributes': dict(c['Labels'], name=name)}}
+        with self.lock:
+            self.history.append(event)
+            subscribers = list(self.subscribers)
+        for q in subscribers:
+            q.put(event)
+
+    @staticmethod
+    def event_matches(event, filters):
+        attrs = event['Actor']['Attributes']
+        labels = [label.split('=', 1) for label in filters.get('label', [])]
+        return ((not filters.get('type') or event['Type'] in filters['type'])
+                and all(attrs.get(k) == v for k, v in labels))
+
+    def ready(self, name):
+        c = self.containers.get(name)
+        return c is not None and c['State'] == 'running' and time.time() - c['StartedAt'] >= self.boot_time
+
+    def filtered_containers(self, filters):
+        names = filters.get('name', [])
+        labels = [label.split('=', 1) for label in filters.get('label', [])]
+        return [c for name, c in self.containers.items()
+                if (not names or any(n in name for n in names))
+                and all(c['Labels'].get(k) == v for k, v in labels)]
+
+    def filtered_networks(self, filters):
+        result = self.networks
+        if 'name' in filters:
+            result = [n for n in result if any(f in n['Name'] for f in filters['name'])]
+        if 'driver' in filters:
+            result = [n for n in result if n['Driver'] in filters['driver']]
+        return result
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, body=None):
+        data = b'' if body is None else (body if isinstance(body, bytes) else json.dumps(body).encode())
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        if data:
+            # An empty body is complete with the headers; the client may already have hung up
+            self.wfile.write(data)
+
+    def _parse(self):
+        url = urlparse(self.path)
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        filters = json.loads(query.get('filters', '{}'))
+        path = re.sub(r'^/v[\d.]+', '', url.path)
+        return path, query, filters
+
+    def do_GET(self):
+        inv = self.server.inventory
+        path, query, filters = self._parse()
+        if path == '/_ping':
+            return self._send(200, b'OK')
+        if path == '/version':
+            return self._send(200, {'Version': 'fake', 'ApiVersion': inv.api_version, 'MinAPIVersion': '1.24',
+                                    'Os': 'linux', 'Arch': 'amd64'})
+        if path == '/networks':
+            return self._send(200, inv.filtered_networks(filters))
+        if path == '/containers/json':
+            return self._send(200, inv.filtered_containers(filters))
+        if path == '/images/json':
+            return self._send(200, [{'Id': 'sha256:' + '0' * 64, 'RepoTags': ['ceos:4.34.1F']}])
+        m = re.match(r'^/containers/([^/]+)/json$', path)
+        if m:
+            c = inv.containers.get(unquote(m.group(1)))
+            if not c:
+                return self._send(404, {'message': 'No such container'})
+            started = datetime.fromtimestamp(c['StartedAt'], timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+            return self._send(200, {'Id': c['Id'], 'Name': c['Names'][0], 'Config': {'Labels': c['Labels']}, 'State': {
+                'Status': c['State'], 'Running': c['State'] == 'running', 'Pid': 0, 'StartedAt': started}})
+        m = re.match(r'^/exec/([^/]+)/json$', path)
+        if m:
+            name = inv.execs.get(m.group(1))
+            if name is None:
+                return self._send(404, {'message': 'No such exec instance'})
+            return self._send(200, {'ID': m.group(1), 'Running': False, 'ExitCode': 0 if inv.ready(name) else 1})
+        if path == '/events':
+            return self._events(inv, query, filters)
+        return self._send(404, {'message': f'page not found: {path}'})
+
+    def _events(self, inv, query, filters):
+        """
+        Stream past events since `since`, then new ones as they happen, as chunked JSON lines.
+        """
+        q = queue.Queue()
+        with inv.lock:
+            since = float(query['since']) if 'since' in query else None
+            backlog = [e for e in inv.history if since is not None and e['time'] >= since]
+            inv.subscribers.append(q)
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        try:
+            for event in backlog:
+                q.put(event)
+            while True:
+                event = q.get()
+                if Inventory.event_matches(event, filters):
+                    data = json.dumps(event).encode() + b'\n'
+                    self.wfile.write(b'%x\r\n%s\r\n' % (len(data), data))
+                    self.wfile.flush()
+        except OSError:
+            pass
+        finally:
+            with inv.lock:
+                inv.subscribers.remove(q)
+
+    def _body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return json.loads(self.rfile.read(length) or b'{}')
+
+    def do_POST(self):
+        inv = self.server.inventory
+        path, query, filters = self._parse()
+        body = self._body()
+        if path == '/networks/create':
+            with inv.lock:
+                if any(n['Name'] == body['Name'] for n in inv.networks):
+                    return self._send(409, {'message': f"network with name {body['Name']} already exists"})
+                net = {'Name': body['Name'], 'Id': f'{next(inv.ids):064x}', 'Driver': body.get('Driver', 'bridge'),
+                       'Labels': body.get('Labels') or {}, 'Options': body.get('Options') or {},
+                       'IPAM': {'Config': (body.get('IPAM') or {}).get('Config') or []}}
+                inv.networks.append(net)
+            return self._send(201, {'Id': net['Id'], 'Warning': ''})
+        if path == '/containers/create':
+            name = query['name']
+            with inv.lock:
+                if name in inv.containers:
+                    return self._send(409, {'message': f'Conflict. The container name "/{name}" is already in use'})
+                cid = f'{next(inv.ids):064x}'
+                inv.containers[name] = {
+                    'Id': cid, 'Names': [f'/{name}'], 'Image': body['Image'], 'State': 'created',
+                    'Status': 'Created', 'StartedAt': 0, 'Labels': body.get('Labels') or {},
+                }
+            inv.emit(name, 'create')
+            return self._send(201, {'Id': cid, 'Warnings': []})
+        m = re.match(r'^/containers/([^/]+)/exec$', path)
+        if m:
+            name = unquote(m.group(1))
+            if name not in inv.containers:
+                return self._send(404, {'message': 'No such container'})
+            if inv.containers[name]['State'] != 'running':
+                return self._send(409, {'message': f'Container {name} is not running'})
+            exec_id = f'{next(inv.ids):064x}'
+            inv.execs[exec_id] = name
+            return self._send(201, {'Id': exec_id})
+        m = re.match(r'^/exec/([^/]+)/start$', path)
+        if m:
+            name = inv.execs.get(m.group(1))
+            if name is None:
+                return self._send(404, {'message': 'No such exec instance'})
+            output = b'ready\n' if inv.ready(name) else b'% Cli is not ready yet\n'
+            # Non-TTY output is multiplexed: stream 1 (stdout), 3 pad bytes, 4-byte length
+            return self._send(200, b'\x01\0\0\0' + len(output).to_bytes(4, 'big') + output)
+        m = re.match(r'^/networks/([^/]+)/(connect|disconnect)$', path)
+        if m:
+            if unquote(m.group(1)) not in {n['Name'] for n in inv.networks} or body['Container'] not in inv.containers:
+                return self._send(404, {'message': 'No such network or container'})
+            return self._send(200)
+        m = re.match(r'^/containers/([^/]+)/(start|stop|restart)$', path)
+        if m:
+            c = inv.containers.get(unquote(m.group(1)))
+            if not c:
+                return self._send(404, {'message': 'No such container'})
+            time.sleep(inv.action_latency)
+            action = m.group(2)
+            with inv.lock:
+                was_running = c['State'] == 'running'
+                c['State'] = 'exited' if action == 'stop' else 'running'
+                if action != 'stop' and not (action == 'start' and was_running):
+                    c['StartedAt'] = time.time()
+            if action == 'stop' or (action == 'restart' and was_running):
+                inv.emit(unquote(m.group(1)), 'die')
+            if action != 'stop':
+                inv.emit(unquote(m.group(1)), 'start')
+            return self._send(204)
+        return self._send(404, {'message': f'page not found: {path}'})
+
+    def do_DELETE(self):
+        inv = self.server.inventory
+        path, query, _ = self._parse()
+        m = re.match(r'^/containers/([^/]+)$', path)
+        if m:
+            name = unquote(m.group(1))
+            with inv.lock:
+                c = inv.containers.get(name)
+                if c is None:
+                    return self._send(404, {'message': f'No such container: {name}'})
+                if c['State'] == 'running' and query.get('force') not in ('1', 'true', 'True'):
+                    return self._send(409, {'message': f'You cannot remove a running container {c["Id"]}'})
+            if c['State'] == 'running':
+                inv.emit(name, 'die')
+            inv.emit(name, 'destroy')
+            with inv.lock:
+                del inv.containers[name]
+            return self._send(204)
+        m = re.match(r'^/networks/([^/]+)$', path)
+        if m:
+            name = unquote(m.group(1))
+            with inv.lock:
+                net = next((n for n in inv.networks if name in (n['Name'], n['Id'])), None)
+                if net is None:
+                    return self._send(404, {'message': f'network {name} not found'})
+                inv.networks.remove(net)
+            return self._send(204)
+        return self._send(404, {'message': f'page not found: {path}'})
+
+
+class FakeDockerServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+    # dockerd listens with the kernel's SOMAXCONN; the default of 5 refuses bursts of parallel connects
+    request_queue_size = 4096
+
+    def __init__(self, socket_path, inventory):
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        super().__init__(socket_path, Handler)
+        self.socket_path = socket_path
+        self.inventory = inventory
+
+    def get_request(self):
+        # BaseHTTPRequestHandler expects an (host, port) client address.
+        request, _ = super().get_request()
+        return request, ('fake-docker', 0)
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        self.server_close()
+        os.unlink(self.socket_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a fake Docker Engine API on a unix socket.")
+    parser.add_argument('--socket', default='/tmp/fake-docker.sock')
+    parser.add_argument('--networks', type=int, default=250, help='Existing networks (default: 250)')
+    parser.add_argument('--containers', type=int, default=30, help='Lab containers (default: 30)')
+    parser.add_argument('--project', default='ceos-lab_docker')
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds per start/stop/restart')
+    args = parser.parse_args()
+
+    inventory = Inventory(args.networks, args.containers, args.project, args.latency)
+    with FakeDockerServer(args.socket, inventory):
+        print(f"Fake Docker listening on unix://{args.socket} — Ctrl+C to stop")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
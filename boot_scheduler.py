@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import docker_api
+
+
+# Boot order: lower first. Devices not matched by name or `roles:` boot as 'other'.
+ROLE_ORDER = {'superspine': 0, 'spine': 1, 'leaf': 2, 'other': 3, 'host': 4}
+ROLE_PATTERNS = [
+    (re.compile(r'SERVER|HOST'), 'host'),
+    (re.compile(r'^(SUPER|S)SPINE'), 'superspine'),
+    (re.compile(r'^SPINE'), 'spine'),
+    (re.compile(r'^(LEAF|BL)'), 'leaf'),
+]
+
+DEFAULT_BOOT = {
+    'wave_size': 4,            # devices admitted per wave
+    'device_memory_mb': None,  # MemAvailable a device needs (default: its role's resources.memory_mb)
+    'max_load': 1.5,           # 1-minute load average per CPU
+    'admit_timeout': 120,      # seconds to wait for resources before admitting anyway
+    'ready_timeout': 600,      # seconds for a device to answer Cli
+    'ready_command': ['Cli', '-c', 'show version'],
+}
+
+
+def device_role(name, topo=None):
+    """
+    Role from the topology's optional `roles:` map, else guessed from the name.
+    """
+    roles = (topo or {}).get('roles') or {}
+    if name in roles:
+        return str(roles[name]).lower()
+    upper = name.upper()
+    for pattern, role in ROLE_PATTERNS:
+        if pattern.search(upper):
+            return role
+    return 'other'
+
+
+def plan_waves(devices, topo=None, wave_size=DEFAULT_BOOT['wave_size']):
+    """
+    Group devices into waves: by role (spines first), then by name, at most wave_size each.
+    A wave never mixes roles, so leaves only boot once every spine is ready.
+    """
+    ordered = sorted(devices, key=lambda d: (ROLE_ORDER.get(device_role(d, topo), ROLE_ORDER['other']), d))
+    waves = []
+    for device in ordered:
+        role = device_role(device, topo)
+        if not waves or len(waves[-1]) >= wave_size or device_role(waves[-1][-1], topo) != role:
+            waves.append([])
+        waves[-1].append(device)
+    return waves
+
+
+def mem_available_mb():
+    with open('/proc/meminfo') as f:
+        for line in f:
+            if line.startswith('MemAvailable:'):
+                return int(line.split()[1]) // 1024
+    return 0
+
+
+def load_per_cpu():
+    return os.getloadavg()[0] / (os.cpu_count() or 1)
+
+
+class BootScheduler:
+    """
+    Start containers in waves instead of all at once.
+
+    A device is only admitted when host free memory and load allow it, and a
+    wave only starts once every device of the previous one answers the ready
+    command. Devices still booting have not taken their memory yet, so what
+    they will still use is held back from MemAvailable. Per-device start and
+    ready times are recorded in `timings`.
+    """
+
+    def __init__(self, containers, topo=None, config=None, log=print, on_started=None):
+        # containers: {device: container name}; on_started(wave) runs once a wave's containers are started
+        self.containers = containers
+        self.on_started = on_started
+        self.topo = topo or {}
+        self.config = dict(DEFAULT_BOOT)
+        self.config.update(self.topo.get('boot') or {})
+        self.config.update(config or {})
+        self.log = log
+        self.client = docker_api.get_client()
+        self.timings = {}
+        import capacity   # capacity imports device_role from here
+        resources = capacity.resource_config(self.topo)
+        fixed = self.config['device_memory_mb']
+        self.memory = {d: int(fixed) if fixed else capacity.device_memory_mb(d, self.topo, resources) for d in containers}
+        self.booting = set()     # started but not ready yet
+        self.baseline_mb = 0     # MemAvailable before the first of them started
+
+    def run(self):
+        t0 = time.monotonic()
+        waves = plan_waves(self.containers, self.topo, self.config['wave_size'])
+        for idx, wave in enumerate(waves, 1):
+            self.log(f"🌊 Wave {idx}/{len(waves)} ({device_role(wave[0], self.topo)}): {', '.join(wave)}")
+            started = []
+            for device in wave:
+                self._admit(device)
+                self.timings[device] = {'role': device_role(device, self.topo), 'wave': idx,
+                                        'started': time.monotonic() - t0, 'ready': None}
+                if not self.booting:
+                    self.baseline_mb = mem_available_mb()
+                try:
+                    self.client.start(self.containers[device])
+                except (docker_api.DockerError, OSError) as e:
+                    # e.g. a port or cpuset conflict: the rest of the wave still boots
+                    self.timings[device]['error'] = str(e)
+                    self.log(f"❌ {device}: {e}")
+                    continue
+                started.append(device)
+                self.booting.add(device)
+            if self.on_started:
+                self.on_started(wave)
+            if not started:
+                continue
+            with ThreadPoolExecutor(max_workers=len(started)) as pool:
+                for device, ready in zip(started, pool.map(self._wait_ready, started)):
+                    if ready is not None:
+                        self.timings[device]['ready'] = ready - t0
+            # Ready (or given up on): whatever they use now shows in MemAvailable
+            self.booting.difference_update(started)
+        return self.timings
+
+    def pending_mb(self, available):
+        """
+        Memory the booting devices will still take: their reservations minus
+        how far MemAvailable has already dropped since the first one started.
+        """
+        if not self.booting:
+            return 0
+        return max(0, sum(self.memory[d] for d in self.booting) - (self.baseline_mb - available))
+
+    def _admit(self, device):
+        deadline = time.monotonic() + self.config['admit_timeout']
+        while True:
+            available = mem_available_mb()
+            free = available - self.pending_mb(available)
+            if free >= self.memory[device] and load_per_cpu() <= self.config['max_load']:
+                return
+            if time.monotonic() > deadline:
+                self.log(f"⚠️ Host still busy (mem {free} of {self.memory[device]} MB free after booting devices, "
+                         f"load {load_per_cpu():.2f}/cpu) — admitting {device} anyway")
+                return
+            time.sleep(2)
+
+    def _wait_ready(self, device):
+        container = self.containers[device]
+        deadline = time.monotonic() + self.config['ready_timeout']
+        delay = 2
+        while time.monotonic() < deadline:
+            try:
+                code, _ = self.client.exec(container, self.config['ready_command'], timeout=30)
+                if code == 0:
+                    return time.monotonic()
+            except (docker_api.DockerError, OSError):
+                pass
+            time.sleep(delay)
+            delay = min(delay * 1.5, 10)
+        self.log(f"⚠️ {device} not ready after {self.config['ready_timeout']}s")
+        return None
+
+    def report(self):
+        lines = [f"{'Device':<20} {'Role':<11} {'Wave':>4} {'Started':>9} {'Ready':>9} {'Boot':>8}"]
+        for device, t in sorted(self.timings.items(), key=lambda kv: (kv[1]['wave'], kv[0])):
+            if 'error' in t:
+                ready, boot = '-', 'failed'
+            elif t['ready'] is None:
+                ready, boot = '-', 'timeout'
+            else:
+                ready, boot = f"{t['ready']:.1f}s", f"{t['ready'] - t['started']:.1f}s"
+            lines.append(f"{device:<20} {t['role']:<11} {t['wave']:>4} {t['started']:>8.1f}s {ready:>9} {boot:>8}")
+        failed = [(device, t['error']) for device, t in sorted(self.timings.items()) if 'error' in t]
+        if failed:
+            lines.append(f"\n❌ {len(failed)} device(s) failed to start:")
+            lines += [f"   {device}: {error}" for device, error in failed]
+        return "\n".join(lines)
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+
+import glob
+import os
+
+from boot_scheduler import device_role
+
+
+SYS_NODES = '/sys/devices/system/node'
+
+DEFAULT_RESOURCES = {
+    # Memory limit per device by role, in MB; 'default' covers every other role
+    'memory_mb': {'host': 1024, 'default': 2048},
+    'cpus_per_device': 2,   # cores in each device's cpuset (fewer if the host is short of cores)
+    'reserve_mb': 2048,     # left for the host itself
+    'warn_ratio': 0.9,      # warn when the lab needs more than this share of usable memory
+    'pin': True,            # write cpuset pinning
+}
+
+
+def meminfo():
+    info = {}
+    with open('/proc/meminfo') as f:
+        for line in f:
+            key, _, value = line.partition(':')
+            info[key] = int(value.split()[0]) // 1024   # kB -> MB
+    return info
+
+
+def parse_cpulist(text):
+    """
+    '0-3,8,10-11' -> [0, 1, 2, 3, 8, 10, 11]
+    """
+    cpus = []
+    for part in text.strip().split(','):
+        if not part:
+            continue
+        first, _, last = part.partition('-')
+        cpus.extend(range(int(first), int(last or first) + 1))
+    return cpus
+
+
+def numa_nodes(cpus):
+    """
+    {node: [cpus]} restricted to the usable cpus; one node 0 without NUMA information.
+    """
+    usable = set(cpus)
+    nodes = {}
+    for path in sorted(glob.glob(os.path.join(SYS_NODES, 'node[0-9]*', 'cpulist'))):
+        node = int(os.path.basename(os.path.dirname(path))[4:])
+        with open(path) as f:
+            members = [c for c in parse_cpulist(f.read()) if c in usable]
+        if members:
+            nodes[node] = members
+    return nodes or {0: sorted(usable)}
+
+
+def host_resources():
+    cpus = sorted(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else list(range(os.cpu_count() or 1))
+    mem = meminfo()
+    return {
+        'cpus': cpus,
+        'nodes': numa_nodes(cpus),
+        'mem_total_mb': mem.get('MemTotal', 0),
+        'mem_available_mb': mem.get('MemAvailable', 0),
+    }
+
+
+def resource_config(topo):
+    config = dict(DEFAULT_RESOURCES)
+    config['memory_mb'] = dict(DEFAULT_RESOURCES['memory_mb'])
+    custom = (topo or {}).get('resources') or {}
+    config['memory_mb'].update(custom.get('memory_mb') or {})
+    config.update((k, v) for k, v in custom.items() if k != 'memory_mb')
+    return config
+
+
+def device_memory_mb(name, topo, config):
+    memory = config['memory_mb']
+    return int(memory.get(device_role(name, topo), memory['default']))
+
+
+def pin(devices, nodes, cpus_per_device):
+    """
+    Return {device: [cpus]}. Devices are spread over NUMA nodes in proportion to
+    their cores, and within a node over its cores round-robin, so every core
+    carries about the same number of devices and a cpuset never spans nodes.
+    """
+    placed = {node: 0 for node in nodes}
+    result = {}
+    for device in devices:
+        node = min(nodes, key=lambda n: (placed[n] / len(nodes[n]), n))
+        cores = nodes[node]
+        width = min(cpus_per_device, len(cores))
+        start = placed[node] * width % len(cores)
+        result[device] = [cores[(start + i) % len(cores)] for i in range(width)]
+        placed[node] += 1
+    return result
+
+
+def plan(topology, host=None, pinning=True, copies=None):
+    """
+    Check whether the lab fits this host and set each device's limits
+    (mem_limit, cpuset) as device.limits. Returns (status, messages) where
+    status is 'ok', 'warn' or 'refuse'. `copies` are clones of the topology
+    sharing the host (a fleet): they are sized together and each gets limits.
+    """
+    topo = topology.raw
+    config = resource_config(topo)
+    host = host or host_resources()
+    devices = [(copy, d) for copy in copies or [topology] for d in copy.devices]
+
+    memory = {d: device_memory_mb(d, topo, config) for d in topology.devices}
+    need = sum(memory[d] for _, d in devices)
+    usable = host['mem_total_mb'] - config['reserve_mb']
+    cores = len(host['cpus'])
+    # Narrow cpusets on crowded hosts, so no core is shared by more than about two devices
+    width = max(1, min(int(config['cpus_per_device']), cores * 2 // max(1, len(devices))))
+    cpusets = pin(range(len(devices)), host['nodes'], width) if pinning and config['pin'] else {}
+
+    for i, (copy, d) in enumerate(devices):
+        limits = {'mem_limit': f"{memory[d]}m"}
+        if i in cpusets:
+            limits['cpuset'] = ",".join(map(str, cpusets[i]))
+        copy.devices[d].limits = limits
+
+    messages = [f"{len(devices)} devices need {need} MB; host has {host['mem_total_mb']} MB "
+                f"({host['mem_available_mb']} MB free, {config['reserve_mb']} MB reserved), "
+                f"{cores} cores on {len(host['nodes'])} NUMA node(s)"]
+    if need > usable:
+        messages.append(f"The lab needs {need - usable} MB more than this host can give it.")
+        return 'refuse', messages
+    status = 'ok'
+    if need > usable * config['warn_ratio']:
+        messages.append(f"The lab uses {need * 100 // max(1, usable)}% of usable memory.")
+        status = 'warn'
+    if need > host['mem_available_mb']:
+        messages.append(f"Only {host['mem_available_mb']} MB is free right now; stop other workloads before starting.")
+        status = 'warn'
+    if len(devices) > cores * 2:
+        messages.append(f"{len(devices)} devices share {cores} cores; expect slow boots.")
+        status = 'warn'
+    return status, messages
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+
+import os
+import re
+
+import yaml
+from yaml.events import (AliasEvent, DocumentEndEvent, DocumentStartEvent, MappingEndEvent, MappingStartEvent,
+                         ScalarEvent, SequenceEndEvent, SequenceStartEvent, StreamEndEvent, StreamStartEvent)
+from yaml.nodes import MappingNode, ScalarNode, SequenceNode
+
+from lab_utils import write_stream_if_changed
+
+# LibYAML's C loader and emitter when PyYAML was built with it, else the pure-Python ones
+try:
+    from yaml import CSafeDumper as Dumper, CSafeLoader as Loader
+except ImportError:
+    from yaml import SafeDumper as Dumper, SafeLoader as Loader
+
+
+# Extension fields (ignored by compose) that hold the anchored service defaults and volumes
+SERVICE_DEFAULTS = 'x-ceos'
+SHARED_VOLUMES = 'x-volumes'
+DEFAULTS_ANCHOR = 'ceos'
+MERGE_TAG = 'tag:yaml.org,2002:merge'
+LINE_WIDTH = 4096
+
+
+def load(stream):
+    return yaml.load(stream, Loader=Loader)
+
+
+def load_file(path):
+    with open(path) as f:
+        return load(f)
+
+
+class _Events:
+    """
+    Turn plain data into emitter events, with the same tags and quoting yaml.safe_dump would use.
+    """
+
+    def __init__(self):
+        self.representer = yaml.representer.SafeRepresenter(default_flow_style=False, sort_keys=False)
+        self.resolver = yaml.resolver.Resolver()
+
+    def node(self, data, flow=False):
+        node = self.representer.represent_data(data)
+        # Nothing is aliased implicitly: forget what was represented
+        self.representer.represented_objects.clear()
+        self.representer.object_keeper.clear()
+        if flow and not isinstance(node, ScalarNode):
+            node.flow_style = True
+        return node
+
+    def scalar(self, value, anchor=None):
+        return self.from_node(self.node(value), anchor)
+
+    def data(self, data, anchor=None, flow=False):
+        return self.from_node(self.node(data, flow), anchor)
+
+    def from_node(self, node, anchor=None):
+        if isinstance(node, ScalarNode):
+            implicit = (node.tag == self.resolver.resolve(ScalarNode, node.value, (True, False)),
+                        node.tag == self.resolver.resolve(ScalarNode, node.value, (False, True)))
+            yield ScalarEvent(anchor, node.tag, implicit, node.value, style=node.style)
+        elif isinstance(node, SequenceNode):
+            yield SequenceStartEvent(anchor, node.tag, True, flow_style=node.flow_style)
+            for item in node.value:
+                yield from self.from_node(item)
+            yield SequenceEndEvent()
+        elif isinstance(node, MappingNode):
+            yield MappingStartEvent(anchor, node.tag, True, flow_style=node.flow_style)
+            for key, value in node.value:
+                yield from self.from_node(key)
+                yield from self.from_node(value)
+            yield MappingEndEvent()
+
+
+def _anchor_name(volume, used):
+    base = re.sub(r'[^A-Za-z0-9]+', '-', os.path.basename(str(volume.get('target', 'volume')))).strip('-') or 'volume'
+    name, n = base, 1
+    while name in used:
+        n += 1
+        name = f"{base}-{n}"
+    used.add(name)
+    return name
+
+
+def shared_parts(services):
+    """
+    (service fields equal in every service, [volumes mounted by every service]).
+    Hostname, networks and volumes always stay per service.
+    """
+    values = list(services.values())
+    if len(values) < 2:
+        return {}, []
+    first = values[0]
+    defaults = {k: v for k, v in first.items()
+                if k not in ('hostname', 'networks', 'volumes') and all(k in s and s[k] == v for s in values[1:])}
+    volumes = [v for v in first.get('volumes') or [] if all(v in (s.get('volumes') or []) for s in values[1:])]
+    return defaults, volumes
+
+
+def _service_events(ev, service, defaults, anchors):
+    yield MappingStartEvent(None, None, True, flow_style=False)
+    if defaults:
+        yield ScalarEvent(None, MERGE_TAG, (True, False), '<<')
+        yield AliasEvent(DEFAULTS_ANCHOR)
+    for key, value in service.items():
+        if key in defaults:
+            continue
+        yield from ev.scalar(key)
+        if key == 'volumes':
+            yield SequenceStartEvent(None, None, True, flow_style=False)
+            for volume in value:
+                anchor = next((a for v, a in anchors if v == volume), None)
+                if anchor:
+                    yield AliasEvent(anchor)
+                else:
+                    yield from ev.data(volume, flow=True)
+            yield SequenceEndEvent()
+        elif key == 'networks' and isinstance(value, dict):
+            yield from _flow_items(ev, value)
+        else:
+            yield from ev.data(value)
+    yield MappingEndEvent()
+
+
+def _flow_items(ev, mapping):
+    # One line per entry: `name: {key: value, ...}`
+    yield MappingStartEvent(None, None, True, flow_style=False)
+    for key, value in mapping.items():
+        yield from ev.scalar(key)
+        yield from ev.data(value, flow=True)
+    yield MappingEndEvent()
+
+
+def compose_events(compose):
+    """
+    Events for a compact compose file: fields shared by every service are
+    written once under x-ceos (&ceos) and merged into each service with
+    `<<: *ceos`; volumes every service mounts are anchored once under
+    x-volumes and referenced by alias. Loading the file gives back `compose`
+    plus the two extension fields.
+    """
+    ev = _Events()
+    services = compose.get('services') or {}
+    defaults, volumes = shared_parts(services)
+    used = set()
+    anchors = [(v, _anchor_name(v, used)) for v in volumes]
+
+    yield StreamStartEvent()
+    yield DocumentStartEvent(explicit=False)
+    yield MappingStartEvent(None, None, True, flow_style=False)
+    for key, value in compose.items():
+        if key == 'services':
+            if defaults:
+                yield from ev.scalar(SERVICE_DEFAULTS)
+                yield from ev.data(defaults, anchor=DEFAULTS_ANCHOR)
+            if anchors:
+                yield from ev.scalar(SHARED_VOLUMES)
+                yield SequenceStartEvent(None, None, True, flow_style=False)
+                for volume, anchor in anchors:
+                    yield from ev.data(volume, anchor=anchor, flow=True)
+                yield SequenceEndEvent()
+            yield from ev.scalar(key)
+            yield MappingStartEvent(None, None, True, flow_style=False)
+            for name, service in value.items():
+                yield from ev.scalar(name)
+                yield from _service_events(ev, service, defaults, anchors)
+            yield MappingEndEvent()
+        elif key == 'networks':
+            yield from ev.scalar(key)
+            yield from _flow_items(ev, value)
+        else:
+            yield from ev.scalar(key)
+            yield from ev.data(value)
+    yield MappingEndEvent()
+    yield DocumentEndEvent(explicit=False)
+    yield StreamEndEvent()
+
+
+def dump(compose, stream):
+    """
+    Stream the compact compose file to an open text file.
+    """
+    yaml.emit(compose_events(compose), stream, Dumper=Dumper, width=LINE_WIDTH, allow_unicode=True)
+
+
+def write(path, compose):
+    """
+    Write the compose file unless it already holds exactly this. Returns True if written.
+    """
+    return write_stream_if_changed(path, lambda f: dump(compose, f))
@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+
+import os
+import re
+import shlex
+from concurrent.futures import ThreadPoolExecutor
+
+import compose_yaml
+import docker_api
+
+
+COMPOSE_FILE = 'docker-compose.yml'
+# Labels docker-compose uses to find a project's containers and networks (e.g. for `down`)
+PROJECT_LABEL = 'com.docker.compose.project'
+SERVICE_LABEL = 'com.docker.compose.service'
+NETWORK_LABEL = 'com.docker.compose.network'
+# docker-compose's hash of a service's normalised config; `up` recreates containers without a matching one
+CONFIG_HASH_LABEL = 'com.docker.compose.config-hash'
+# Endpoint driver option naming the interface in the container (Docker Engine 28, API 1.48)
+IFNAME_OPT = 'com.docker.network.endpoint.ifname'
+IFNAME_API = (1, 48)
+
+
+class DeployError(RuntimeError):
+    pass
+
+
+def project_containers(project, all=True):
+    """
+    {compose service: container name} of the project, found by its compose
+    project label (a name filter would also match other projects' containers).
+    """
+    containers = docker_api.get_client().containers(all=all, filters={'label': [f'{PROJECT_LABEL}={project}']})
+    return {c['Labels'][SERVICE_LABEL]: docker_api.container_name(c)
+            for c in containers if SERVICE_LABEL in (c.get('Labels') or {})}
+
+
+def unhashed_containers(project):
+    """
+    Names of the project's containers without a compose config hash (created
+    by Deployer), which a plain `docker-compose up` would recreate.
+    """
+    containers = docker_api.get_client().containers(all=True, filters={'label': [f'{PROJECT_LABEL}={project}']})
+    return [docker_api.container_name(c) for c in containers if CONFIG_HASH_LABEL not in (c.get('Labels') or {})]
+
+
+def load_compose(path=COMPOSE_FILE):
+    return compose_yaml.load_file(path)
+
+
+def service_networks(service):
+    """
+    The service's networks as [(name, settings)], in attach order (highest priority first).
+    """
+    nets = service.get('networks') or []
+    if isinstance(nets, list):
+        return [(name, {}) for name in nets]
+    items = [(name, cfg or {}) for name, cfg in nets.items()]
+    return sorted(items, key=lambda item: -item[1].get('priority', 0))
+
+
+def parse_bytes(value):
+    if isinstance(value, int):
+        return value
+    match = re.fullmatch(r'(\d+)\s*([bkmg]?)b?', str(value).strip().lower())
+    if not match:
+        raise DeployError(f"Invalid memory limit: {value!r}")
+    return int(match.group(1)) << {'': 0, 'b': 0, 'k': 10, 'm': 20, 'g': 30}[match.group(2)]
+
+
+class Deployer:
+    """
+    Create a compose lab straight through the Engine API: every link network
+    at once, then containers created, connected and started in parallel.
+    Resources carry docker-compose's project labels and names, so
+    `docker-compose down`, ps and logs treat the lab as their own. Containers
+    get no config-hash label, since that hash is compose's own serialisation
+    of the service and differs between compose versions, so `up` would
+    recreate them unless run with --no-recreate.
+    """
+
+    def __init__(self, compose, project, jobs=8, log=print):
+        self.compose = compose
+        self.project = project
+        self.jobs = max(1, jobs)
+        self.log = log
+        self.client = docker_api.get_client()
+        self.working_dir = os.path.abspath(os.getcwd())
+        self.selected = None     # services of a partial lab (None: the whole lab)
+        self.ifname = False
+        # Services on each link network (external networks are shared, not links)
+        self.users = {}
+        for service, svc in compose['services'].items():
+            for net, _ in service_networks(svc):
+                if not self.external(net):
+                    self.users.setdefault(net, set()).add(service)
+
+    def external(self, name):
+        return bool((self.compose.get('networks', {}).get(name) or {}).get('external'))
+
+    def network_name(self, name):
+        cfg = self.compose.get('networks', {}).get(name) or {}
+        if cfg.get('external'):
+            return cfg.get('name', name)
+        return cfg.get('name', f"{self.project}_{name}")
+
+    def select(self, services):
+        """
+        Run only these services: a link network is attached only when all its
+        services are selected. Interfaces are named by IFNAME_OPT so each keeps
+        its ethN; engines without it get every network of the service instead,
+        so numbering still matches EosIntfMapping.json.
+        """
+        self.selected = set(services)
+        version = str(self.client.version().get('ApiVersion', '0'))
+        self.ifname = tuple(int(n) for n in version.split('.')[:2] if n.isdigit()) >= IFNAME_API
+        return self.ifname
+
+    def networks_of(self, service):
+        """
+        [(network, settings, interface name or None)] the service attaches to, in attach order.
+        """
+        nets = service_networks(self.compose['services'][service])
+        if self.selected is None or not self.ifname:
+            return [(net, settings, None) for net, settings in nets]
+        return [(net, settings, f'eth{i}') for i, (net, settings) in enumerate(nets)
+                if self.external(net) or self.users[net] <= self.selected]
+
+    def container_name(self, service):
+        return self.compose['services'][service].get('container_name', f"{self.project}-{service}-1")
+
+    def labels(self, **extra):
+        return dict({PROJECT_LABEL: self.project,
+                     'com.docker.compose.project.working_dir': self.working_dir,
+                     'com.docker.compose.project.config_files': os.path.join(self.working_dir, COMPOSE_FILE)},
+                    **extra)
+
+    def precheck(self, services):
+        """
+        Fail early: missing images or external networks, stale networks that
+        compose would not reuse, and containers that already exist.
+        """
+        problems = []
+        tags = {tag for img in self.client.images() for tag in img.get('RepoTags') or []}
+        for image in sorted({self.compose['services'][s]['image'] for s in services}):
+            if image not in tags and f"{image}:latest" not in tags:
+                problems.append(f"Image {image} is not present")
+
+        existing = {n['Name']: n for n in self.client.networks()}
+        wanted = {name for s in services for name, _, _ in self.networks_of(s)}
+        for name in sorted(wanted):
+            cfg = self.compose.get('networks', {}).get(name) or {}
+            full = self.network_name(name)
+            net = existing.get(full)
+            if cfg.get('external'):
+                if net is None:
+                    problems.append(f"External network {full} does not exist")
+                continue
+            if net is None:
+                continue
+            labels = net.get('Labels') or {}
+            subnets = {c.get('Subnet') for c in (net.get('IPAM') or {}).get('Config') or []}
+            want = {c.get('subnet') for c in (cfg.get('ipam') or {}).get('config') or []}
+            if labels.get(PROJECT_LABEL) != self.project or (want and subnets != want):
+                problems.append(f"Stale network {full} conflicts with the lab (remove it with `docker network rm {full}`)")
+
+        names = {docker_api.container_name(c) for c in self.client.containers(all=True)}
+        for s in services:
+            if self.container_name(s) in names:
+                problems.append(f"Container {self.container_name(s)} already exists")
+        if problems:
+            raise DeployError("\n   ".join(problems))
+        return existing
+
+    def network_body(self, name):
+        cfg = self.compose['networks'][name] or {}
+        body = {
+            'Name': self.network_name(name),
+            'Driver': cfg.get('driver', 'bridge'),
+            'CheckDuplicate': True,
+            'Options': cfg.get('driver_opts') or {},
+            'Labels': self.labels(**{NETWORK_LABEL: name}),
+        }
+        configs = (cfg.get('ipam') or {}).get('config') or []
+        if configs:
+            body['IPAM'] = {'Driver': 'default', 'Config': [{'Subnet': c['subnet']} for c in configs if 'subnet' in c]}
+        return body
+
+    def endpoint(self, service, settings, ifname=None):
+        endpoint = {'Aliases': [service]}
+        if settings.get('ipv4_address'):
+            endpoint['IPAMConfig'] = {'IPv4Address': settings['ipv4_address']}
+        if ifname:
+            endpoint['DriverOpts'] = {IFNAME_OPT: ifname}
+        return endpoint
+
+    def container_body(self, service):
+        svc = self.compose['services'][service]
+        first, first_cfg, first_ifname = self.networks_of(service)[0]
+        env = svc.get('environment') or {}
+        if isinstance(env, dict):
+            env = [f"{k}={v}" for k, v in env.items()]
+        command = svc.get('command')
+        host = {
+            'Privileged': bool(svc.get('privileged')),
+            'NetworkMode': self.network_name(first),
+            'Mounts': [
+                {'Type': v.get('type', 'bind'), 'Source': v['source'], 'Target': v['target'],
+                 'ReadOnly': bool(v.get('read_only'))}
+                for v in svc.get('volumes') or []
+            ],
+        }
+        if svc.get('mem_limit'):
+            host['Memory'] = parse_bytes(svc['mem_limit'])
+        if svc.get('cpus'):
+            host['NanoCpus'] = int(float(svc['cpus']) * 1e9)
+        if svc.get('cpuset'):
+            host['CpusetCpus'] = str(svc['cpuset'])
+        return {
+            'Image': svc['image'],
+            'Hostname': svc.get('hostname', service),
+            'Env': env,
+            'Cmd': shlex.split(command) if isinstance(command, str) else command,
+            'Labels': self.labels(**{SERVICE_LABEL: service, 'com.docker.compose.container-number': '1',
+                                     'com.docker.compose.oneoff': 'False'}),
+            'HostConfig': host,
+            'NetworkingConfig': {'EndpointsConfig': {self.network_name(first): self.endpoint(service, first_cfg, first_ifname)}},
+        }
+
+    def create_network(self, name):
+        self.client.create_network(self.network_body(name))
+        return name
+
+    def create_and_start(self, service):
+        """
+        Create the container on its first network, connect the rest in
+        priority order before the first start (as compose does), then start it.
+        """
+        name = self.container_name(service)
+        self.client.create_container(name, self.container_body(service))
+        for net, settings, ifname in self.networks_of(service)[1:]:
+            self.client.connect_network(self.network_name(net), name, self.endpoint(service, settings, ifname))
+        self.client.start(name)
+        return service
+
+    def join(self, item):
+        # A running service joins a link network that its new neighbour completes
+        service, net = item
+        settings, ifname = next((cfg, ifname) for n, cfg, ifname in self.networks_of(service) if n == net)
+        self.client.connect_network(self.network_name(net), self.container_name(service),
+                                    self.endpoint(service, settings, ifname))
+
+    def remove(self, service):
+        self.client.remove_container(self.container_name(service), force=True)
+
+    def drop_network(self, net):
+        """
+        Remove a link network that is no longer complete, disconnecting the services still on it.
+        """
+        for service in sorted(self.users[net] & self.selected):
+            try:
+                self.client.disconnect_network(self.network_name(net), self.container_name(service), force=True)
+            except docker_api.DockerError:
+                pass
+        self.client.remove_network(self.network_name(net))
+
+    def _parallel(self, func, items, what):
+        failed = {}
+        with ThreadPoolExecutor(max_workers=self.jobs) as pool:
+            futures = {item: pool.submit(func, item) for item in items}
+            for item, fut in futures.items():
+                try:
+                    fut.result()
+                except (docker_api.DockerError, OSError) as e:
+                    # OSError: the socket timed out or was reset mid-call
+                    failed[item] = e
+        for item, e in failed.items():
+            self.log(f"❌ {what} {item}: {e}")
+        return failed
+
+    def deploy(self, services=None):
+        """
+        Create and start the given services (default: all) and the networks they use.
+        Returns {service: error} for the containers that failed.
+        """
+        services = list(services or self.compose['services'])
+        existing = self.precheck(services)
+        needed = []
+        for s in services:
+            for net, _, _ in self.networks_of(s):
+                if not self.external(net) and self.network_name(net) not in existing and net not in needed:
+                    needed.append(net)
+        if self._parallel(self.create_network, needed, "network"):
+            raise DeployError("Some networks could not be created")
+        self.log(f"🌐 {len(needed)} networks created.")
+        # In a partial lab, running services join the new links to their new neighbours first
+        joins = [(s, net) for s in sorted((self.selected or set()) - set(services))
+                 for net, _, _ in self.networks_of(s) if net in needed]
+        self._parallel(self.join, joins, "connect")
+        return self._parallel(self.create_and_start, services, "container")
+
+    def scale(self, services):
+        """
+        Bring a running lab to exactly these services without restarting the
+        others: containers outside the selection are removed with the link
+        networks they leave incomplete, missing ones are created and started,
+        and running neighbours are connected to the links they complete.
+        Returns (added, removed, {service: error}).
+        """
+        self.select(services)
+        current = set(project_containers(self.project))
+        removed = sorted(s for s in current if s not in self.selected)
+        added = [s for s in self.compose['services'] if s in self.selected and s not in current]
+        failed = self._parallel(self.remove, removed, "container")
+        gone = set(removed) - set(failed)
+        existing = {n['Name'] for n in self.client.networks()}
+        stale = [net for net, users in self.users.items() if users & gone and self.network_name(net) in existing
+                 and (self.ifname or not users & self.selected)]
+        self._parallel(self.drop_network, stale, "network")
+        if added:
+            failed.update(self.deploy(added))
+        return added, removed, failed
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+
+import glob
+import hashlib
+import os
+import shutil
+import tempfile
+
+import docker_api
+import instrumentation
+
+
+KEY_LABEL = 'ceos-lab.derived-key'
+BASE_LABEL = 'ceos-lab.base-image'
+
+DOCKERFILE = """\
+FROM {base}
+COPY rpms/ /tmp/haveged-rpms/
+RUN rpm -Uvh --replacepkgs /tmp/haveged-rpms/*.rpm \\
+ && rm -rf /tmp/haveged-rpms \\
+ && systemctl enable haveged
+LABEL {key_label}="{key}" {base_label}="{base}"
+"""
+
+
+def haveged_rpms(path):
+    """
+    The RPMs to install: a single .rpm file, or every .rpm in a directory (haveged plus its dependencies).
+    """
+    rpms = sorted(glob.glob(os.path.join(path, '*.rpm'))) if os.path.isdir(path) else [path]
+    if not rpms or not all(os.path.isfile(r) for r in rpms):
+        raise ValueError(f"No haveged RPM found at {path}")
+    return rpms
+
+
+def _file_digest(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def derived_key(base_id, rpms):
+    """
+    Cache key: base image digest, the RPM contents and the Dockerfile recipe.
+    """
+    h = hashlib.sha256()
+    h.update(base_id.encode())
+    h.update(DOCKERFILE.encode())
+    for rpm in rpms:
+        h.update(os.path.basename(rpm).encode())
+        h.update(_file_digest(rpm).encode())
+    return h.hexdigest()
+
+
+def derived_tag(base, key):
+    repo, _, tag = base.rpartition(':') if ':' in base.split('/')[-1] else (base, '', 'latest')
+    return f"{repo}-haveged:{tag}-{key[:12]}"
+
+
+def ensure(base, rpm_path, dry_run=False):
+    """
+    Return the tag of a derived image of base with haveged installed and
+    enabled, building it once per (base image digest, RPMs). Builds need no
+    network access, so this works on air-gapped hosts.
+    """
+    client = docker_api.get_client()
+    rpms = haveged_rpms(rpm_path)
+    base_id = next((img['Id'] for img in client.images() if base in (img.get('RepoTags') or [])), None)
+    if base_id is None:
+        raise ValueError(f"Image {base} not found")
+    key = derived_key(base_id, rpms)
+    tag = derived_tag(base, key)
+
+    cached = client.images(filters={'label': [f'{KEY_LABEL}={key}']})
+    if any(tag in (img.get('RepoTags') or []) for img in cached):
+        print(f"✅ Using cached derived image {tag}")
+        return tag
+    if dry_run:
+        print(f"📝 Dry-run: would build {tag} from {base} with {len(rpms)} RPM(s)")
+        return tag
+
+    print(f"🔨 Building {tag} from {base} with haveged…")
+    context = tempfile.mkdtemp(prefix='ceos-haveged-')
+    try:
+        os.mkdir(os.path.join(context, 'rpms'))
+        for rpm in rpms:
+            shutil.copy(rpm, os.path.join(context, 'rpms'))
+        with open(os.path.join(context, 'Dockerfile'), 'w') as f:
+            f.write(DOCKERFILE.format(base=base, key=key, key_label=KEY_LABEL, base_label=BASE_LABEL))
+        result = instrumentation.run(['docker', 'build', '-t', tag, context], capture_output=True, text=True)
+    finally:
+        shutil.rmtree(context, ignore_errors=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Building {tag} failed:\n{result.stdout[-2000:]}{result.stderr[-2000:]}")
+    print(f"✅ Built {tag}")
+    return tag
@@ -0,0 +1,465 @@
+#!/usr/bin/env python3
+
+import http.client
+import ipaddress
+import json
+import os
+import re
+import socket
+import subprocess
+import threading
+import time
+from urllib.parse import quote, urlencode
+
+import instrumentation
+
+
+DEFAULT_SOCKET = '/var/run/docker.sock'
+API_VERSION = 'v1.41'
+
+
+class DockerError(RuntimeError):
+    pass
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, socket_path, timeout=None):
+        super().__init__('localhost', timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self.socket_path)
+        self.sock = sock
+
+
+class DockerAPI:
+    """
+    Docker Engine API client over the unix socket.
+    Each thread keeps one HTTP/1.1 connection alive and reuses it for every call.
+    """
+
+    def __init__(self, socket_path=DEFAULT_SOCKET, timeout=60):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = UnixHTTPConnection(self.socket_path, timeout=self.timeout)
+            self._local.conn = conn
+        return conn
+
+    def _reset(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+        self._local.conn = None
+
+    def _url(self, path, params=None):
+        url = f'/{API_VERSION}{path}'
+        query = {k: json.dumps(v) if isinstance(v, dict) else v for k, v in (params or {}).items() if v is not None}
+        if query:
+            url += '?' + urlencode(query)
+        return url
+
+    def request(self, method, path, params=None, body=None):
+        url = self._url(path, params)
+        payload = json.dumps(body).encode() if body is not None else None
+        headers = {'Content-Type': 'application/json'} if payload is not None else {}
+        t0 = time.perf_counter()
+        # A kept-alive connection may have been closed by the daemon; retry once on a fresh one.
+        for attempt in (1, 2):
+            conn = self._connection()
+            try:
+                conn.request(method, url, body=payload, headers=headers)
+                resp = conn.getresponse()
+                data = resp.read()
+                break
+            except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError):
+                self._reset()
+                if attempt == 2:
+                    _record(method, path, t0, None, 0)
+                    raise
+            except BaseException:
+                # A timeout or other failure mid-request leaves the connection unusable for the next call
+                self._reset()
+                _record(method, path, t0, None, 0)
+                raise
+        _record(method, path, t0, resp.status, len(data))
+        if resp.status >= 400:
+            try:
+                message = json.loads(data).get('message', '')
+            except ValueError:
+                message = data.decode(errors='replace')
+            raise DockerError(f"{method} {path} failed ({resp.status}): {message}")
+        if not data:
+            return None
+        return json.loads(data)
+
+    def ping(self):
+        conn = self._connection()
+        conn.request('GET', '/_ping')
+        resp = conn.getresponse()
+        return resp.status == 200 and resp.read() == b'OK'
+
+    def version(self):
+        return self.request('GET', '/version')
+
+    def networks(self, filters=None):
+        return self.request('GET', '/networks', {'filters': filters})
+
+    def network_ids(self):
+        return sorted(n['Id'] for n in self.networks())
+
+    def inspect_network(self, name):
+        return self.request('GET', f'/networks/{quote(name)}')
+
+    def create_network(self, body):
+        return self.request('POST', '/networks/create', body=body)
+
+    def connect_network(self, network, container, endpoint=None):
+        self.request('POST', f'/networks/{quote(network)}/connect',
+                     body={'Container': container, 'EndpointConfig': endpoint or {}})
+
+    def disconnect_network(self, network, container, force=False):
+        self.request('POST', f'/networks/{quote(network)}/disconnect', body={'Container': container, 'Force': force})
+
+    def remove_network(self, name):
+        self.request('DELETE', f'/networks/{quote(name)}')
+
+    def containers(self, all=True, filters=None):
+        return self.request('GET', '/containers/json', {'all': int(all), 'filters': filters})
+
+    def inspect_container(self, name):
+        return self.request('GET', f'/containers/{quote(name)}/json')
+
+    def create_container(self, name, body):
+        return self.request('POST', '/containers/create', {'name': name}, body=body)
+
+    def remove_container(self, name, force=False):
+        self.request('DELETE', f'/containers/{quote(name)}', {'force': int(force)})
+
+    def images(self, filters=None):
+        return self.request('GET', '/images/json', {'filters': filters})
+
+    def start(self, name):
+        self.request('POST', f'/containers/{quote(name)}/start')
+
+    def stop(self, name, timeout=None):
+        self.request('POST', f'/containers/{quote(name)}/stop', {'t': timeout})
+
+    def restart(self, name, timeout=None):
+        self.request('POST', f'/containers/{quote(name)}/restart', {'t': timeout})
+
+    def exec(self, name, cmd, timeout=None):
+        """
+        Run cmd inside the container and return (exit_code, stdout + stderr).
+        """
+        created = self.request('POST', f'/containers/{quote(name)}/exec', body={
+            'Cmd': cmd, 'AttachStdout': True, 'AttachStderr': True,
+        })
+        # The daemon hijacks the connection for the output stream, so use a dedicated one.
+        conn = UnixHTTPConnection(self.socket_path, timeout=timeout or self.timeout)
+        t0 = time.perf_counter()
+        try:
+            conn.request('POST', self._url(f"/exec/{created['Id']}/start"),
+                         body=json.dumps({'Detach': False, 'Tty': False}),
+                         headers={'Content-Type': 'application/json'})
+            resp = conn.getresponse()
+            raw = resp.read()
+        finally:
+            conn.close()
+        _record('POST', f"/exec/{created['Id']}/start", t0, resp.status, len(raw))
+        if resp.status >= 400:
+            raise DockerError(f"exec in {name} failed ({resp.status}): {raw.decode(errors='replace')}")
+        info = self.request('GET', f"/exec/{created['Id']}/json")
+        return info.get('ExitCode'), _demux(raw)
+
+    def events(self, filters=None, since=None):
+        """
+        Yield events as they happen, on a dedicated connection (the stream never ends).
+        """
+        conn = UnixHTTPConnection(self.socket_path, timeout=None)
+        try:
+            conn.request('GET', self._url('/events', {'filters': filters, 'since': since}))
+            resp = conn.getresponse()
+            if resp.status >= 400:
+                raise DockerError(f"GET /events failed ({resp.status}): {resp.read().decode(errors='replace')}")
+            for line in resp:
+                if line.strip():
+                    yield json.loads(line)
+        finally:
+            conn.close()
+
+
+def _record(method, path, t0, status, size):
+    # Keep metric labels low-cardinality: /containers/LEAF1/json -> /containers/{id}/json
+    path = re.sub(r'^/(containers|exec|networks|images)/[^/]+', r'/\1/{id}', path)
+    instrumentation.RECORDER.record_call('docker-api', f"{method} {path}", time.perf_counter() - t0, status, size)
+
+
+def _demux(raw):
+    # Non-TTY exec output is framed: 1 byte stream, 3 pad, 4 byte big-endian length.
+    out = bytearray()
+    while len(raw) >= 8 and raw[0] in (0, 1, 2) and raw[1:4] == b'\0\0\0':
+        size = int.from_bytes(raw[4:8], 'big')
+        out += raw[8:8 + size]
+        raw = raw[8 + size:]
+    out += raw
+    return out.decode(errors='replace')
+
+
+def _filter_args(filters):
+    args = []
+    for key, values in (filters or {}).items():
+        for value in values:
+            args += ['--filter', f'{key}={value}']
+    return args
+
+
+def _endpoint_fields(endpoint):
+    # (flag, value) pairs of an Engine API EndpointConfig, as docker network connect/create name them
+    fields = [('alias', a) for a in endpoint.get('Aliases') or []]
+    ip = (endpoint.get('IPAMConfig') or {}).get('IPv4Address')
+    if ip:
+        fields.append(('ip', ip))
+    fields += [('driver-opt', f'{k}={v}') for k, v in (endpoint.get('DriverOpts') or {}).items()]
+    return fields
+
+
+def _endpoint_args(endpoint):
+    return [f'--{flag}={value}' for flag, value in _endpoint_fields(endpoint)]
+
+
+def _parse_labels(labels):
+    if isinstance(labels, dict):
+        return labels
+    result = {}
+    for item in (labels or '').split(','):
+        if '=' in item:
+            k, v = item.split('=', 1)
+            result[k] = v
+    return result
+
+
+class DockerCLI:
+    """
+    Fallback for hosts without a Docker Engine socket (e.g. podman).
+    Every query is a single bulk CLI call, normalised to the Engine API shape.
+    """
+
+    def __init__(self, binary='docker'):
+        self.binary = binary
+
+    def _output(self, args):
+        return instrumentation.check_output([self.binary] + args).decode()
+
+    def version(self):
+        try:
+            return json.loads(self._output(['version', '--format', '{{json .Server}}']))
+        except (subprocess.CalledProcessError, ValueError) as e:
+            raise DockerError(f"version failed: {e}")
+
+    def networks(self, filters=None):
+        ids = self._output(['network', 'ls', '-q'] + _filter_args(filters)).split()
+        if not ids:
+            return []
+        networks = json.loads(self._output(['network', 'inspect'] + ids))
+        return [_normalise_network(n) for n in networks]
+
+    def network_ids(self):
+        return sorted(self._output(['network', 'ls', '-q', '--no-trunc']).split())
+
+    def inspect_network(self, name):
+        try:
+            return _normalise_network(json.loads(self._output(['network', 'inspect', name]))[0])
+        except subprocess.CalledProcessError as e:
+            raise DockerError(f"network inspect {name} failed: {e}")
+
+    def containers(self, all=True, filters=None):
+        args = ['ps', '--format', '{{json .}}'] + (['-a'] if all else []) + _filter_args(filters)
+        containers = []
+        for line in self._output(args).splitlines():
+            if not line.strip():
+                continue
+            c = json.loads(line)
+            names = c.get('Names')
+            names = names if isinstance(names, list) else (names or '').split(',')
+            containers.append({
+                'Id': c.get('ID') or c.get('Id', ''),
+                'Names': ['/' + n.lstrip('/') for n in names if n],
+                'Image': c.get('Image', ''),
+                'State': (c.get('State') or '').lower(),
+                'Status': c.get('Status', ''),
+                'Labels': _parse_labels(c.get('Labels')),
+            })
+        return containers
+
+    def inspect_container(self, name):
+        try:
+            return json.loads(self._output(['inspect', '--type', 'container', name]))[0]
+        except subprocess.CalledProcessError as e:
+            raise DockerError(f"inspect {name} failed: {e}")
+
+    def images(self, filters=None):
+        images = []
+        for line in self._output(['images', '--format', '{{json .}}'] + _filter_args(filters)).splitlines():
+            if not line.strip():
+                continue
+            img = json.loads(line)
+            tag = f"{img.get('Repository')}:{img.get('Tag')}"
+            images.append({'Id': img.get('ID', ''), 'RepoTags': [tag]})
+        return images
+
+    def _action(self, args):
+        result = instrumentation.run([self.binary] + args, capture_output=True, text=True)
+        if result.returncode != 0:
+            raise DockerError(result.stderr.strip() or f"{' '.join(args)} failed")
+        return result.stdout.strip()
+
+    def create_network(self, body):
+        args = ['network', 'create', '--driver', body.get('Driver', 'bridge')]
+        args += [f'--opt={k}={v}' for k, v in (body.get('Options') or {}).items()]
+        args += [f'--label={k}={v}' for k, v in (body.get('Labels') or {}).items()]
+        args += [f"--subnet={c['Subnet']}" for c in (body.get('IPAM') or {}).get('Config') or [] if 'Subnet' in c]
+        return {'Id': self._action(args + [body['Name']]), 'Warning': ''}
+
+    def connect_network(self, network, container, endpoint=None):
+        self._action(['network', 'connect'] + _endpoint_args(endpoint or {}) + [network, container])
+
+    def disconnect_network(self, network, container, force=False):
+        self._action(['network', 'disconnect'] + (['--force'] if force else []) + [network, container])
+
+    def remove_network(self, name):
+        self._action(['network', 'rm', name])
+
+    def create_container(self, name, body):
+        """
+        `docker create` with the Engine API body translated to flags (the
+        subset Deployer.container_body produces).
+        """
+        host = body.get('HostConfig') or {}
+        args = ['create', '--name', name]
+        if body.get('Hostname'):
+            args += ['--hostname', body['Hostname']]
+        args += [f'--env={e}' for e in body.get('Env') or []]
+        args += [f'--label={k}={v}' for k, v in (body.get('Labels') or {}).items()]
+        if host.get('Privileged'):
+            args.append('--privileged')
+        for m in host.get('Mounts') or []:
+            args.append(f"--mount=type={m.get('Type', 'bind')},source={m['Source']},target={m['Target']}"
+                        + (',readonly' if m.get('ReadOnly') else ''))
+        if host.get('Memory'):
+            args.append(f"--memory={host['Memory']}")
+        if host.get('NanoCpus'):
+            args.append(f"--cpus={host['NanoCpus'] / 1e9:g}")
+        if host.get('CpusetCpus'):
+            args.append(f"--cpuset-cpus={host['CpusetCpus']}")
+        for network, endpoint in ((body.get('NetworkingConfig') or {}).get('EndpointsConfig') or {}).items():
+            if endpoint.get('DriverOpts'):
+                # Endpoint driver options only fit the long --network syntax
+                args.append('--network=' + ','.join([f'name={network}'] + [
+                    f'{k}={v}' for k, v in _endpoint_fields(endpoint)]))
+            else:
+                args += [f'--network={network}'] + [f"--{'network-alias' if flag == 'alias' else flag}={value}"
+                                                    for flag, value in _endpoint_fields(endpoint)]
+        args.append(body['Image'])
+        args += body.get('Cmd') or []
+        return {'Id': self._action(args), 'Warnings': []}
+
+    def remove_container(self, name, force=False):
+        self._action(['rm'] + (['--force'] if force else []) + [name])
+
+    def start(self, name):
+        self._action(['start', name])
+
+    def exec(self, name, cmd, timeout=None):
+        try:
+            result = instrumentation.run([self.binary, 'exec', name] + cmd, capture_output=True, text=True, timeout=timeout)
+        except subprocess.TimeoutExpired:
+            return None, ''
+        return result.returncode, result.stdout + result.stderr
+
+    def stop(self, name, timeout=None):
+        self._action(['stop', name] + (['-t', str(timeout)] if timeout is not None else []))
+
+    def restart(self, name, timeout=None):
+        self._action(['restart', name] + (['-t', str(timeout)] if timeout is not None else []))
+
+    def events(self, filters=None, since=None):
+        args = [self.binary, 'events', '--format', '{{json .}}'] + _filter_args(filters)
+        if since is not None:
+            args += ['--since', str(since)]
+        proc = instrumentation.popen(args, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+        try:
+            for line in proc.stdout:
+                if line.strip():
+                    yield json.loads(line)
+        finally:
+            proc.kill()
+            proc.wait()
+
+
+def _normalise_network(net):
+    # podman uses lower-case keys and a flat subnet list
+    if 'IPAM' in net or 'subnets' not in net:
+        return net
+    return {
+        'Name': net.get('name'),
+        'Id': net.get('id', ''),
+        'Driver': net.get('driver'),
+        'Options': net.get('options') or {},
+        'Labels': net.get('labels') or {},
+        'IPAM': {'Config': [{'Subnet': s['subnet'], 'Gateway': s.get('gateway')}
+                            for s in net.get('subnets') or [] if 'subnet' in s]},
+    }
+
+
+def _socket_path():
+    host = os.environ.get('DOCKER_HOST', '')
+    if host.startswith('unix://'):
+        return host[len('unix://'):]
+    if host:
+        return None
+    return DEFAULT_SOCKET
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """
+    Return the shared client: the Engine API if the socket answers, else the CLI.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            path = _socket_path()
+            if path and os.path.exists(path):
+                api = DockerAPI(path)
+                try:
+                    if api.ping():
+                        _client = api
+                except (OSError, http.client.HTTPException):
+                    # A socket that is there but does not speak HTTP (or hangs up) counts as missing
+                    pass
+            if _client is None:
+                _client = DockerCLI()
+        return _client
+
+
+def network_subnets(networks):
+    subnets = set()
+    for net in networks:
+        for cfg in (net.get('IPAM') or {}).get('Config') or []:
+            if cfg.get('Subnet'):
+                subnets.add(ipaddress.ip_network(cfg['Subnet'], strict=False))
+    return subnets
+
+
+def container_name(container):
+    return container['Names'][0].lstrip('/') if container.get('Names') else container.get('Id', '')[:12]
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+
+import ipaddress
+import os
+import re
+
+import mgmt_addresses
+from lab_utils import STATE_DIR, load_json, save_json
+from subnet_allocator import SubnetAllocator
+
+
+# Every copy is a compose project of its own in fleet/<name>/
+FLEET_DIR = 'fleet'
+# Subnet blocks and management addresses of every copy, kept across runs
+FLEET_STATE = os.path.join(STATE_DIR, 'fleet.json')
+DEFAULT_PREFIX = 'pod'
+JOBS = 8
+
+
+def copy_names(prefix, count):
+    """
+    pod01, pod02, ... Compose uses the directory name as project name, which
+    prefixes every container and network of the copy.
+    """
+    if not re.fullmatch(r'[a-z0-9][a-z0-9_-]*', prefix or ''):
+        raise ValueError(f"Invalid fleet prefix '{prefix}' (lower case letters, digits, '_' and '-')")
+    if count < 1:
+        raise ValueError(f"A fleet needs at least one copy, not {count}")
+    width = max(2, len(str(count)))
+    return [f"{prefix}{i:0{width}d}" for i in range(1, count + 1)]
+
+
+def copy_dir(name):
+    return os.path.join(FLEET_DIR, name)
+
+
+def block_prefixlen(topology, pool):
+    """
+    The smallest block that holds every link subnet of one copy.
+    """
+    size = sum(1 << (pool.max_prefixlen - link.prefixlen) for link in topology.links)
+    prefixlen = pool.max_prefixlen - max(0, size - 1).bit_length()
+    if prefixlen < pool.prefixlen:
+        raise ValueError(f"One copy needs a /{prefixlen} of link subnets, more than subnet_pool {pool}")
+    return prefixlen
+
+
+def plan_blocks(names, topology, pool, networks, dry_run=False):
+    """
+    Return {copy: subnet block}, all carved from the pool by one allocator, so
+    no two copies (and no other Docker network) ever share a subnet. A copy
+    keeps its block while the size is unchanged and no network outside the
+    copy took part of it.
+    """
+    pool = ipaddress.ip_network(pool)
+    prefixlen = block_prefixlen(topology, pool)
+    state = load_json(FLEET_STATE) or {}
+    previous = state.get('blocks', {}) if state.get('pool') == str(pool) else {}
+    docker = [(net['name'], ipaddress.ip_network(s, strict=False)) for net in networks for s in net['subnets']]
+
+    blocks = {}
+    for name in names:
+        block = ipaddress.ip_network(previous[name]) if name in previous else None
+        if (block is None or block.prefixlen != prefixlen
+                or any(block.overlaps(b) for b in blocks.values())
+                or any(block.overlaps(s) for net, s in docker if not net.startswith(f"{name}_"))):
+            continue
+        blocks[name] = block
+
+    allocator = SubnetAllocator(pool, [s for _, s in docker] + list(blocks.values()))
+    for name in names:
+        if name not in blocks:
+            try:
+                blocks[name] = allocator.allocate(prefixlen)
+            except RuntimeError:
+                raise RuntimeError(f"subnet_pool {pool} has no room for {len(names)} copies of /{prefixlen}; use a larger pool") from None
+    if not dry_run:
+        state.update({'pool': str(pool), 'blocks': {name: str(blocks[name]) for name in names}})
+        save_json(FLEET_STATE, state)
+    return {name: blocks[name] for name in names}
+
+
+def plan_addresses(copies, mgmt_net, raw, dry_run=False):
+    """
+    Give every device of every copy ({copy: topology}) a management address in
+    one pass over the shared management network, and persist the reservations.
+    """
+    subnet, gateway, in_use = mgmt_addresses.network_plan(raw, mgmt_net)
+    state = load_json(FLEET_STATE) or {}
+    previous = state.get('addresses', {}) if state.get('network') == mgmt_net else {}
+    devices = [f"{name}/{device}" for name, topology in copies.items() for device in topology.devices]
+    addresses = mgmt_addresses.assign(devices, subnet, gateway, in_use, previous)
+    for key, ip in addresses.items():
+        name, device = key.split('/', 1)
+        copies[name].devices[device].mgmt_address = ipaddress.ip_interface(f"{ip}/{subnet.prefixlen}")
+    if not dry_run:
+        state.update({'network': mgmt_net, 'addresses': {key: str(ip) for key, ip in addresses.items()}})
+        save_json(FLEET_STATE, state)
+    return addresses
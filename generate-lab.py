@@ -3,17 +3,43 @@
 import argparse
 import os
 import sys
-import yaml
 import ipaddress
 import hashlib
-import subprocess
 import json
 import logging
-from collections import defaultdict
+import docker_api
+import instrumentation
 from mgmt_network import ensure_or_select_mgmt_network
+import mgmt_addresses
+import sharding
+import capacity
+import compose_yaml
+import preflight
+import derived_image
+import fleet
+from concurrent.futures import ThreadPoolExecutor
+from lab_utils import STATE_DIR, atomic_write, write_if_changed, load_json, save_json
+import startup_config
+import leases
+from topology import Topology, TopologyError
 
 
 DEFAULT_SUBNET_POOL = ipaddress.ip_network('172.16.0.0/16')
+MANIFEST = os.path.join(STATE_DIR, 'generate.json')
+# 2.x keeps mem_limit/cpuset on the service and network priority (eth order), which the 3.x
+# schema rejects under docker-compose v1; 2.4 also has long volume syntax and x- fields
+COMPOSE_VERSION = '2.4'
+
+CEOS_ENVIRONMENT = {
+    'CEOS': '1', 'EOS_PLATFORM': 'ceoslab', 'container': 'docker',
+    'ETBA': '1', 'INTFTYPE': 'eth', 'SKIP_ZEROTOUCH_BARRIER_IN_SYSDBINIT': '1'
+}
+CEOS_COMMAND = (
+    '/sbin/init systemd.setenv=INTFTYPE=eth systemd.setenv=ETBA=1 '
+    'systemd.setenv=CEOS=1 systemd.setenv=EOS_PLATFORM=ceoslab '
+    'systemd.setenv=container=docker systemd.setenv=MAPETH0=1 '
+    'systemd.setenv=MGMT_INTF=eth0'
+)
 
 
 def parse_args():
@@ -29,7 +55,17 @@ def parse_args():
     parser.add_argument('--auto', action='store_true', help='Run in non-interactive mode with defaults')
     parser.add_argument('--dry-run', action='store_true', help='Validate everything but don’t create files or networks')
     parser.add_argument('--verbose', action='store_true', help='Enable verbose logging to generate-lab.log')
+    parser.add_argument('--ignore-capacity', action='store_true', help='Generate even if the lab does not fit this host')
+    parser.add_argument('--sysctl-dropin', metavar='PATH', nargs='?', const=preflight.DROPIN,
+                        help=f'Write the tuned kernel limits as a sysctl.d drop-in (default: {preflight.DROPIN})')
+    parser.add_argument('--haveged', metavar='PATH',
+                        help='haveged RPM (or directory of RPMs) to bake into a derived cEOS image')
     parser.add_argument('--parent', help='Specify parent interface explicitly (e.g., eth0)')
+    parser.add_argument('--fleet', metavar='N', type=int,
+                        help=f'Generate N isolated copies of the lab under {fleet.FLEET_DIR}/<prefix>NN/')
+    parser.add_argument('--fleet-prefix', metavar='PREFIX', default=fleet.DEFAULT_PREFIX,
+                        help=f'Name prefix of the fleet copies (default: {fleet.DEFAULT_PREFIX})')
+    instrumentation.add_arguments(parser)
     return parser.parse_args()
 
 
@@ -43,37 +79,51 @@ def setup_logging(verbose):
         logging.info("Logging started")
 
 
-def validate_topology(topo):
-    if not isinstance(topo, dict):
-        raise ValueError("Topology file is not a YAML dictionary")
-    if 'connections' not in topo or not isinstance(topo['connections'], list):
-        raise ValueError("Missing or invalid 'connections' section")
-    for conn in topo['connections']:
-        if not all(k in conn for k in ('device1', 'intf1', 'device2', 'intf2')):
-            raise ValueError(f"Invalid connection entry: {conn}")
-
-
-def get_existing_docker_subnets():
-    output = subprocess.check_output(['docker', 'network', 'ls', '-q']).decode().splitlines()
-    existing_subnets = set()
-    for net_id in output:
-        info = json.loads(subprocess.check_output(['docker', 'network', 'inspect', net_id]).decode())[0]
-        ipam = info.get('IPAM')
-        if not ipam or not ipam.get('Config'):
-            continue
-        for cfg in ipam['Config']:
-            if 'Subnet' in cfg:
-                existing_subnets.add(ipaddress.ip_network(cfg['Subnet']))
-    return existing_subnets
+def check_capacity(topology, sharded, ignore, copies=None):
+    if sharded:
+        # Other hosts cannot be inspected from here: only set memory limits
+        capacity.plan(topology, pinning=False)
+        print("ℹ️ Multi-host lab: memory limits set, host capacity not checked.")
+        return
+    status, messages = capacity.plan(topology, copies=copies)
+    icon = {'ok': '✅', 'warn': '⚠️', 'refuse': '❌'}[status]
+    print(f"{icon} Capacity: {messages[0]}")
+    for message in messages[1:]:
+        print(f"   {message}")
+    if status == 'refuse' and not ignore:
+        print("❌ The lab does not fit this host. Lower resources.memory_mb, use shards, or pass --ignore-capacity.")
+        sys.exit(1)
 
 
-def next_subnet(used_subnets, existing_docker_subnets, base_subnet, prefixlen=24):
-    for subnet in base_subnet.subnets(new_prefix=prefixlen):
-        if subnet in used_subnets or any(subnet.overlaps(existing) for existing in existing_docker_subnets):
-            continue
-        used_subnets.add(subnet)
-        return subnet
-    raise Exception("No more available subnets!")
+def check_sysctls(topology, assignment, shards, dropin, dry_run, copies=1):
+    if shards:
+        # Size for the busiest host; every shard host needs the same drop-in
+        counts = max((preflight.host_counts(topology, [d for d, h in assignment.items() if h == host.name])
+                      for host in shards), key=lambda c: c[0])
+    else:
+        counts = tuple(n * copies for n in preflight.host_counts(topology))
+    shortfalls = preflight.check(counts)
+    if shortfalls:
+        print(f"⚠️ Kernel limits too low for {counts[0]} devices (expect boot hangs):")
+        for key, current, need in shortfalls:
+            print(f"   {key} = {current} (needs at least {need})")
+    else:
+        print(f"✅ Kernel limits: enough for {counts[0]} devices.")
+    if not dropin:
+        if shortfalls:
+            print("ℹ️ Pass --sysctl-dropin to write tuned values to /etc/sysctl.d.")
+        return
+    if dry_run:
+        print(f"📝 Dry-run: would write {dropin}")
+        return
+    try:
+        atomic_write(dropin, preflight.render_dropin(counts))
+    except OSError as e:
+        local = os.path.basename(dropin)
+        atomic_write(local, preflight.render_dropin(counts))
+        print(f"⚠️ Cannot write {dropin} ({e.strerror}); wrote ./{local} instead: sudo cp {local} {dropin} && sudo sysctl --system")
+        return
+    print(f"✅ Wrote {dropin}; apply with: sudo sysctl --system")
 
 
 def mac_from_name(name):
@@ -81,48 +131,67 @@ def mac_from_name(name):
     return f'02:{h[0:2]}:{h[2:4]}:{h[4:6]}:{h[6:8]}:{h[8:10]}'
 
 
-def generate_device_files(devices, connections, dry_run):
-    volume_paths = {}
-    interface_mapping_per_device = defaultdict(list)
-
-    for conn in connections:
-        for dev_key, intf_key in [('device1', 'intf1'), ('device2', 'intf2')]:
-            interface_mapping_per_device[conn[dev_key]].append(conn[intf_key])
-
-    if dry_run:
-        print("📝 Dry-run: would generate device configs.")
-        return {}
-
-    os.makedirs('devices', exist_ok=True)
-
-    for device, intfs in interface_mapping_per_device.items():
-        device_dir = os.path.join('devices', device)
-        os.makedirs(device_dir, exist_ok=True)
-
-        with open(os.path.join(device_dir, 'ceos-config'), 'w') as f:
-            f.write(f"SERIALNUMBER={device.upper()}-SN\n")
-            f.write(f"SYSTEMMACADDR={mac_from_name(device)}\n")
-            f.write("TFA_VERSION=2\n")
+def render_device_files(device, topology, mgmt_net):
+    ceos_config = (
+        f"SERIALNUMBER={device.name.upper()}-SN\n"
+        f"SYSTEMMACADDR={mac_from_name(device.name)}\n"
+        "TFA_VERSION=2\n"
+    )
+    mapping = {
+        "ManagementIntf": {"eth0": "Management1"},
+        "EthernetIntf": {f"eth{i.eth}": i.name for i in device.interfaces}
+    }
+    files = {'ceos-config': ceos_config, 'EosIntfMapping.json': json.dumps(mapping, indent=2)}
+    if topology.raw.get('startup_config', True):
+        files['startup-config'] = startup_config.render(device, topology.raw, mgmt_net, device.mgmt_address)
+    return files
 
-        mapping = {
-            "ManagementIntf": {"eth0": "Management1"},
-            "EthernetIntf": {f"eth{i+1}": iface for i, iface in enumerate(intfs)}
-        }
 
-        with open(os.path.join(device_dir, 'EosIntfMapping.json'), 'w') as f:
-            json.dump(mapping, f, indent=2)
+def generate_device_files(topology, mgmt_net, dry_run, outdir='.', log=print):
+    volume_paths = {}
+    device_files = {}
 
-        volume_paths[device] = {
+    for device in topology.devices.values():
+        device_dir = os.path.join(outdir, 'devices', device.name)
+        device_files[device.name] = render_device_files(device, topology, mgmt_net)
+        volume_paths[device.name] = {
             'ceos_config': os.path.abspath(os.path.join(device_dir, 'ceos-config')),
             'eos_mapping': os.path.abspath(os.path.join(device_dir, 'EosIntfMapping.json'))
         }
+        if 'startup-config' in device_files[device.name]:
+            volume_paths[device.name]['startup_config'] = os.path.abspath(os.path.join(device_dir, 'startup-config'))
 
-    return volume_paths
-
+    if dry_run:
+        log("📝 Dry-run: would generate device configs.")
+        return volume_paths, device_files
 
-def select_ceos_image(auto, dry_run):
-    output = subprocess.check_output(['docker', 'images', '--format', '{{.Repository}}:{{.Tag}}']).decode()
-    images = [line for line in output.splitlines() if line.startswith('ceos')]
+    configs = startup_config.StartupConfigs(os.path.join(outdir, startup_config.STARTUP_STATE))
+    written = total = 0
+    for device, files in device_files.items():
+        device_dir = os.path.join(outdir, 'devices', device)
+        os.makedirs(device_dir, exist_ok=True)
+        for name, content in files.items():
+            path = os.path.join(device_dir, name)
+            total += 1
+            if name == 'startup-config':
+                # cEOS saves `write memory` into this file; never overwrite a saved config
+                if not configs.writable(device, path):
+                    continue
+                configs.written(device, content)
+            written += write_if_changed(path, content)
+    configs.save()
+    log(f"📝 Device files: {written} written, {total - written} unchanged.")
+    if configs.kept:
+        log(f"ℹ️ Kept saved startup-config on {', '.join(configs.kept)} (delete devices/<name>/startup-config to regenerate).")
+
+    return volume_paths, device_files
+
+
+def select_ceos_image(auto, dry_run, haveged=None):
+    images = [
+        tag for img in docker_api.get_client().images()
+        for tag in img.get('RepoTags') or [] if tag.startswith('ceos') and '-haveged:' not in tag
+    ]
     if not images:
         print("❌ No ceos images found. Please import one and try again.")
         sys.exit(1)
@@ -133,105 +202,318 @@ def select_ceos_image(auto, dry_run):
 
     if auto or dry_run:
         print(f"✅ Auto/Dry-run: would select {images[0]}")
-        return images[0]
-
-    while True:
-        choice = input("👉 Enter the number of the image you want to use: ").strip()
-        if choice.isdigit() and 1 <= int(choice) <= len(images):
-            return images[int(choice)-1]
-        print("⚠️ Invalid choice. Try again.")
-
-
-def generate_compose(devices, links, mgmt_net, volume_paths, ceos_image, dry_run):
-    if dry_run:
-        print("📝 Dry-run: would generate docker-compose.yml.")
-        return
-
-    compose = {'version': '3.7', 'services': {}, 'networks': {mgmt_net: {'external': True}}}
-
-    for idx, link in enumerate(links, 1):
-        net_name = f'link{idx:02d}'
-        link['net_name'] = net_name
-        compose['networks'][net_name] = {
+        image = images[0]
+    else:
+        while True:
+            choice = input("👉 Enter the number of the image you want to use: ").strip()
+            if choice.isdigit() and 1 <= int(choice) <= len(images):
+                image = images[int(choice)-1]
+                break
+            print("⚠️ Invalid choice. Try again.")
+
+    if haveged:
+        try:
+            return derived_image.ensure(image, haveged, dry_run=dry_run)
+        except (ValueError, RuntimeError) as e:
+            print(f"❌ {e}")
+            sys.exit(1)
+    return image
+
+
+def generate_compose(topology, mgmt_net, volume_paths, ceos_image, dry_run, entropy_scripts=True,
+                     path='docker-compose.yml', log=print):
+    compose = {'version': COMPOSE_VERSION, 'services': {}, 'networks': {mgmt_net: {'external': True}}}
+
+    for link in topology.bridge_links:
+        compose['networks'][link.net_name] = {
             'driver': 'bridge',
-            'ipam': {'config': [{'subnet': str(link["subnet"])}]}
+            'ipam': {'config': [{'subnet': str(link.subnet)}]}
         }
 
-    for device in devices:
-        nets = [mgmt_net] + [link['net_name'] for link in links if device in (link['device1'], link['device2'])]
-        paths = volume_paths.get(device, {})
-
-        compose['services'][device] = {
+    for device in topology.devices.values():
+        bridged = [intf for intf in device.interfaces if intf.link.mode == 'bridge']
+        # Compose attaches networks by descending priority: management as eth0, then links as eth1..ethN
+        nets = {mgmt_net: {'priority': len(bridged) + 1}}
+        if device.mgmt_address is not None:
+            nets[mgmt_net]['ipv4_address'] = str(device.mgmt_address.ip)
+        for intf in bridged:
+            nets[intf.link.net_name] = {'priority': len(bridged) + 1 - intf.eth}
+        paths = volume_paths.get(device.name, {})
+
+        compose['services'][device.name] = {
             'image': ceos_image,
             'privileged': True,
-            'hostname': device,
+            'hostname': device.name,
             'volumes': [
                 {'type': 'bind', 'source': paths.get("ceos_config", ""), 'target': '/mnt/flash/ceos-config', 'read_only': True},
                 {'type': 'bind', 'source': paths.get("eos_mapping", ""), 'target': '/mnt/flash/EosIntfMapping.json', 'read_only': True},
-                {'type': 'bind', 'source': os.path.abspath("setup_entropy.sh"), 'target': '/mnt/flash/setup_entropy.sh', 'read_only': True},
-                {'type': 'bind', 'source': os.path.abspath("enable_entropy.sh"), 'target': '/mnt/flash/enable_entropy.sh', 'read_only': True},
             ],
-            'environment': {
-                'CEOS': '1', 'EOS_PLATFORM': 'ceoslab', 'container': 'docker',
-                'ETBA': '1', 'INTFTYPE': 'eth', 'SKIP_ZEROTOUCH_BARRIER_IN_SYSDBINIT': '1'
-            },
-            'command': (
-                '/sbin/init systemd.setenv=INTFTYPE=eth systemd.setenv=ETBA=1 '
-                'systemd.setenv=CEOS=1 systemd.setenv=EOS_PLATFORM=ceoslab '
-                'systemd.setenv=container=docker systemd.setenv=MAPETH0=1 '
-                'systemd.setenv=MGMT_INTF=eth0'
-            ),
+            'environment': CEOS_ENVIRONMENT,
+            'command': CEOS_COMMAND,
             'networks': nets
         }
+        if device.limits:
+            compose['services'][device.name].update(device.limits)
+        if entropy_scripts:
+            # Not needed with a derived image that already has haveged
+            compose['services'][device.name]['volumes'] += [
+                {'type': 'bind', 'source': os.path.abspath("setup_entropy.sh"), 'target': '/mnt/flash/setup_entropy.sh', 'read_only': True},
+                {'type': 'bind', 'source': os.path.abspath("enable_entropy.sh"), 'target': '/mnt/flash/enable_entropy.sh', 'read_only': True},
+            ]
+        if 'startup_config' in paths:
+            # Read-write so `write memory` inside the container persists
+            compose['services'][device.name]['volumes'].append(
+                {'type': 'bind', 'source': paths['startup_config'], 'target': '/mnt/flash/startup-config'})
 
-    with open('docker-compose.yml', 'w') as f:
-        yaml.dump(compose, f, default_flow_style=False, sort_keys=False)
+    if dry_run:
+        log(f"📝 Dry-run: would generate {path}.")
+        return compose
+
+    # Shared fields are written once as anchors (x-ceos, x-volumes) and streamed to disk
+    if not compose_yaml.write(path, compose):
+        log(f"📝 {path} unchanged.")
+    return compose
+
+
+def _digest(obj):
+    return hashlib.sha256(json.dumps(obj, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def input_hashes(compose, device_files):
+    """
+    Hash what each service and network is built from: its compose definition,
+    its device files and the definitions of the networks it attaches to.
+    """
+    networks = {name: _digest(cfg) for name, cfg in compose['networks'].items()}
+    devices = {
+        name: _digest({
+            'service': service,
+            'files': device_files.get(name, {}),
+            'networks': {n: networks.get(n) for n in service['networks']},
+        })
+        for name, service in compose['services'].items()
+    }
+    return {'devices': devices, 'networks': networks}
+
+
+def report_changes(compose, device_files, dry_run):
+    """
+    Compare input hashes with the previous run and print which devices and
+    networks changed. Returns the affected device names.
+    """
+    current = input_hashes(compose, device_files)
+    previous = load_json(MANIFEST)
+    if previous is None:
+        print("🔍 No previous generation found — every device is new.")
+        affected = list(current['devices'])
+    else:
+        changes = {}
+        for kind in ('devices', 'networks'):
+            old, new = previous.get(kind, {}), current[kind]
+            changes[kind] = (
+                [k for k in new if old.get(k) != new[k]],
+                [k for k in old if k not in new],
+            )
+        affected = changes['devices'][0]
+        if not any(changed or removed for changed, removed in changes.values()):
+            print("🔍 No changes since the last generation.")
+        for kind, (changed, removed) in changes.items():
+            if changed:
+                print(f"🔍 Changed {kind}: {', '.join(changed)}")
+            if removed:
+                print(f"🔍 Removed {kind}: {', '.join(removed)}")
+    if not dry_run:
+        save_json(MANIFEST, current)
+    return affected
+
+
+def write_fleet_copy(name, topology, mgmt_net, ceos_image, entropy_scripts, source):
+    """
+    Write one fleet copy: device files, compose file, hosts, inventory and the
+    topology, so every lab tool also works from inside the copy's directory.
+    Returns the lines it would have printed.
+    """
+    outdir = fleet.copy_dir(name)
+    lines = []
+    volume_paths, _ = generate_device_files(topology, mgmt_net, False, outdir=outdir, log=lines.append)
+    generate_compose(topology, mgmt_net, volume_paths, ceos_image, False, entropy_scripts=entropy_scripts,
+                     path=os.path.join(outdir, 'docker-compose.yml'), log=lines.append)
+    write_if_changed(os.path.join(outdir, mgmt_addresses.HOSTS_FILE), mgmt_addresses.render_hosts(topology))
+    write_if_changed(os.path.join(outdir, mgmt_addresses.INVENTORY_FILE), mgmt_addresses.render_inventory(topology))
+    write_if_changed(os.path.join(outdir, 'topology.yml'), source)
+    return lines
+
+
+def generate_fleet(args, topo, topology):
+    """
+    N isolated copies of one compiled topology: the Docker scan, image choice,
+    subnet blocks and management addresses are done once for the whole fleet,
+    then the copies are written in parallel.
+    """
+    try:
+        names = fleet.copy_names(args.fleet_prefix, args.fleet)
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    if topo.get('shards'):
+        print("❌ A fleet runs on this host only; remove shards: from the topology.")
+        sys.exit(1)
+    if topo.get('management_addresses'):
+        print("ℹ️ management_addresses is ignored in fleet mode: every copy needs its own addresses.")
+    with open(args.topology) as f:
+        source = f.read()
+
+    copies = {name: topology.clone() for name in names}
+    print(f"🚢 Fleet: {len(names)} copies of {len(topology.devices)} devices ({names[0]} … {names[-1]})")
+    if topo.get('resources', True) is not False:
+        with instrumentation.phase('capacity'):
+            check_capacity(topology, sharded=False, ignore=args.ignore_capacity, copies=list(copies.values()))
+    if topo.get('sysctl', True) is not False:
+        with instrumentation.phase('preflight'):
+            check_sysctls(topology, None, None, args.sysctl_dropin, args.dry_run, copies=len(names))
+
+    base_subnet = ipaddress.ip_network(topo.get('subnet_pool', str(DEFAULT_SUBNET_POOL)))
+    with instrumentation.phase('mgmt_network'):
+        mgmt_net, _ = ensure_or_select_mgmt_network(args.topology, auto=args.auto, dry_run=args.dry_run, parent=args.parent)
+    with instrumentation.phase('docker_scan'):
+        networks = leases.docker_snapshot()
+    try:
+        with instrumentation.phase('mgmt_addresses'):
+            fleet.plan_addresses(copies, mgmt_net, topo, dry_run=args.dry_run)
+        with instrumentation.phase('subnet_allocation'):
+            blocks = fleet.plan_blocks(names, topology, base_subnet, networks, dry_run=args.dry_run)
+            counts = [0, 0, 0]
+            for name, copy in copies.items():
+                path = os.path.join(fleet.copy_dir(name), leases.LEASES)
+                for i, n in enumerate(leases.assign(copy, blocks[name], networks, dry_run=args.dry_run,
+                                                             path=path, project=name)):
+                    counts[i] += n
+    except (ValueError, RuntimeError) as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    print(f"🔖 Link subnets: {counts[0]} kept, {counts[1]} new, {counts[2]} released "
+          f"in {len(names)} blocks of /{blocks[names[0]].prefixlen}.")
+
+    haveged = args.haveged or topo.get('haveged')
+    with instrumentation.phase('image_select'):
+        ceos_image = select_ceos_image(auto=args.auto, dry_run=args.dry_run, haveged=haveged)
+
+    if args.dry_run:
+        for name in names:
+            print(f"📝 Dry-run: would write {fleet.copy_dir(name)}/ (links in {blocks[name]})")
+        print("\n📝 Dry-run completed successfully.")
+        return
+
+    with instrumentation.phase('fleet_write'):
+        with ThreadPoolExecutor(max_workers=min(fleet.JOBS, len(names))) as pool:
+            results = pool.map(lambda name: write_fleet_copy(name, copies[name], mgmt_net, ceos_image,
+                                                             not haveged, source), names)
+            for name, lines in zip(names, results):
+                print(f"📦 {name}: {' '.join(lines)}")
+
+    print(f"\n✅ {len(names)} labs generated in {fleet.FLEET_DIR}/. 🎉\n")
+    print(f"📇 Each copy has its own {mgmt_addresses.HOSTS_FILE} and {mgmt_addresses.INVENTORY_FILE}.")
+    print(f"👉 To start a copy:\n   cd {fleet.copy_dir(names[0])} && docker-compose up -d\n")
+    print(f"👉 To start them all:\n   for d in {fleet.FLEET_DIR}/*/; do (cd $d && docker-compose up -d); done\n")
 
 
 def main():
     args = parse_args()
     setup_logging(args.verbose)
+    instrumentation.setup(args, 'generate-lab')
 
     if not os.path.isfile(args.topology):
         print(f"❌ Topology file '{args.topology}' does not exist.")
         sys.exit(1)
 
-    with open(args.topology) as f:
-        topo = yaml.safe_load(f)
+    with instrumentation.phase('yaml_load'):
+        with open(args.topology) as f:
+            topo = compose_yaml.load(f)
 
     try:
-        validate_topology(topo)
-    except Exception as e:
+        with instrumentation.phase('validation'):
+            topology = Topology.compile(topo)
+    except TopologyError as e:
         print(f"❌ Invalid topology file: {e}")
         sys.exit(1)
 
-    base_subnet = ipaddress.ip_network(topo.get('subnet_pool', str(DEFAULT_SUBNET_POOL)))
-    connections = topo['connections']
-
-    mgmt_net, _ = ensure_or_select_mgmt_network(args.topology, auto=args.auto, dry_run=args.dry_run, parent=args.parent)
+    if args.fleet is not None:
+        generate_fleet(args, topo, topology)
+        return
 
-    existing_docker_subnets = get_existing_docker_subnets()
-    devices = {}
-    used_subnets = set()
-    links = []
+    shards = assignment = None
+    if topo.get('shards'):
+        with instrumentation.phase('sharding'):
+            try:
+                shards = sharding.parse_hosts(topo['shards'])
+                assignment = sharding.partition(topology, shards)
+            except ValueError as e:
+                print(f"❌ Invalid shards: {e}")
+                sys.exit(1)
+            # Links that cross hosts need a bridge on each side for the tunnel
+            topology.to_bridge(sharding.cut_links(topology, assignment))
+        print("🧩 Shards:")
+        print(sharding.summary(topology, assignment, shards))
+
+    if topo.get('resources', True) is not False:
+        with instrumentation.phase('capacity'):
+            check_capacity(topology, sharded=bool(shards), ignore=args.ignore_capacity)
+
+    if topo.get('sysctl', True) is not False:
+        with instrumentation.phase('preflight'):
+            check_sysctls(topology, assignment, shards, args.sysctl_dropin, args.dry_run)
 
-    for link in connections:
-        subnet = next_subnet(used_subnets, existing_docker_subnets, base_subnet)
-        links.append({
-            'device1': link['device1'], 'intf1': link['intf1'],
-            'device2': link['device2'], 'intf2': link['intf2'],
-            'subnet': subnet
-        })
-        devices.setdefault(link['device1'], set()).add(link['intf1'])
-        devices.setdefault(link['device2'], set()).add(link['intf2'])
+    base_subnet = ipaddress.ip_network(topo.get('subnet_pool', str(DEFAULT_SUBNET_POOL)))
 
-    ceos_image = select_ceos_image(auto=args.auto, dry_run=args.dry_run)
-    volume_paths = generate_device_files(devices, connections, dry_run=args.dry_run)
-    generate_compose(devices, links, mgmt_net, volume_paths, ceos_image, dry_run=args.dry_run)
+    with instrumentation.phase('mgmt_network'):
+        mgmt_net, _ = ensure_or_select_mgmt_network(args.topology, auto=args.auto, dry_run=args.dry_run, parent=args.parent)
+
+    with instrumentation.phase('mgmt_addresses'):
+        try:
+            mgmt_addresses.plan(topology, mgmt_net, dry_run=args.dry_run)
+        except (ValueError, RuntimeError) as e:
+            print(f"❌ {e}")
+            sys.exit(1)
+
+    with instrumentation.phase('docker_scan'):
+        networks = leases.docker_snapshot()
+    with instrumentation.phase('subnet_allocation'):
+        try:
+            kept, new, released = leases.assign(topology, base_subnet, networks, dry_run=args.dry_run)
+        except (ValueError, RuntimeError) as e:
+            print(f"❌ {e}")
+            sys.exit(1)
+    print(f"🔖 Link subnets: {kept} kept, {new} new, {released} released.")
+
+    haveged = args.haveged or topo.get('haveged')
+    with instrumentation.phase('image_select'):
+        ceos_image = select_ceos_image(auto=args.auto, dry_run=args.dry_run, haveged=haveged)
+    with instrumentation.phase('device_files'):
+        volume_paths, device_files = generate_device_files(topology, mgmt_net, dry_run=args.dry_run)
+    with instrumentation.phase('compose_dump'):
+        compose = generate_compose(topology, mgmt_net, volume_paths, ceos_image, dry_run=args.dry_run,
+                                   entropy_scripts=not haveged)
+    if shards:
+        try:
+            sharding.write_shards(compose, topology, assignment, shards, dry_run=args.dry_run)
+        except ValueError as e:
+            print(f"❌ Invalid shards: {e}")
+            sys.exit(1)
+    if not args.dry_run:
+        write_if_changed(mgmt_addresses.HOSTS_FILE, mgmt_addresses.render_hosts(topology))
+        write_if_changed(mgmt_addresses.INVENTORY_FILE, mgmt_addresses.render_inventory(topology))
+    with instrumentation.phase('report_changes'):
+        affected = report_changes(compose, device_files, dry_run=args.dry_run)
 
     if not args.dry_run:
         print("\n✅ docker-compose.yml generated successfully. 🎉\n")
+        if shards:
+            print("👉 Multi-host: copy this directory to every host (same path), then on each host run:\n"
+                  "   docker-compose -f shards/<host>/docker-compose.yml up -d && sudo shards/<host>/tunnels.sh\n")
+        print(f"📇 Management addresses: {mgmt_addresses.HOSTS_FILE}, Ansible inventory: {mgmt_addresses.INVENTORY_FILE}")
         print("👉 To start your lab:\n   docker-compose up -d\n\n👉 To tear it down:\n   docker-compose down\n")
+        if affected and len(affected) < len(compose['services']):
+            print(f"👉 To recreate only what changed:\n   docker-compose up -d {' '.join(affected)}\n")
         show = input("👀 Would you like to see the contents of docker-compose.yml? [y/N]: ").strip().lower()
         if show == 'y':
             with open('docker-compose.yml') as f:
@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+
+import atexit
+import contextlib
+import functools
+import json
+import logging
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+
+from lab_utils import atomic_write
+
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+class Stats:
+    __slots__ = ('count', 'total', 'buckets', 'exit_codes', 'output_bytes')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.buckets = [0] * (len(BUCKETS) + 1)   # last slot is +Inf
+        self.exit_codes = {}
+        self.output_bytes = 0
+
+    def add(self, seconds, exit_code=None, output_bytes=0):
+        self.count += 1
+        self.total += seconds
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.buckets[i] += 1
+                break
+        else:
+            self.buckets[-1] += 1
+        if exit_code is not None:
+            self.exit_codes[str(exit_code)] = self.exit_codes.get(str(exit_code), 0) + 1
+        self.output_bytes += output_bytes
+
+    def as_dict(self):
+        return {
+            'count': self.count,
+            'seconds': round(self.total, 6),
+            'histogram': {str(b): n for b, n in zip(BUCKETS + ('+Inf',), self.buckets)},
+            'exit_codes': self.exit_codes,
+            'output_bytes': self.output_bytes,
+        }
+
+
+class Recorder:
+    """
+    Per-run timings of external calls (subprocesses and Docker API requests)
+    and of named phases, exportable as JSON or a Prometheus textfile.
+    """
+
+    def __init__(self, script=None):
+        self.script = script or os.path.basename(sys.argv[0]).replace('.py', '')
+        self.started = time.time()
+        self.calls = {}
+        self.phases = {}
+        self._lock = threading.Lock()
+
+    def record_call(self, kind, name, seconds, exit_code=None, output_bytes=0):
+        with self._lock:
+            self.calls.setdefault((kind, name), Stats()).add(seconds, exit_code, output_bytes)
+        logging.info("%s %s %.3fs exit=%s bytes=%d", kind, name, seconds, exit_code, output_bytes)
+
+    def record_phase(self, name, seconds):
+        with self._lock:
+            self.phases.setdefault(name, Stats()).add(seconds)
+        logging.info("phase %s %.3fs", name, seconds)
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_phase(name, time.perf_counter() - t0)
+
+    def report(self):
+        with self._lock:
+            return {
+                'script': self.script,
+                'started': datetime.fromtimestamp(self.started, timezone.utc).isoformat(timespec='seconds'),
+                'wall_seconds': round(time.time() - self.started, 6),
+                'phases': {name: s.as_dict() for name, s in self.phases.items()},
+                'calls': [dict(kind=kind, call=name, **s.as_dict()) for (kind, name), s in sorted(self.calls.items())],
+            }
+
+    def write_json(self, path):
+        atomic_write(path, json.dumps(self.report(), indent=2) + "\n")
+
+    def prometheus(self):
+        def labels(**kv):
+            return ",".join(f'{k}="{_escape(v)}"' for k, v in kv.items())
+
+        lines = [
+            "# HELP ceos_lab_call_duration_seconds Latency of external calls (subprocess, docker API).",
+            "# TYPE ceos_lab_call_duration_seconds histogram",
+        ]
+        with self._lock:
+            calls = sorted(self.calls.items())
+            phases = sorted(self.phases.items())
+        for (kind, name), s in calls:
+            base = labels(script=self.script, kind=kind, call=name)
+            cumulative = 0
+            for bound, n in zip(BUCKETS + ('+Inf',), s.buckets):
+                cumulative += n
+                lines.append(f'ceos_lab_call_duration_seconds_bucket{{{base},le="{bound}"}} {cumulative}')
+            lines.append(f'ceos_lab_call_duration_seconds_sum{{{base}}} {s.total:.6f}')
+            lines.append(f'ceos_lab_call_duration_seconds_count{{{base}}} {s.count}')
+        lines += ["# HELP ceos_lab_call_exit_total External calls by exit code.",
+                  "# TYPE ceos_lab_call_exit_total counter"]
+        for (kind, name), s in calls:
+            for code, n in sorted(s.exit_codes.items()):
+                lines.append(f'ceos_lab_call_exit_total{{{labels(script=self.script, kind=kind, call=name, code=code)}}} {n}')
+        lines += ["# HELP ceos_lab_call_output_bytes_total Bytes of output returned by external calls.",
+                  "# TYPE ceos_lab_call_output_bytes_total counter"]
+        for (kind, name), s in calls:
+            lines.append(f'ceos_lab_call_output_bytes_total{{{labels(script=self.script, kind=kind, call=name)}}} {s.output_bytes}')
+        lines += ["# HELP ceos_lab_phase_duration_seconds Total time spent in a named phase during the last run.",
+                  "# TYPE ceos_lab_phase_duration_seconds gauge"]
+        for name, s in phases:
+            lines.append(f'ceos_lab_phase_duration_seconds{{{labels(script=self.script, phase=name)}}} {s.total:.6f}')
+        lines.append(f'ceos_lab_last_run_timestamp_seconds{{{labels(script=self.script)}}} {self.started:.0f}')
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        # node_exporter's textfile collector must never see a half-written file
+        atomic_write(path, self.prometheus())
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+RECORDER = Recorder()
+
+
+def phase(name):
+    return RECORDER.phase(name)
+
+
+def timed(func):
+    """
+    Decorator: record every call of func as a phase named after it.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with RECORDER.phase(func.__name__):
+            return func(*args, **kwargs)
+    return wrapper
+
+
+def call_name(cmd):
+    """
+    Short, low-cardinality label for a command: program plus its subcommand.
+    """
+    if isinstance(cmd, str):
+        cmd = cmd.split()
+    words = [os.path.basename(str(cmd[0]))] if cmd else ['?']
+    for word in cmd[1:]:
+        word = str(word)
+        if word.startswith('-'):
+            if word in ('-batch', '-force', '-n', '-t'):
+                continue
+            break
+        if len(words) == 2 or not re.fullmatch(r'[a-z][a-z-]*', word):
+            break
+        words.append(word)
+    return " ".join(words)
+
+
+def _size(output):
+    if output is None:
+        return 0
+    return len(output.encode() if isinstance(output, str) else output)
+
+
+def run(cmd, **kwargs):
+    t0 = time.perf_counter()
+    code = None
+    result = None
+    try:
+        result = subprocess.run(cmd, **kwargs)
+        code = result.returncode
+        return result
+    except subprocess.CalledProcessError as e:
+        code = e.returncode
+        raise
+    finally:
+        out = _size(result.stdout) + _size(result.stderr) if result is not None else 0
+        RECORDER.record_call('subprocess', call_name(cmd), time.perf_counter() - t0, code, out)
+
+
+def check_output(cmd, **kwargs):
+    t0 = time.perf_counter()
+    code, out = None, 0
+    try:
+        output = subprocess.check_output(cmd, **kwargs)
+        code, out = 0, _size(output)
+        return output
+    except subprocess.CalledProcessError as e:
+        code, out = e.returncode, _size(e.output)
+        raise
+    finally:
+        RECORDER.record_call('subprocess', call_name(cmd), time.perf_counter() - t0, code, out)
+
+
+def popen(cmd, **kwargs):
+    """
+    Start a process; only the spawn is timed since its lifetime is the caller's business.
+    """
+    t0 = time.perf_counter()
+    try:
+        return subprocess.Popen(cmd, **kwargs)
+    finally:
+        RECORDER.record_call('spawn', call_name(cmd), time.perf_counter() - t0)
+
+
+def add_arguments(parser):
+    parser.add_argument('--profile', nargs='?', const='', metavar='REPORT',
+                        help='Write a per-run timing report (default: <script>-profile.json)')
+    parser.add_argument('--cprofile', metavar='FILE', help='Write cProfile stats to FILE (turns on --profile)')
+    parser.add_argument('--metrics-textfile', metavar='FILE',
+                        help='Write timings as a Prometheus textfile-collector file (e.g. /var/lib/node_exporter/ceos_lab.prom)')
+
+
+def setup(args, script):
+    """
+    Honour --profile/--cprofile/--metrics-textfile: outputs are written when the process exits.
+    """
+    RECORDER.script = script
+    # --cprofile implies --profile
+    report = None if args.profile is None and not args.cprofile else (args.profile or f'{script}-profile.json')
+    profiler = None
+    if args.cprofile:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+    if report is None and not args.metrics_textfile:
+        return
+
+    def write():
+        if profiler:
+            profiler.disable()
+            profiler.dump_stats(args.cprofile)
+        if report is not None:
+            RECORDER.write_json(report)
+            print(f"📄 Timing report written to {report}")
+        if args.metrics_textfile:
+            RECORDER.write_prometheus(args.metrics_textfile)
+
+    atexit.register(write)
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+
+import threading
+import time
+from datetime import datetime
+
+import docker_api
+from deployer import PROJECT_LABEL
+from lab_utils import atomic_write, normalise_project
+
+
+RUNNING_ACTIONS = {'start', 'restart', 'unpause'}
+STOPPED_ACTIONS = {'die', 'stop', 'oom'}
+
+
+class LabState:
+    """
+    In-process model of the lab's containers.
+
+    Seeded from one bulk listing, then kept current from the `docker events`
+    stream on a background thread. Every change is written atomically to the
+    status file so external tools can read lab status without querying Docker.
+    """
+
+    def __init__(self, project, status_file='lab_status.txt', log=print):
+        self.project = project
+        self.label = f'{PROJECT_LABEL}={normalise_project(project)}'
+        self.status_file = status_file
+        self.log = log
+        self.watch_error = None    # why the event stream stopped, once it has
+        self._states = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        since = int(time.time())
+        self.seed()
+        self._thread = threading.Thread(target=self._watch, args=(since,), daemon=True)
+        self._thread.start()
+        return self
+
+    def seed(self):
+        containers = docker_api.get_client().containers(all=True, filters={'label': [self.label]})
+        with self._lock:
+            self._states = {docker_api.container_name(c): c.get('State') or 'unknown' for c in containers}
+        self.write_status()
+
+    def refresh(self, *names):
+        """
+        Re-read the given containers right after we changed them ourselves,
+        without waiting for their events to arrive.
+        """
+        client = docker_api.get_client()
+        for name in names:
+            try:
+                info = client.inspect_container(name)
+                self._set(name, info.get('State', {}).get('Status', 'unknown'))
+            except docker_api.DockerError:
+                self._set(name, None)
+
+    @property
+    def watching(self):
+        return self._thread is not None and self.watch_error is None
+
+    def states(self):
+        """
+        Return {container: running}, sorted by name.
+        """
+        if not self.watching:
+            # The event stream is gone; fall back to a fresh listing.
+            self.seed()
+        with self._lock:
+            return {name: self._states[name] == 'running' for name in sorted(self._states)}
+
+    def is_running(self, name):
+        if not self.watching:
+            self.seed()
+        with self._lock:
+            return self._states.get(name) == 'running'
+
+    def _watch(self, since):
+        # The daemon drops other projects' events, so they never wake this thread
+        filters = {'type': ['container'], 'label': [self.label]}
+        try:
+            for event in docker_api.get_client().events(filters=filters, since=since):
+                self._apply(event)
+            reason = "the stream ended"
+        except Exception as e:
+            reason = str(e) or type(e).__name__
+        self.watch_error = reason
+        self.log(f"⚠️ Docker event stream lost ({reason}); lab status is re-read from Docker on every use")
+
+    def _apply(self, event):
+        attrs = (event.get('Actor') or {}).get('Attributes') or {}
+        name = attrs.get('name') or event.get('Name') or ''
+        action = (event.get('Action') or event.get('status') or event.get('Status') or '').split(':')[0]
+        if f"{PROJECT_LABEL}={attrs.get(PROJECT_LABEL)}" != self.label:
+            return
+        if action in RUNNING_ACTIONS:
+            self._set(name, 'running')
+        elif action in STOPPED_ACTIONS:
+            self._set(name, 'exited')
+        elif action == 'pause':
+            self._set(name, 'paused')
+        elif action == 'create':
+            self._set(name, 'created')
+        elif action == 'destroy':
+            self._set(name, None)
+        elif action == 'rename':
+            old = attrs.get('oldName', '').lstrip('/')
+            with self._lock:
+                state = self._states.pop(old, 'unknown')
+            self._set(name, state)
+
+    def _set(self, name, state):
+        with self._lock:
+            if self._states.get(name) == state:
+                return
+            if state is None:
+                self._states.pop(name, None)
+            else:
+                self._states[name] = state
+        self.write_status()
+
+    def write_status(self):
+        with self._lock:
+            lines = [f"# {self.project} {datetime.now().isoformat(timespec='seconds')}"]
+            for name in sorted(self._states):
+                status = "🟢 running" if self._states[name] == 'running' else "🔴 stopped"
+                lines.append(f"  {name} — {status}")
+            atomic_write(self.status_file, "\n".join(lines) + "\n")
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+
+import filecmp
+import json
+import os
+import re
+import tempfile
+
+
+# Per-lab state kept next to docker-compose.yml between runs
+STATE_DIR = '.lab-state'
+
+
+def normalise_project(name):
+    # Same normalisation as docker compose: lower case, only [a-z0-9_-]
+    return re.sub(r'[^a-z0-9_-]', '', name.lower())
+
+
+def compose_project(directory=None):
+    """
+    The compose project of a lab directory (default: the current one), found
+    as docker-compose does: COMPOSE_PROJECT_NAME from the environment (current
+    directory only) or the directory's .env file, else the directory name.
+    """
+    path = os.path.abspath(directory or os.getcwd())
+    name = None if directory else os.environ.get('COMPOSE_PROJECT_NAME')
+    return normalise_project(name or read_env(os.path.join(path, '.env')).get('COMPOSE_PROJECT_NAME')
+                             or os.path.basename(path))
+
+
+def read_env(path):
+    """
+    KEY=VALUE pairs of a compose .env file ({} if there is none).
+    """
+    env = {}
+    try:
+        with open(path) as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith('#') and '=' in line:
+                    key, value = line.split('=', 1)
+                    env[key.strip()] = value.strip().strip('\'"')
+    except FileNotFoundError:
+        pass
+    return env
+
+
+def atomic_write(path, data):
+    """
+    Write data to path via a temp file in the same directory and os.replace(),
+    so readers only ever see the old or the new contents.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    mode = 'wb' if isinstance(data, bytes) else 'w'
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=f'.{os.path.basename(path)}.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, mode) as f:
+            f.write(data)
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+
+
+def write_if_changed(path, data):
+    """
+    Atomically replace path with data unless it already holds exactly that.
+    Returns True if the file was written.
+    """
+    try:
+        with open(path, 'rb' if isinstance(data, bytes) else 'r') as f:
+            if f.read() == data:
+                return False
+    except FileNotFoundError:
+        pass
+    atomic_write(path, data)
+    return True
+
+
+def write_stream_if_changed(path, write):
+    """
+    Like write_if_changed, for output too big to build in memory: write(f) streams
+    into a temp file, which replaces path only if its contents differ.
+    Returns True if the file was written.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=f'.{os.path.basename(path)}.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            write(f)
+        if os.path.exists(path) and filecmp.cmp(tmp, path, shallow=False):
+            os.unlink(tmp)
+            return False
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+        return True
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+
+
+def load_json(path, default=None):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return default
+
+
+def save_json(path, data):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    atomic_write(path, json.dumps(data, indent=2, sort_keys=True) + "\n")
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+
+import bisect
+import ipaddress
+import os
+
+import docker_api
+from lab_utils import STATE_DIR, compose_project, load_json, save_json
+from subnet_allocator import SubnetAllocator
+
+
+# Link subnets and network names, keyed by the link's two endpoints
+LEASES = os.path.join(STATE_DIR, 'leases.json')
+# Subnets of the host's Docker networks, reused while the set of networks is unchanged
+SNAPSHOT = os.path.join(STATE_DIR, 'docker-subnets.json')
+
+
+def link_key(link):
+    return "--".join(sorted(f"{i.device.name}:{i.name}" for i in link.endpoints))
+
+
+def apply_names(topology):
+    """
+    Give the topology's links their leased network names and subnets, as generate-lab.py last wrote them.
+    """
+    leases = (load_json(LEASES) or {}).get('links', {})
+    for link in topology.links:
+        lease = leases.get(link_key(link))
+        if lease:
+            link.net_name = lease['net_name']
+            link.subnet = ipaddress.ip_network(lease['subnet'])
+    return topology
+
+
+def docker_snapshot(refresh=False):
+    """
+    Return [{'name', 'subnets'}] for every Docker network. The Engine API lists
+    them with their subnets in one call; through the CLI, which needs an
+    `inspect` of every network, the cached snapshot is reused until a network
+    is added or removed.
+    """
+    client = docker_api.get_client()
+    cached = load_json(SNAPSHOT)
+    if isinstance(client, docker_api.DockerCLI) and cached and not refresh:
+        if cached.get('ids') == client.network_ids():
+            return cached['networks']
+    listing = client.networks()
+    networks = [
+        {'name': net['Name'], 'subnets': sorted(str(s) for s in docker_api.network_subnets([net]))}
+        for net in listing
+    ]
+    save_json(SNAPSHOT, {'ids': sorted(net.get('Id', '') for net in listing), 'networks': networks})
+    return networks
+
+
+class _Ranges:
+    """
+    Sorted, merged address ranges for fast overlap tests.
+    """
+
+    def __init__(self, networks):
+        merged = []
+        for lo, hi in sorted((int(n.network_address), int(n.broadcast_address)) for n in networks):
+            if merged and lo <= merged[-1][1] + 1:
+                merged[-1][1] = max(merged[-1][1], hi)
+            else:
+                merged.append([lo, hi])
+        self.starts = [lo for lo, _ in merged]
+        self.ranges = merged
+
+    def overlaps(self, net):
+        lo, hi = int(net.network_address), int(net.broadcast_address)
+        i = bisect.bisect_right(self.starts, hi) - 1
+        return i >= 0 and self.ranges[i][1] >= lo
+
+
+def external_subnets(networks, leases, project):
+    """
+    Subnets of every Docker network except the lab's own link networks
+    (<project>_<net_name> with the leased subnet), which must not block their own lease.
+    Another project's network with the same link name is not ours (e.g. a copied lab).
+    """
+    ours = {(f"{project}_{lease['net_name']}", lease['subnet']) for lease in leases.values()}
+    subnets = set()
+    for net in networks:
+        for subnet in net['subnets']:
+            if (net['name'], subnet) not in ours:
+                subnets.add(ipaddress.ip_network(subnet, strict=False))
+    return subnets
+
+
+def assign(topology, pool, networks, dry_run=False, path=LEASES, project=None):
+    """
+    Give every link a subnet and network name. A link keeps its lease while its
+    endpoints, prefix length and pool stay the same and no other network took
+    the subnet; new links get a free subnet and a linkNN name never used before.
+    Leases of links no longer in the topology are released.
+    Returns (kept, new, released) counts. `project` is the compose project
+    (default: named after the current directory).
+    """
+    pool = ipaddress.ip_network(pool)
+    state = load_json(path) or {}
+    leases = state.get('links', {})
+    external = external_subnets(networks, leases, project or compose_project())
+    taken = _Ranges(external)
+
+    current = {}
+    names = set()
+    reserved = set(external)
+    fresh = []
+    for link in topology.links:
+        key = link_key(link)
+        lease = leases.get(key)
+        subnet = ipaddress.ip_network(lease['subnet']) if lease else None
+        if (subnet is not None and subnet.prefixlen == link.prefixlen and subnet.subnet_of(pool)
+                and not taken.overlaps(subnet) and lease['net_name'] not in names):
+            link.subnet = subnet
+            link.net_name = lease['net_name']
+            names.add(link.net_name)
+            reserved.add(subnet)
+            current[key] = lease
+        else:
+            fresh.append((key, link))
+
+    allocator = SubnetAllocator(pool, reserved)
+    # Released names are never handed out again: the old network may still exist in Docker
+    next_index = state.get('next_index', 1)
+    for key, link in fresh:
+        link.subnet = allocator.allocate(link.prefixlen)
+        if leases or link.net_name in names:
+            while f'link{next_index:02d}' in names:
+                next_index += 1
+            link.net_name = f'link{next_index:02d}'
+        names.add(link.net_name)
+        current[key] = {'net_name': link.net_name, 'subnet': str(link.subnet)}
+    next_index = max([next_index] + [int(n[4:]) + 1 for n in names if n[4:].isdigit()])
+
+    released = [key for key in leases if key not in current]
+    if not dry_run:
+        save_json(path, {'pool': str(pool), 'next_index': next_index, 'links': current})
+    return len(topology.links) - len(fresh), len(fresh), len(released)
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+
+import errno
+import socket
+import struct
+import time
+
+import instrumentation
+import net_tools
+
+
+# rtnetlink (linux/rtnetlink.h, linux/if_link.h)
+RTMGRP_LINK = 1
+RTM_NEWLINK = 16
+IFLA_IFNAME = 3
+IFLA_MTU = 4
+IFLA_MASTER = 10
+IFLA_LINKINFO = 18
+IFLA_INFO_KIND = 1
+
+NLMSGHDR = struct.Struct('=IHHII')     # len, type, flags, seq, pid
+IFINFOMSG = struct.Struct('=BxHiII')   # family, type, index, flags, change
+RTATTR = struct.Struct('=HH')          # len, type
+# Room for the burst of events when a whole lab starts at once
+RCVBUF = 4 << 20
+
+
+def _align(n):
+    return (n + 3) & ~3
+
+
+def parse_attrs(data, offset=0):
+    attrs = {}
+    while offset + RTATTR.size <= len(data):
+        length, kind = RTATTR.unpack_from(data, offset)
+        if length < RTATTR.size:
+            break
+        attrs[kind & 0x7fff] = data[offset + RTATTR.size:offset + length]
+        offset += _align(length)
+    return attrs
+
+
+def parse_links(data):
+    """
+    Yield (index, name, kind, master, mtu) for every RTM_NEWLINK message in a netlink datagram.
+    """
+    offset = 0
+    while offset + NLMSGHDR.size <= len(data):
+        length, msg_type, _, _, _ = NLMSGHDR.unpack_from(data, offset)
+        if length < NLMSGHDR.size:
+            break
+        if msg_type == RTM_NEWLINK:
+            body = data[offset + NLMSGHDR.size:offset + length]
+            _, _, index, _, _ = IFINFOMSG.unpack_from(body)
+            attrs = parse_attrs(body, IFINFOMSG.size)
+            info = parse_attrs(attrs.get(IFLA_LINKINFO, b''))
+            name = attrs.get(IFLA_IFNAME, b'').rstrip(b'\0').decode()
+            kind = info.get(IFLA_INFO_KIND, b'').rstrip(b'\0').decode()
+            master = struct.unpack('=I', attrs[IFLA_MASTER])[0] if IFLA_MASTER in attrs else None
+            mtu = struct.unpack('=I', attrs[IFLA_MTU])[0] if IFLA_MTU in attrs else None
+            yield index, name, kind, master, mtu
+        offset += _align(length)
+
+
+def _ifindex(name):
+    try:
+        return socket.if_nametoindex(name)
+    except OSError:
+        return None
+
+
+class LinkWatcher:
+    """
+    Apply the LLDP group_fwd_mask to the lab's bridges and an MTU to the veths
+    enslaved to them, the moment the kernel announces them on rtnetlink.
+    Each unknown bridge is looked up in Docker once, on its own, when it first
+    appears.
+
+    Links in veth mode are out of scope: they are created inside the
+    containers' namespaces, so the host never sees them, and the wiring
+    already gives them veth_mtu. They need no bridge for LLDP either.
+    Netlink carries no kernel timestamp, so reported times start when an
+    event is read and leave out the time it waited in the socket.
+    """
+
+    def __init__(self, lab, mtu=None, lldp=True, log=print):
+        self.lab = lab
+        self.mtu = mtu
+        self.lldp = lldp
+        self.log = log
+        self.bridges = {}       # ifindex -> name of the lab's bridges
+        self.foreign = {}       # ifindex -> name of bridges that are not (yet) the lab's
+        self.rechecked = set()  # foreign bridges looked up again once a veth joined them
+        self.sock = None
+
+    def open(self):
+        self.sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, socket.NETLINK_ROUTE)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, RCVBUF)
+        self.sock.bind((0, RTMGRP_LINK))
+        return self
+
+    def refresh(self):
+        """
+        Re-read the lab's bridges from Docker, and fix everything already there.
+        Subscribing first means nothing created meanwhile is missed.
+        """
+        t0 = time.perf_counter()
+        self.bridges = {}
+        for name in net_tools.lab_bridges(self.lab).values():
+            index = _ifindex(name)
+            if index is not None:
+                self.bridges[index] = name
+                self.foreign.pop(index, None)
+        for index, name in self.bridges.items():
+            self.on_bridge(name, t0)
+            for veth in net_tools.bridge_members(name):
+                self.on_veth(veth, name, net_tools.get_mtu(veth), t0)
+
+    def resolve(self, index, name, t0):
+        """
+        Look up one new bridge in Docker and, if it is the lab's, fix it and the veths already on it.
+        """
+        if net_tools.bridge_network(self.lab, name) is None:
+            self.foreign[index] = name
+            return
+        self.foreign.pop(index, None)
+        self.bridges[index] = name
+        self.on_bridge(name, t0)
+        for veth in net_tools.bridge_members(name):
+            self.on_veth(veth, name, net_tools.get_mtu(veth), t0)
+
+    def on_bridge(self, name, t0):
+        if not self.lldp:
+            return
+        mask = net_tools.get_group_fwd_mask(name)
+        if mask is not None and mask & net_tools.LLDP_BIT:
+            return
+        masks, failed = net_tools.enable_lldp([name])
+        self._done('lldp', f"LLDP on {name} (group_fwd_mask={masks[name]})", t0, failed)
+
+    def on_veth(self, name, bridge, mtu, t0):
+        if self.mtu is None or mtu == self.mtu:
+            return
+        failed = net_tools.set_mtu([name], self.mtu)
+        self._done('mtu', f"MTU {self.mtu} on {name} ({bridge})", t0, failed)
+
+    def _done(self, action, text, t0, failed):
+        seconds = time.perf_counter() - t0
+        instrumentation.RECORDER.record_call('netlink', action, seconds, exit_code=1 if failed else 0)
+        if failed:
+            self.log(f"⚠️ Failed: {text}")
+        else:
+            self.log(f"🔷 {text} {seconds * 1000:.1f} ms after the event was read")
+
+    def handle(self, index, name, kind, master, mtu, t0):
+        if kind == 'bridge':
+            if index not in self.bridges and index not in self.foreign:
+                self.resolve(index, name, t0)
+            elif index in self.bridges:
+                self.on_bridge(name, t0)
+        elif master is not None and name.startswith('ve'):
+            if master in self.foreign and master not in self.rechecked:
+                # The bridge may have appeared before Docker listed its network; containers attach later
+                self.rechecked.add(master)
+                self.resolve(master, self.foreign[master], t0)
+            if master in self.bridges:
+                if mtu != self.mtu:
+                    # Events queued before our own change still carry the old MTU
+                    mtu = net_tools.get_mtu(name)
+                self.on_veth(name, self.bridges[master], mtu, t0)
+
+    def run(self):
+        self.open()
+        self.refresh()
+        self.log(f"👀 Watching {len(self.bridges)} bridge(s) of {self.lab} for new links (Ctrl+C to stop)")
+        self.log("   Veth-mode links live in the containers' namespaces and are not watched")
+        try:
+            while True:
+                try:
+                    data = self.sock.recv(65536)
+                except OSError as e:
+                    if e.errno != errno.ENOBUFS:
+                        raise
+                    # Events were dropped: catch up from sysfs and Docker
+                    self.log("⚠️ Netlink overrun, re-scanning the lab")
+                    self.refresh()
+                    continue
+                t0 = time.perf_counter()
+                for link in parse_links(data):
+                    self.handle(*link, t0)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.sock.close()
@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""
+Check a running lab's wiring against its topology.
+
+    python3 lldp_verify.py [topology.yml] [--timeout 600]
+
+Every device is polled (concurrently, with backoff) until its Cli answers,
+its topology interfaces are up and its LLDP neighbors match the topology.
+Links are reported as ok, missing or miswired, and each device's
+time-to-ready is recorded in .lab-state/timeline.json.
+"""
+
+import argparse
+import heapq
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime
+
+import yaml
+
+import docker_api
+from lab_utils import STATE_DIR, compose_project, save_json
+from subgraph import induced_links
+
+
+TIMELINE = os.path.join(STATE_DIR, 'timeline.json')
+INTERFACES_COMMAND = ['Cli', '-c', 'show interfaces status | json']
+LLDP_COMMAND = ['Cli', '-c', 'show lldp neighbors | json']
+# Timeline milestones in the order a device reaches them
+STAGES = ('cli', 'interfaces', 'lldp')
+
+DEFAULT_VERIFY = {
+    'timeout': 600,       # seconds before giving up on devices that are not converged
+    'first_delay': 2,     # seconds between polls, growing by backoff up to max_delay
+    'backoff': 1.5,
+    'max_delay': 15,
+    'exec_timeout': 30,
+}
+
+
+def normalise_interface(name):
+    """
+    'Eth1', 'Et1/1', 'ethernet1' -> 'ethernet1', 'ethernet1/1'.
+    """
+    return re.sub(r'^et(h(ernet)?)?(?=\d)', 'ethernet', name.strip().lower())
+
+
+def normalise_host(name):
+    return name.split('.', 1)[0].lower()
+
+
+def expected_neighbors(topology, links=None):
+    """
+    {device: {interface: (peer device, peer interface)}} from the topology's
+    links (or only the given ones).
+    """
+    expected = {name: {} for name in topology.devices}
+    for link in topology.links if links is None else links:
+        for intf, peer in ((link.a, link.b), (link.b, link.a)):
+            expected[intf.device.name][normalise_interface(intf.name)] = (peer.device.name, peer.name)
+    return expected
+
+
+def parse_started_at(value):
+    """
+    Docker's StartedAt ('2025-07-17T01:30:12.123456789Z') as epoch seconds, or None.
+    """
+    if not value or value.startswith('0001-'):
+        return None
+    match = re.match(r'(\d{4}-\d\d-\d\dT\d\d:\d\d:\d\d)(\.\d+)?(Z|[+-]\d\d:\d\d)$', value)
+    if not match:
+        return None
+    stamp = match.group(1) + (match.group(2) or '.0')[:7] + match.group(3).replace('Z', '+00:00')
+    return datetime.fromisoformat(stamp).timestamp()
+
+
+class DeviceProgress:
+    __slots__ = ('device', 'container', 'started', 'reached', 'first_poll', 'late', 'neighbors', 'down', 'delay', 'error')
+
+    def __init__(self, device, container, delay):
+        self.device = device
+        self.container = container
+        self.started = None        # container start (epoch)
+        self.reached = {}          # stage -> epoch when first seen
+        self.first_poll = None
+        self.late = False          # Cli already answered at the first poll: times are upper bounds
+        self.neighbors = {}        # local interface -> (device, interface) as seen by LLDP
+        self.down = []             # topology interfaces not up yet
+        self.delay = delay
+        self.error = None
+
+    @property
+    def done(self):
+        return 'lldp' in self.reached
+
+
+class WiringVerifier:
+    """
+    Poll every device until its wiring matches the topology or the timeout
+    expires. At most `jobs` execs run at once; each device waits longer
+    between polls (backoff) while it is still booting.
+    """
+
+    def __init__(self, topology, containers, jobs=8, config=None, log=print):
+        # containers: {device: container name}
+        self.topology = topology
+        # In a partial lab only links with a container at both ends can come up
+        self.checked = induced_links(topology, {d for d in topology.devices if d in containers})
+        self.expected = expected_neighbors(topology, self.checked)
+        self.config = dict(DEFAULT_VERIFY)
+        self.config.update(topology.raw.get('verify') or {})
+        self.config.update(config or {})
+        self.jobs = max(1, jobs)
+        self.log = log
+        self.client = docker_api.get_client()
+        self.progress = {d: DeviceProgress(d, containers[d], self.config['first_delay'])
+                         for d in topology.devices if d in containers}
+        self.absent = sorted(d for d in topology.devices if d not in containers)
+
+    def _cli_json(self, container, command):
+        code, output = self.client.exec(container, command, timeout=self.config['exec_timeout'])
+        if code != 0:
+            return None
+        try:
+            return json.loads(output)
+        except ValueError:
+            return None
+
+    def poll(self, progress):
+        """
+        One poll of one device: advance it as far through STAGES as it gets.
+        """
+        first = progress.first_poll is None
+        if first:
+            progress.first_poll = time.time()
+            state = self.client.inspect_container(progress.container).get('State') or {}
+            progress.started = parse_started_at(state.get('StartedAt'))
+        wanted = self.expected[progress.device]
+
+        status = self._cli_json(progress.container, INTERFACES_COMMAND)
+        if status is None:
+            return
+        if 'cli' not in progress.reached:
+            progress.reached['cli'] = time.time()
+            progress.late = first
+        statuses = {normalise_interface(k): v.get('linkStatus') for k, v in (status.get('interfaceStatuses') or {}).items()}
+        progress.down = sorted(i for i in wanted if statuses.get(i) != 'connected')
+        if progress.down:
+            return
+        progress.reached.setdefault('interfaces', time.time())
+
+        lldp = self._cli_json(progress.container, LLDP_COMMAND)
+        if lldp is None:
+            return
+        progress.neighbors = {
+            normalise_interface(n['port']): (n.get('neighborDevice', ''), n.get('neighborPort', ''))
+            for n in lldp.get('lldpNeighbors') or [] if 'port' in n
+        }
+        if all(self.matches(progress.neighbors.get(intf), peer) for intf, peer in wanted.items()):
+            progress.reached.setdefault('lldp', time.time())
+
+    @staticmethod
+    def matches(seen, peer):
+        return (seen is not None and normalise_host(seen[0]) == peer[0].lower()
+                and normalise_interface(seen[1]) == normalise_interface(peer[1]))
+
+    def _poll_safely(self, progress):
+        try:
+            self.poll(progress)
+        except (docker_api.DockerError, OSError) as e:
+            progress.error = str(e)
+
+    def run(self):
+        deadline = time.monotonic() + self.config['timeout']
+        queue = [(0.0, d) for d in sorted(self.progress)]
+        heapq.heapify(queue)
+        running = {}
+        with ThreadPoolExecutor(max_workers=self.jobs) as pool:
+            while queue or running:
+                now = time.monotonic()
+                while queue and queue[0][0] <= now and len(running) < self.jobs:
+                    _, device = heapq.heappop(queue)
+                    running[pool.submit(self._poll_safely, self.progress[device])] = device
+                timeout = max(0.0, queue[0][0] - now) if queue and len(running) < self.jobs else None
+                if running:
+                    done, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+                else:
+                    time.sleep(timeout or 0)
+                    done = ()
+                for fut in done:
+                    progress = self.progress[running.pop(fut)]
+                    if progress.done:
+                        self.log(f"✅ {progress.device} converged")
+                    elif time.monotonic() < deadline:
+                        heapq.heappush(queue, (time.monotonic() + progress.delay, progress.device))
+                        progress.delay = min(progress.delay * self.config['backoff'], self.config['max_delay'])
+        return self.links()
+
+    def links(self):
+        """
+        [(link, status, detail)] with status 'ok', 'missing' or 'miswired'.
+        """
+        result = []
+        for link in self.checked:
+            status, details = 'ok', []
+            for intf, peer in ((link.a, link.b), (link.b, link.a)):
+                progress = self.progress.get(intf.device.name)
+                seen = progress.neighbors.get(normalise_interface(intf.name)) if progress else None
+                if self.matches(seen, (peer.device.name, peer.name)):
+                    continue
+                if seen is not None:
+                    status = 'miswired'
+                    details.append(f"{intf.device.name} {intf.name} sees {seen[0]} {seen[1]}")
+                else:
+                    status = 'missing' if status == 'ok' else status
+                    details.append(f"{intf.device.name} {intf.name} sees nothing")
+            result.append((link, status, "; ".join(details)))
+        return result
+
+    def timeline(self):
+        """
+        {device: {'started', 'cli', 'interfaces', 'lldp'}}: seconds after the
+        container started. 'approximate' is set when the device's Cli already
+        answered at the first poll, so the times are upper bounds.
+        """
+        result = {}
+        for device, p in sorted(self.progress.items()):
+            base = p.started or p.first_poll
+            entry = {'container': p.container,
+                     'started': datetime.fromtimestamp(p.started).isoformat(timespec='seconds') if p.started else None}
+            for stage in STAGES:
+                entry[stage] = round(p.reached[stage] - base, 1) if stage in p.reached and base else None
+            entry['approximate'] = p.late
+            if p.down:
+                entry['down'] = p.down
+            if p.error:
+                entry['error'] = p.error
+            result[device] = entry
+        return result
+
+    def save(self, path=TIMELINE):
+        save_json(path, {'generated': datetime.now().isoformat(timespec='seconds'), 'devices': self.timeline()})
+
+    def report(self):
+        def fmt(value):
+            return '-' if value is None else f"{value:.1f}s"
+
+        lines = [f"{'Device':<20} {'Cli':>8} {'Intfs up':>9} {'LLDP':>8}"]
+        for device, t in self.timeline().items():
+            mark = '≤' if t['approximate'] else ' '
+            lines.append(f"{device:<20} {mark}{fmt(t['cli']):>7} {fmt(t['interfaces']):>9} {fmt(t['lldp']):>8}")
+        for device in self.absent:
+            lines.append(f"{device:<20} {'no container':>27}")
+        problems = [(link, status, detail) for link, status, detail in self.links() if status != 'ok']
+        lines.append(f"\n{len(self.checked) - len(problems)}/{len(self.checked)} links verified")
+        skipped = len(self.topology.links) - len(self.checked)
+        if skipped:
+            lines.append(f"ℹ️ {skipped} links not checked: a device at one end has no running container")
+        for link, status, detail in problems:
+            icon = '❌' if status == 'miswired' else '⚠️'
+            lines.append(f"  {icon} {status}: {link.a.device.name} {link.a.name} ↔ {link.b.device.name} {link.b.name} ({detail})")
+        if any(link.mode == 'bridge' for link in self.checked) and not any(p.neighbors for p in self.progress.values()):
+            lines.append("ℹ️ No LLDP neighbors at all: Linux bridges drop LLDP until it is enabled on the lab's bridges.")
+        return "\n".join(lines)
+
+
+def main():
+    from deployer import project_containers
+    from topology import Topology, TopologyError
+
+    parser = argparse.ArgumentParser(description="Verify a running lab's wiring with LLDP.")
+    parser.add_argument('topology', nargs='?', default='topology.yml', help='Topology YAML file (default: topology.yml)')
+    parser.add_argument('--timeout', type=int, help=f"Seconds to wait for convergence (default: {DEFAULT_VERIFY['timeout']})")
+    parser.add_argument('--jobs', type=int, default=8, help='Devices polled at once (default: 8)')
+    args = parser.parse_args()
+
+    with open(args.topology) as f:
+        raw = yaml.safe_load(f)
+    try:
+        topology = Topology.compile(raw)
+    except TopologyError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    project = compose_project()
+    containers = project_containers(project, all=False)
+    verifier = WiringVerifier(topology, containers, jobs=args.jobs,
+                              config={'timeout': args.timeout} if args.timeout else None)
+    links = verifier.run()
+    verifier.save()
+    print(verifier.report())
+    sys.exit(0 if all(status == 'ok' for _, status, _ in links) else 1)
+
+
+if __name__ == "__main__":
+    main()
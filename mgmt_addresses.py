@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+
+import ipaddress
+import os
+
+import yaml
+
+from boot_scheduler import device_role
+from lab_utils import STATE_DIR, load_json, save_json
+from mgmt_network import DEFAULT_MGMT_SUBNET, mgmt_network_info
+
+
+# Management address reservations, kept across runs so devices keep their address
+MGMT_STATE = os.path.join(STATE_DIR, 'mgmt-addresses.json')
+HOSTS_FILE = 'mgmt-hosts'
+INVENTORY_FILE = 'inventory.yml'
+
+
+def assign(devices, subnet, gateway=None, in_use=None, previous=None, pinned=None):
+    """
+    Return {device: address} for every device. Pinned addresses come first, then
+    previous reservations still valid in the subnet, then the lowest free address
+    for each new device in name order. Addresses held by containers that are not
+    one of our reservations are never handed out.
+    """
+    previous = {dev: ipaddress.ip_address(ip) for dev, ip in (previous or {}).items()}
+    ours = set(previous.values())
+    taken = {subnet.network_address, subnet.broadcast_address}
+    if gateway is not None:
+        taken.add(gateway)
+    taken.update(ip for ip in (in_use or {}) if ip not in ours)
+
+    result = {}
+    for dev, ip in (pinned or {}).items():
+        if dev not in devices:
+            continue
+        ip = ipaddress.ip_address(ip)
+        if ip not in subnet or ip in taken:
+            raise ValueError(f"Management address {ip} for {dev} is outside {subnet} or already in use")
+        result[dev] = ip
+        taken.add(ip)
+    for dev in devices:
+        ip = previous.get(dev)
+        if dev not in result and ip is not None and ip in subnet and ip not in taken:
+            result[dev] = ip
+            taken.add(ip)
+
+    free = (ip for ip in subnet.hosts() if ip not in taken)
+    for dev in sorted(d for d in devices if d not in result):
+        ip = next(free, None)
+        if ip is None:
+            raise RuntimeError(f"No more available management addresses in {subnet}!")
+        result[dev] = ip
+    return {dev: result[dev] for dev in devices}
+
+
+def network_plan(raw, mgmt_net):
+    """
+    (subnet, gateway, {address: container}) of the management network, or of
+    what it will be when it does not exist yet.
+    """
+    subnet, gateway, in_use = mgmt_network_info(mgmt_net)
+    if subnet is None:
+        # The network is only created on a real run; plan against what it will be.
+        subnet = ipaddress.ip_network(raw.get('management_subnet', DEFAULT_MGMT_SUBNET), strict=False)
+        gateway = raw.get('management_gateway') or next(subnet.hosts())
+    gateway = ipaddress.ip_address(gateway) if gateway else None
+    return subnet, gateway, in_use
+
+
+def plan(topology, mgmt_net, dry_run=False):
+    """
+    Give every device of the compiled topology a static management address
+    (set as device.mgmt_address) and persist the reservations.
+    """
+    raw = topology.raw
+    subnet, gateway, in_use = network_plan(raw, mgmt_net)
+
+    state = load_json(MGMT_STATE, {})
+    previous = state.get('addresses', {}) if state.get('network') == mgmt_net else {}
+    addresses = assign(list(topology.devices), subnet, gateway, in_use, previous,
+                       raw.get('management_addresses'))
+    for name, ip in addresses.items():
+        topology.devices[name].mgmt_address = ipaddress.ip_interface(f"{ip}/{subnet.prefixlen}")
+
+    if not dry_run:
+        save_json(MGMT_STATE, {'network': mgmt_net, 'subnet': str(subnet),
+                               'addresses': {dev: str(ip) for dev, ip in addresses.items()}})
+    return addresses
+
+
+def render_hosts(topology):
+    lines = [f"{d.mgmt_address.ip}\t{d.name} {d.name.lower()}\n"
+             for d in topology.devices.values() if d.mgmt_address is not None]
+    return "# cEOS lab management addresses (generated by generate-lab.py)\n" + "".join(lines)
+
+
+def render_inventory(topology):
+    """
+    Ansible inventory grouped by role, reaching devices over eAPI by default.
+    """
+    groups = {}
+    for device in topology.devices.values():
+        if device.mgmt_address is None:
+            continue
+        role = device_role(device.name, topology.raw)
+        groups.setdefault(role, {})[device.name] = {'ansible_host': str(device.mgmt_address.ip)}
+    inventory = {'all': {
+        'vars': {
+            'ansible_user': 'admin',
+            'ansible_network_os': 'arista.eos.eos',
+            'ansible_connection': 'ansible.netcommon.httpapi',
+            'ansible_httpapi_use_ssl': True,
+            'ansible_httpapi_validate_certs': False,
+        },
+        'children': {role: {'hosts': hosts} for role, hosts in sorted(groups.items())},
+    }}
+    return yaml.safe_dump(inventory, sort_keys=False)
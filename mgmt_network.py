@@ -1,13 +1,19 @@
 #!/usr/bin/env python3
 
+import ipaddress
 import subprocess
 import yaml
 import os
+import docker_api
+import instrumentation
+
+
+DEFAULT_MGMT_SUBNET = '192.168.150.0/24'
 
 
 def is_podman():
     try:
-        out = subprocess.check_output(["docker", "--version"], stderr=subprocess.STDOUT).decode()
+        out = instrumentation.check_output(["docker", "--version"], stderr=subprocess.STDOUT).decode()
         return "podman" in out.lower()
     except Exception:
         return False
@@ -20,10 +26,10 @@ def list_physical_interfaces():
     ]
 
 
-def create_macvlan_network(dry_run=False, parent=None):
+def create_macvlan_network(dry_run=False, parent=None, subnet=None, gateway=None):
     name = 'a-135'
-    subnet = '192.168.150.0/24'
-    gateway = '192.168.150.1'
+    subnet = subnet or DEFAULT_MGMT_SUBNET
+    gateway = gateway or str(next(ipaddress.ip_network(subnet, strict=False).hosts()))
 
     if not parent:
         interfaces = list_physical_interfaces()
@@ -63,12 +69,15 @@ def create_macvlan_network(dry_run=False, parent=None):
             name
         ]
 
-    subprocess.run(args, check=True)
+    instrumentation.run(args, check=True)
     print(f"✅ Created macvlan network '{name}' on '{parent}' in mode '{mode}'")
     return name, mode, True
 
 
 def ensure_or_select_mgmt_network(topo_file, auto=False, dry_run=False, parent=None):
+    with open(topo_file) as f:
+        topo = yaml.safe_load(f) or {}
+    subnet, gateway = topo.get('management_subnet'), topo.get('management_gateway')
     while True:
         existing = list_existing_macvlan_networks()
         if existing:
@@ -77,12 +86,12 @@ def ensure_or_select_mgmt_network(topo_file, auto=False, dry_run=False, parent=N
                 print(f"  {idx}. {name} → {iface} [mode: {mode}]")
             choice = input("👉 Choose one or [C]reate new: ").strip().lower()
             if choice == 'c':
-                mgmt_net, mode, created = create_macvlan_network(dry_run, parent)
+                mgmt_net, mode, created = create_macvlan_network(dry_run, parent, subnet, gateway)
             else:
                 mgmt_net, _, mode = existing[int(choice)-1]
                 created = False
         else:
-            mgmt_net, mode, created = create_macvlan_network(dry_run, parent)
+            mgmt_net, mode, created = create_macvlan_network(dry_run, parent, subnet, gateway)
 
         if mode != 'private':
             print(f"⚠️ WARNING: public mode. LLDP/broadcast frames may reach your mgmt network.")
@@ -95,8 +104,6 @@ def ensure_or_select_mgmt_network(topo_file, auto=False, dry_run=False, parent=N
         print(f"📝 Dry-run: would update topology.yml with management_network: {mgmt_net}")
         return mgmt_net, created
 
-    with open(topo_file) as f:
-        topo = yaml.safe_load(f)
     if topo.get('management_network') != mgmt_net:
         topo['management_network'] = mgmt_net
         with open(topo_file, 'w') as f:
@@ -106,15 +113,34 @@ def ensure_or_select_mgmt_network(topo_file, auto=False, dry_run=False, parent=N
 
 
 def list_existing_macvlan_networks():
-    output = subprocess.check_output(
-        ['docker', 'network', 'ls', '--filter', 'driver=macvlan', '--format', '{{.Name}}']
-    ).decode().splitlines()
-
     networks = []
-    for name in output:
-        inspect = yaml.safe_load(subprocess.check_output(['docker', 'network', 'inspect', name]).decode())[0]
-        parent = inspect.get('Options', {}).get('parent', 'unknown')
-        mode = inspect.get('Options', {}).get('macvlan_mode', 'bridge')
+    macvlans = docker_api.get_client().networks(filters={'driver': ['macvlan']})
+    for inspect in sorted(macvlans, key=lambda n: n['Name']):
+        options = inspect.get('Options') or {}
+        parent = options.get('parent', 'unknown')
+        mode = options.get('macvlan_mode', 'bridge')
         mode_str = 'private' if mode == 'private' else 'public'
-        networks.append((name, parent, mode_str))
+        networks.append((inspect['Name'], parent, mode_str))
     return networks
+
+
+def mgmt_network_info(name):
+    """
+    Return (subnet, gateway, {address: container name}) for a management network,
+    or (None, None, {}) if it does not exist (yet).
+    """
+    try:
+        inspect = docker_api.get_client().inspect_network(name)
+    except docker_api.DockerError:
+        return None, None, {}
+    configs = (inspect.get('IPAM') or {}).get('Config') or []
+    config = next((c for c in configs if c.get('Subnet') and ':' not in c['Subnet']), None)
+    if config is None:
+        return None, None, {}
+    subnet = ipaddress.ip_network(config['Subnet'], strict=False)
+    gateway = ipaddress.ip_address(config['Gateway']) if config.get('Gateway') else None
+    in_use = {}
+    for container in (inspect.get('Containers') or {}).values():
+        if container.get('IPv4Address'):
+            in_use[ipaddress.ip_interface(container['IPv4Address']).ip] = container.get('Name', '')
+    return subnet, gateway, in_use
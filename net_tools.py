@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+
+import os
+import re
+import subprocess
+
+import docker_api
+import instrumentation
+
+
+SYS_NET = '/sys/class/net'
+LLDP_BIT = 16384
+
+
+def _is_lab_link(lab, net):
+    return (re.match(r'{}_(?!default\b)\S+'.format(re.escape(lab)), net['Name']) is not None
+            and net.get('Driver', 'bridge') == 'bridge')
+
+
+def _bridge_of(net):
+    options = net.get('Options') or {}
+    return options.get('com.docker.network.bridge.name') or f"br-{net['Id'][:12]}"
+
+
+def lab_bridges(lab):
+    """
+    Return {docker network name: Linux bridge name} for the lab's link networks.
+    """
+    networks = docker_api.get_client().networks(filters={'name': [lab]})
+    return {net['Name']: _bridge_of(net) for net in sorted(networks, key=lambda n: n['Name']) if _is_lab_link(lab, net)}
+
+
+def bridge_network(lab, bridge):
+    """
+    Name of the lab's link network behind a Linux bridge, or None. Docker names
+    bridges br-<network id prefix>, so a single inspect finds the network; only
+    bridges with a custom name need the lab's network listing.
+    """
+    if not re.fullmatch(r'br-[0-9a-f]{12}', bridge):
+        return next((name for name, br in lab_bridges(lab).items() if br == bridge), None)
+    try:
+        net = docker_api.get_client().inspect_network(bridge[3:])
+    except docker_api.DockerError:
+        return None
+    return net['Name'] if _is_lab_link(lab, net) and _bridge_of(net) == bridge else None
+
+
+def _read(path):
+    with open(path) as f:
+        return f.read().strip()
+
+
+def _write(path, value):
+    with open(path, 'w') as f:
+        f.write(f"{value}\n")
+
+
+def bridge_members(bridge, prefix='ve'):
+    """
+    Interfaces enslaved to the bridge, read from /sys/class/net/<bridge>/brif.
+    """
+    try:
+        return sorted(i for i in os.listdir(f"{SYS_NET}/{bridge}/brif") if i.startswith(prefix))
+    except FileNotFoundError:
+        return []
+
+
+def get_mtu(iface):
+    try:
+        return int(_read(f"{SYS_NET}/{iface}/mtu"))
+    except (OSError, ValueError):
+        return None
+
+
+def _apply(writes, batch_lines, applied):
+    """
+    Try each sysfs write; whatever fails is retried in one `ip -batch` call.
+    Returns the list of items that could not be applied.
+    """
+    pending = []
+    for item, path, value in writes:
+        try:
+            _write(path, value)
+        except OSError:
+            pending.append(item)
+    if not pending:
+        return []
+    batch = "".join(batch_lines[item] + "\n" for item in pending)
+    try:
+        result = instrumentation.run(['ip', '-force', '-batch', '-'], input=batch, text=True,
+                                     stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    except OSError:
+        return pending
+    if result.returncode == 0:
+        return []
+    # -force runs every line even after one fails: only report what did not take effect
+    return [item for item in pending if not applied(item)]
+
+
+def set_mtu(ifaces, mtu):
+    """
+    Set the MTU of every interface in one pass. Returns the ones that failed.
+    """
+    writes = [(i, f"{SYS_NET}/{i}/mtu", mtu) for i in ifaces]
+    batch = {i: f"link set dev {i} mtu {mtu}" for i in ifaces}
+    return _apply(writes, batch, lambda i: get_mtu(i) == mtu)
+
+
+def get_group_fwd_mask(bridge):
+    try:
+        return int(_read(f"{SYS_NET}/{bridge}/bridge/group_fwd_mask"), 0)
+    except (OSError, ValueError):
+        return None
+
+
+def set_group_fwd_mask(masks):
+    """
+    Apply {bridge: mask} in one pass. Returns the bridges that failed.
+    """
+    writes = [(b, f"{SYS_NET}/{b}/bridge/group_fwd_mask", m) for b, m in masks.items()]
+    batch = {b: f"link set dev {b} type bridge group_fwd_mask {m}" for b, m in masks.items()}
+    return _apply(writes, batch, lambda b: get_group_fwd_mask(b) == masks[b])
+
+
+def enable_lldp(bridges):
+    """
+    Set the LLDP bit in group_fwd_mask on every bridge, keeping the other bits.
+    Returns ({bridge: new mask}, [failed bridges]).
+    """
+    masks = {b: (get_group_fwd_mask(b) or 0) | LLDP_BIT for b in bridges}
+    return masks, set_group_fwd_mask(masks)
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+
+import os
+
+
+PROC_SYS = '/proc/sys'
+DROPIN = '/etc/sysctl.d/90-ceos-lab.conf'
+
+# (sysctl, base, per device, per link end, per bridge link): the minimum a lab needs.
+# cEOS agents hold a handful of inotify instances and thousands of watches each, Sysdb
+# uses Linux AIO, and every device runs a few hundred threads. The neighbor table is
+# shared by all network namespaces: each link end learns its peer (ARP and IPv6 ND),
+# and the host learns both ends of every bridge link through the bridge gateway.
+REQUIREMENTS = (
+    ('fs.inotify.max_user_instances', 16, 6, 0, 0),
+    ('fs.inotify.max_user_watches', 4096, 4096, 0, 0),
+    ('fs.aio-max-nr', 16384, 2048, 0, 0),
+    ('kernel.pid_max', 4096, 1024, 0, 0),
+    ('kernel.threads-max', 4096, 1024, 0, 0),
+    ('net.ipv4.neigh.default.gc_thresh3', 256, 4, 2, 2),
+    ('net.ipv6.neigh.default.gc_thresh3', 256, 4, 2, 2),
+)
+# The drop-in leaves this much headroom over the minimum
+HEADROOM = 2
+
+
+def read_sysctl(key):
+    try:
+        with open(os.path.join(PROC_SYS, *key.split('.'))) as f:
+            return int(f.read().split()[0])
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def host_counts(topology, devices=None):
+    """
+    (devices, link ends, bridge links) for the given devices (default: all).
+    """
+    devices = set(topology.devices) if devices is None else set(devices)
+    ends = bridges = 0
+    for link in topology.links:
+        here = sum(1 for intf in link.endpoints if intf.device.name in devices)
+        ends += here
+        if here and link.mode == 'bridge':
+            bridges += 1
+    return len(devices), ends, bridges
+
+
+def required(counts):
+    devices, ends, bridges = counts
+    return {key: base + devices * dev + ends * end + bridges * br
+            for key, base, dev, end, br in REQUIREMENTS}
+
+
+def check(counts):
+    """
+    Return [(sysctl, current, needed)] for every sysctl below what the lab needs.
+    Sysctls the host does not expose are skipped.
+    """
+    shortfalls = []
+    for key, need in required(counts).items():
+        current = read_sysctl(key)
+        if current is not None and current < need:
+            shortfalls.append((key, current, need))
+    return shortfalls
+
+
+def _round_up(n):
+    return 1 << (n - 1).bit_length()
+
+
+def tuned(counts):
+    """
+    {sysctl: value} to write: the need with headroom, never lower than the current value.
+    The IPv4/IPv6 gc_thresh1/2 follow gc_thresh3, so garbage collection starts well before the hard limit.
+    """
+    values = {}
+    for key, need in required(counts).items():
+        value = max(read_sysctl(key) or 0, _round_up(need * HEADROOM))
+        values[key] = value
+        if key.endswith('gc_thresh3'):
+            prefix = key[:-len('gc_thresh3')]
+            values[prefix + 'gc_thresh2'] = max(read_sysctl(prefix + 'gc_thresh2') or 0, value // 2)
+            values[prefix + 'gc_thresh1'] = max(read_sysctl(prefix + 'gc_thresh1') or 0, value // 8)
+    return values
+
+
+def render_dropin(counts):
+    devices, ends, bridges = counts
+    lines = [f"# cEOS lab limits for {devices} devices, {ends} link ends, {bridges} bridge links (generated by generate-lab.py)",
+             "# Apply with: sudo sysctl --system"]
+    lines += [f"{key} = {value}" for key, value in sorted(tuned(counts).items())]
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+"""
+Split a topology across several hosts.
+
+    python3 sharding.py topology.yml --hosts lab1:12,lab2:12
+
+Devices are partitioned to balance load against each host's capacity while
+cutting as few links as possible; every cut link is stitched back together
+with a VXLAN (or gretap) tunnel between the two hosts.
+"""
+
+import argparse
+import math
+import os
+import sys
+from collections import Counter, deque
+
+import yaml
+
+import compose_yaml
+from lab_utils import compose_project, write_if_changed
+
+
+DEFAULT_VNI_BASE = 10000
+TUNNEL_TYPES = ('vxlan', 'gretap')
+VXLAN_PORT = 4789
+# Refinement passes; each pass only continues while it still reduces the cut
+MAX_PASSES = 10
+
+
+class Host:
+    __slots__ = ('name', 'capacity', 'address')
+
+    def __init__(self, name, capacity, address=None):
+        self.name = name
+        self.capacity = capacity
+        self.address = address
+
+
+def parse_hosts(spec):
+    """
+    Hosts from the topology's `shards:` list ({host, capacity, address}) or
+    from a 'name:capacity[:address],...' string.
+    """
+    if isinstance(spec, str):
+        spec = [dict(zip(('host', 'capacity', 'address'), item.split(':', 2))) for item in spec.split(',') if item]
+    hosts = []
+    for entry in spec or []:
+        if not isinstance(entry, dict) or 'host' not in entry or 'capacity' not in entry:
+            raise ValueError(f"Invalid shard entry (needs host and capacity): {entry}")
+        try:
+            capacity = int(entry['capacity'])
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid capacity for shard {entry['host']}: {entry['capacity']!r}")
+        hosts.append(Host(str(entry['host']), capacity, entry.get('address')))
+    names = [h.name for h in hosts]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Duplicate shard hosts: {', '.join(names)}")
+    return hosts
+
+
+def adjacency(topology):
+    adj = {name: Counter() for name in topology.devices}
+    for link in topology.links:
+        a, b = link.a.device.name, link.b.device.name
+        adj[a][b] += 1
+        adj[b][a] += 1
+    return adj
+
+
+def _limits(hosts, devices):
+    total = sum(h.capacity for h in hosts)
+    if total < devices:
+        raise ValueError(f"{devices} devices do not fit on {len(hosts)} hosts with a total capacity of {total}")
+    # Balanced share of each host, never above its capacity
+    return {h.name: min(h.capacity, math.ceil(devices * h.capacity / total)) for h in hosts}
+
+
+def _bfs_order(adj):
+    seen = set()
+    order = []
+    for start in sorted(adj, key=lambda d: (-sum(adj[d].values()), d)):
+        if start in seen:
+            continue
+        seen.add(start)
+        queue = deque([start])
+        while queue:
+            device = queue.popleft()
+            order.append(device)
+            for peer in sorted(adj[device], key=lambda p: (-adj[device][p], p)):
+                if peer not in seen:
+                    seen.add(peer)
+                    queue.append(peer)
+    return order
+
+
+def _refine(adj, assignment, load, limits):
+    """
+    Kernighan-Lin style refinement: move single boundary devices to a host with
+    spare room, then swap device pairs across hosts, while either lowers the cut.
+    """
+    def conn(device):
+        c = Counter()
+        for peer, n in adj[device].items():
+            c[assignment[peer]] += n
+        return c
+
+    for _ in range(MAX_PASSES):
+        improved = False
+        for device in sorted(adj):
+            here = assignment[device]
+            c = conn(device)
+            best, gain = None, 0
+            for host, n in sorted(c.items()):
+                if host != here and load[host] < limits[host] and n - c[here] > gain:
+                    best, gain = host, n - c[here]
+            if best is not None:
+                assignment[device] = best
+                load[here] -= 1
+                load[best] += 1
+                improved = True
+
+        conns = {d: conn(d) for d in adj}
+        boundary = sorted(d for d in adj if len(conns[d]) > 1 or assignment[d] not in conns[d])
+        locked = set()
+        for u in boundary:
+            if u in locked:
+                continue
+            a = assignment[u]
+            best, best_gain = None, 0
+            for v in boundary:
+                b = assignment[v]
+                if b == a or v in locked:
+                    continue
+                gain = (conns[u][b] - conns[u][a]) + (conns[v][a] - conns[v][b]) - 2 * adj[u][v]
+                if gain > best_gain:
+                    best, best_gain = v, gain
+            if best is None:
+                continue
+            b = assignment[best]
+            assignment[u], assignment[best] = b, a
+            for device, old, new in ((u, a, b), (best, b, a)):
+                for peer, n in adj[device].items():
+                    conns[peer][old] -= n
+                    conns[peer][new] += n
+            locked.update((u, best))
+            improved = True
+        if not improved:
+            break
+    return assignment
+
+
+def partition(topology, hosts):
+    """
+    Return {device: host name}. Devices are placed greedily in BFS order next to
+    their already-placed neighbours, then refined to reduce the number of cut links.
+    """
+    if not hosts:
+        raise ValueError("No shard hosts given")
+    adj = adjacency(topology)
+    limits = _limits(hosts, len(adj))
+    load = {h.name: 0 for h in hosts}
+    order = {h.name: i for i, h in enumerate(hosts)}
+    assignment = {}
+    for device in _bfs_order(adj):
+        together = Counter()
+        for peer, n in adj[device].items():
+            if peer in assignment:
+                together[assignment[peer]] += n
+        candidates = [h for h in load if load[h] < limits[h]]
+        host = max(candidates, key=lambda h: (together[h], -load[h] / limits[h], -order[h]))
+        assignment[device] = host
+        load[host] += 1
+    return _refine(adj, assignment, load, limits)
+
+
+def cut_links(topology, assignment):
+    return [link for link in topology.links if assignment[link.a.device.name] != assignment[link.b.device.name]]
+
+
+def bridge_name(link):
+    # Fixed Linux bridge name for cut links, so the tunnel can be enslaved to it
+    return f'vx-{link.net_name}'
+
+
+def tunnels(topology, assignment, hosts, vni_base=DEFAULT_VNI_BASE):
+    """
+    One point-to-point tunnel per cut link, with VNI vni_base + link index.
+    """
+    by_name = {h.name: h for h in hosts}
+    result = []
+    for link in cut_links(topology, assignment):
+        ends = {}
+        for intf, peer in ((link.a, link.b), (link.b, link.a)):
+            host, remote = by_name[assignment[intf.device.name]], by_name[assignment[peer.device.name]]
+            ends[host.name] = {'device': intf.device.name, 'interface': intf.name, 'bridge': bridge_name(link),
+                               'local': host.address, 'remote': remote.address}
+        result.append({'link': link.net_name, 'vni': vni_base + link.index, 'ends': ends})
+    return result
+
+
+def render_tunnel_script(host, tunnel_defs, tunnel_type='vxlan'):
+    lines = [
+        "#!/bin/sh",
+        f"# {tunnel_type} tunnels for shard {host} (generated by generate-lab.py)",
+        "# Run after `docker-compose up -d` on this host.",
+        "set -e",
+    ]
+    for t in tunnel_defs:
+        end = t['ends'].get(host)
+        if end is None:
+            continue
+        name = f"vx{t['vni']}" if tunnel_type == 'vxlan' else f"gt{t['vni']}"
+        local = f" local {end['local']}" if end['local'] else ""
+        if tunnel_type == 'vxlan':
+            add = f"ip link add {name} type vxlan id {t['vni']} remote {end['remote']}{local} dstport {VXLAN_PORT} nolearning"
+        else:
+            add = f"ip link add {name} type gretap remote {end['remote']}{local} key {t['vni']}"
+        lines += [
+            f"# {t['link']}: {end['device']} {end['interface']}",
+            f"ip link del {name} 2>/dev/null || true",
+            add,
+            f"ip link set {name} master {end['bridge']} up",
+        ]
+    return "\n".join(lines) + "\n"
+
+
+def shard_compose(compose, topology, assignment, host):
+    """
+    The subset of the full compose file that runs on one host. Cut links get a
+    fixed bridge name so the tunnel script can attach to them.
+    """
+    cut = {link.net_name: link for link in cut_links(topology, assignment)}
+    services = {name: svc for name, svc in compose['services'].items() if assignment.get(name) == host}
+    used = {net for svc in services.values() for net in svc['networks']}
+    networks = {}
+    for name, cfg in compose['networks'].items():
+        if name not in used:
+            continue
+        if name in cut:
+            cfg = dict(cfg, driver_opts={'com.docker.network.bridge.name': bridge_name(cut[name])})
+        networks[name] = cfg
+    return dict(compose, services=services, networks=networks)
+
+
+def write_shards(compose, topology, assignment, hosts, dry_run=False, outdir='shards', project=None):
+    """
+    Write shards/<host>/ for every host: its compose file, tunnels.sh and a
+    .env naming the lab's compose project, so every shard's containers and
+    networks carry the lab's project label rather than the host directory's.
+    """
+    raw = topology.raw
+    project = project or compose_project()
+    tunnel_type = raw.get('tunnel_type', 'vxlan')
+    if tunnel_type not in TUNNEL_TYPES:
+        raise ValueError(f"Unknown tunnel_type '{tunnel_type}' (expected {' or '.join(TUNNEL_TYPES)})")
+    missing = [h.name for h in hosts if not h.address]
+    if missing:
+        raise ValueError(f"Shard hosts need an address for their tunnels: {', '.join(missing)}")
+    tunnel_defs = tunnels(topology, assignment, hosts, raw.get('vni_base', DEFAULT_VNI_BASE))
+    if dry_run:
+        print(f"📝 Dry-run: would write {len(hosts)} shard compose files and {len(tunnel_defs)} tunnels to {outdir}/")
+        return tunnel_defs
+
+    for host in hosts:
+        host_dir = os.path.join(outdir, host.name)
+        os.makedirs(host_dir, exist_ok=True)
+        compose_yaml.write(os.path.join(host_dir, 'docker-compose.yml'),
+                           shard_compose(compose, topology, assignment, host.name))
+        script = os.path.join(host_dir, 'tunnels.sh')
+        write_if_changed(script, render_tunnel_script(host.name, tunnel_defs, tunnel_type))
+        os.chmod(script, 0o755)
+        write_if_changed(os.path.join(host_dir, '.env'), f"COMPOSE_PROJECT_NAME={project}\n")
+    plan = {
+        'project': project,
+        'hosts': {h.name: sorted(d for d, a in assignment.items() if a == h.name) for h in hosts},
+        'tunnel_type': tunnel_type,
+        'tunnels': tunnel_defs,
+    }
+    write_if_changed(os.path.join(outdir, 'plan.yml'), yaml.safe_dump(plan, sort_keys=False))
+    return tunnel_defs
+
+
+def summary(topology, assignment, hosts):
+    cut = cut_links(topology, assignment)
+    lines = [f"  {h.name}: {sum(1 for a in assignment.values() if a == h.name)}/{h.capacity} devices" for h in hosts]
+    lines.append(f"  {len(cut)} of {len(topology.links)} links cross hosts")
+    return "\n".join(lines)
+
+
+def main():
+    from topology import Topology, TopologyError
+
+    parser = argparse.ArgumentParser(description="Partition a topology across hosts (offline).")
+    parser.add_argument('topology', nargs='?', default='topology.yml', help='Topology YAML file (default: topology.yml)')
+    parser.add_argument('--hosts', help="Hosts as name:capacity[:address],... (default: the topology's shards:)")
+    args = parser.parse_args()
+
+    with open(args.topology) as f:
+        raw = yaml.safe_load(f)
+    try:
+        topology = Topology.compile(raw)
+        hosts = parse_hosts(args.hosts or raw.get('shards'))
+        assignment = partition(topology, hosts)
+    except (TopologyError, ValueError) as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    print("🧩 Shards:")
+    print(summary(topology, assignment, hosts))
+    for h in hosts:
+        print(f"\n{h.name}: {' '.join(sorted(d for d, a in assignment.items() if a == h.name))}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,28 @@
 #!/usr/bin/env python3
 
 import argparse
+import yaml
 import os, subprocess, sys, signal, threading, time, re, shutil
 from shutil import which
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import deployer
+import docker_api
+import instrumentation
+import leases
+import lldp_verify
+from lab_state import LabState
+from lab_utils import compose_project, normalise_project
+from boot_scheduler import BootScheduler
+import net_tools
+import subgraph
+import telemetry
+import veth_links
+from topology import Topology, TopologyError
+
+# Containers started/stopped/restarted at once (--jobs)
+JOBS = 8
+# Topology file used for device roles and boot settings (--topology)
+TOPOLOGY = 'topology.yml'
 
 # === COLORS ===
 class Colors:
@@ -28,7 +48,7 @@ def tmux_panes_running_for_container(container):
     """
     Return True if there is already a tmux pane running docker exec for this container.
     """
-    result = subprocess.run(
+    result = instrumentation.run(
         ['tmux', 'list-panes', '-a', '-F', '#{pane_current_command} #{pane_start_command}'],
         capture_output=True, text=True
     )
@@ -42,41 +62,104 @@ def spinner(msg, stop_event):
     symbols = ['⏳', '⌛', '🕒', '🕓', '🕔', '🕕']
     i = 0
     while not stop_event.is_set():
-        print(f"\r{msg} {symbols[i % len(symbols)]}", end='', flush=True)
+        text = msg() if callable(msg) else msg
+        # \033[K clears what a longer previous line left behind
+        print(f"\r{text} {symbols[i % len(symbols)]}\033[K", end='', flush=True)
         i += 1
         time.sleep(0.2)
-    print('\r', end='', flush=True)
+    print('\r\033[K', end='', flush=True)
 
 def run_with_spinner(cmd, msg):
     stop_event = threading.Event()
     t = threading.Thread(target=spinner, args=(msg, stop_event))
     t.start()
-    subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-    stop_event.set()
-    t.join()
+    try:
+        # stderr is kept so callers can show why a command failed
+        return instrumentation.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    finally:
+        stop_event.set()
+        t.join()
+
+def run_parallel(action, containers, msg):
+    """
+    Run a container action ('start', 'stop', 'restart') on all containers
+    through a bounded worker pool, with one progress line (done, failed and
+    in-flight containers), then a per-container timing and result table.
+    Returns {container: error} for the ones that failed.
+    """
+    client = docker_api.get_client()
+    done = []
+    failed = {}
+    in_flight = {}
+    timings = {}
+
+    def call(container):
+        in_flight[container] = True
+        t0 = time.perf_counter()
+        try:
+            getattr(client, action)(container)
+        finally:
+            timings[container] = time.perf_counter() - t0
+            in_flight.pop(container, None)
+
+    def progress():
+        names = list(in_flight)
+        running = ", ".join(names[:3]) + (f" +{len(names) - 3}" if len(names) > 3 else "")
+        return (f"{msg} {len(done)}/{len(containers)} done, {len(failed)} failed, {len(names)} in flight"
+                + (f": {running}" if names else ""))
+
+    stop_event = threading.Event()
+    t = threading.Thread(target=spinner, args=(progress, stop_event))
+    t.start()
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, JOBS)) as pool:
+            futures = {pool.submit(call, c): c for c in containers}
+            for fut in as_completed(futures):
+                try:
+                    fut.result()
+                except Exception as e:
+                    failed[futures[fut]] = e
+                done.append(futures[fut])
+    finally:
+        stop_event.set()
+        t.join()
+    width = max([len(c) for c in containers] + [9])
+    print(f"{'Container':<{width}} {'Time':>8}  Result")
+    for c in containers:
+        result = f"❌ {failed[c]}" if c in failed else "✅ ok"
+        print(f"{c:<{width}} {timings.get(c, 0):>7.2f}s  {result}")
+    return failed
 
 signal.signal(signal.SIGINT, lambda s,f: print("\n⚠️ Use menu to quit. Press 'q'."))
 
 # === UTILS ===
 def get_project_name():
-    return os.path.basename(os.getcwd())
+    # A shard's directory is named after its host; its .env names the lab's project
+    return compose_project()
+
+_lab_state = None
+
+def lab_state(project=None):
+    """
+    Return the shared event-driven state model for the project, starting it on first use.
+    """
+    global _lab_state
+    project = project or get_project_name()
+    if _lab_state is None or _lab_state.project != project:
+        _lab_state = LabState(project).start()
+    return _lab_state
 
 def list_containers(project):
-    result = subprocess.run(['docker', 'ps', '-a', '--filter', f'name={project}', '--format', '{{.Names}}'],
-                            capture_output=True, text=True)
-    return result.stdout.strip().splitlines()
+    return list(container_states(project))
+
+def container_states(project):
+    return lab_state(project).states()
 
 def container_is_running(container):
-    result = subprocess.run(['docker', 'inspect', '-f', '{{.State.Running}}', container],
-                            capture_output=True, text=True)
-    return result.stdout.strip() == 'true'
+    return lab_state().is_running(container)
 
 def any_container_running(project):
-    containers = list_containers(project)
-    for c in containers:
-        if container_is_running(c):
-            return True
-    return False
+    return any(container_states(project).values())
 
 def detect_methods():
     m = []
@@ -85,48 +168,215 @@ def detect_methods():
     return m
 
 # === DOCKER ACTIONS ===
+def keep_native(project):
+    """
+    --no-recreate when the lab was created by the native start: its containers
+    have no compose config hash, so `up` would otherwise recreate every one.
+    """
+    return ['--no-recreate'] if deployer.unhashed_containers(normalise_project(project)) else []
+
+@instrumentation.timed
 def start_lab():
     if not os.path.exists('docker-compose.yml'):
         cprint("\n❌ docker-compose.yml not found!", Colors.RED)
         return
     project = get_project_name()
-    running = [c for c in list_containers(project) if container_is_running(c)]
+    running = [c for c, up in container_states(project).items() if up]
     if running:
         cprint_centered("✅ Lab is already running!", Colors.GREEN, fill='-')
         for c in running:
             print(f"   🔷 {c}")
         print("ℹ️ Use the menu to connect or stop the lab.")
         return
-    run_with_spinner(['docker-compose', 'up', '-d'], "🚀 Starting lab…")
+    run_with_spinner(['docker-compose', 'up', '-d'] + keep_native(project), "🚀 Starting lab…")
+    lab_state(project).seed()
+    wire_veth_links(project)
     cprint("✅ Lab started.", Colors.GREEN)
 
+@instrumentation.timed
+def start_lab_native():
+    """
+    Fresh start through the Engine API: networks created concurrently, then
+    containers created and started JOBS at a time. Falls back to docker-compose
+    when only the docker CLI is available.
+    """
+    if not os.path.exists('docker-compose.yml'):
+        cprint("\n❌ docker-compose.yml not found!", Colors.RED)
+        return
+    if isinstance(docker_api.get_client(), docker_api.DockerCLI):
+        cprint("ℹ️ Docker Engine API not reachable, using docker-compose.", Colors.YELLOW)
+        start_lab()
+        return
+    project = get_project_name()
+    compose = deployer.load_compose()
+    try:
+        failed = deployer.Deployer(compose, compose_project(), jobs=JOBS).deploy()
+    except deployer.DeployError as e:
+        cprint(f"\n❌ Cannot deploy:\n   {e}", Colors.RED)
+        print("ℹ️ Run 'Delete lab' (docker-compose down) to clear a previous run.")
+        return
+    except docker_api.DockerError as e:
+        cprint(f"\n❌ {e}", Colors.RED)
+        return
+    lab_state(project).seed()
+    wire_veth_links(project)
+    if failed:
+        cprint(f"⚠️ {len(failed)} of {len(compose['services'])} containers failed to start.", Colors.YELLOW)
+    else:
+        cprint(f"✅ Lab started ({len(compose['services'])} containers).", Colors.GREEN)
+
+@instrumentation.timed
+def start_lab_partial(spec=None):
+    """
+    Run only a subgraph of the lab: the selected devices and the links between
+    them. A selection starting with + or - adds or removes devices; the
+    running ones are never restarted.
+    """
+    if not os.path.exists('docker-compose.yml'):
+        cprint("\n❌ docker-compose.yml not found!", Colors.RED)
+        return
+    topology = load_compiled_topology()
+    if not topology:
+        cprint(f"\n❌ {TOPOLOGY} not found or invalid.", Colors.RED)
+        return
+    project = get_project_name()
+    current = set(compose_containers(project))
+    if spec is None:
+        print(f"\n🧩 Running now: {' '.join(sorted(current)) or 'nothing'}")
+        spec = input("👉 Devices (names, globs, NAME+N for N hops; +… adds, -… removes): ").strip()
+        if not spec:
+            return
+    try:
+        chosen = subgraph.select(topology, spec.lstrip('+-'))
+    except ValueError as e:
+        cprint(f"\n❌ {e}", Colors.RED)
+        return
+    target = current | chosen if spec[0] == '+' else current - chosen if spec[0] == '-' else chosen
+    cprint(f"🧩 {subgraph.summary(topology, target)}", Colors.CYAN)
+
+    if isinstance(docker_api.get_client(), docker_api.DockerCLI):
+        # No per-endpoint interface names through docker-compose: selected devices get all their networks
+        cprint("ℹ️ Docker Engine API not reachable, using docker-compose.", Colors.YELLOW)
+        removed = sorted(current - target)
+        if removed:
+            run_with_spinner(['docker-compose', 'rm', '-s', '-f'] + removed, "🗑️ Removing devices…")
+        added = sorted(target - current)
+        if added:
+            run_with_spinner(['docker-compose', 'up', '-d', '--no-deps'] + added, "🚀 Starting devices…")
+    else:
+        lab = deployer.Deployer(deployer.load_compose(), compose_project(), jobs=JOBS)
+        try:
+            added, removed, failed = lab.scale(target)
+        except deployer.DeployError as e:
+            cprint(f"\n❌ Cannot deploy:\n   {e}", Colors.RED)
+            return
+        except docker_api.DockerError as e:
+            cprint(f"\n❌ {e}", Colors.RED)
+            return
+        if not lab.ifname:
+            cprint("ℹ️ Docker Engine older than 28: links to unselected devices are created too, "
+                   "to keep interface numbering.", Colors.YELLOW)
+        if failed:
+            cprint(f"⚠️ {len(failed)} device(s) failed: {', '.join(sorted(failed))}", Colors.YELLOW)
+    lab_state(project).seed()
+    wire_veth_links(project)
+    cprint(f"✅ {len(added)} device(s) added, {len(removed)} removed; {len(target)} in the lab.", Colors.GREEN)
+
+
+def load_topology():
+    if not os.path.exists(TOPOLOGY):
+        return {}
+    with open(TOPOLOGY) as f:
+        return yaml.safe_load(f) or {}
+
+def load_compiled_topology():
+    raw = load_topology()
+    if not raw:
+        return None
+    try:
+        return Topology.compile(raw)
+    except TopologyError as e:
+        cprint(f"⚠️ {TOPOLOGY}: {e}", Colors.YELLOW)
+        return None
+
+@instrumentation.timed
+def wire_veth_links(project):
+    """
+    Create the direct veth pairs for the topology's veth links between running containers.
+    Safe to call repeatedly: links that already exist are skipped.
+    """
+    topology = load_compiled_topology()
+    if not topology or not topology.veth_links:
+        return
+    wired, failed = veth_links.wire(topology, compose_containers(project), topology.raw.get('veth_mtu'))
+    if wired:
+        cprint(f"🔗 Wired {len(wired)} veth link(s).", Colors.GREEN)
+    for link in failed:
+        cprint(f"⚠️ veth link {link.a.device.name}:{link.a.name} ↔ {link.b.device.name}:{link.b.name} is not wired", Colors.RED)
+
+def compose_containers(project):
+    """
+    Return {compose service: container name} for the project.
+    """
+    return deployer.project_containers(normalise_project(project))
 
+@instrumentation.timed
+def start_lab_staged():
+    if not os.path.exists('docker-compose.yml'):
+        cprint("\n❌ docker-compose.yml not found!", Colors.RED)
+        return
+    project = get_project_name()
+    if any_container_running(project):
+        cprint_centered("✅ Lab is already running!", Colors.GREEN, fill='-')
+        print("ℹ️ Stop the lab first to boot it in waves.")
+        return
+    result = run_with_spinner(['docker-compose', 'up', '--no-start'] + keep_native(project), "📦 Creating lab…")
+    containers = compose_containers(project)
+    if not containers:
+        cprint("\n❌ No containers were created.", Colors.RED)
+        if result.returncode and result.stderr:
+            print(result.stderr.strip())
+        return
+    scheduler = BootScheduler(containers, load_topology(), on_started=lambda wave: wire_veth_links(project))
+    scheduler.run()
+    lab_state(project).seed()
+    cprint_centered("⏱️ Boot times", Colors.CYAN, fill='=')
+    print(scheduler.report())
+    cprint("✅ Lab started in waves.", Colors.GREEN)
+
+
+@instrumentation.timed
 def start_lab_containers():
     project = get_project_name()
-    all_containers = list_containers(project)
-    if not all_containers:
+    states = container_states(project)
+    if not states:
         cprint_centered("⚠️ No containers exist. Please use 'Start lab (fresh)' instead.", Colors.YELLOW, fill='-')
         return
-    stopped = [c for c in all_containers if not container_is_running(c)]
+    stopped = [c for c, up in states.items() if not up]
     if not stopped:
         cprint_centered("ℹ️ All containers already running!", Colors.GREEN, fill='-')
         return
-    for c in stopped:
-        run_with_spinner(['docker', 'start', c], f"🚀 Starting {c}…")
-    cprint("✅ All stopped containers started.", Colors.GREEN)
+    failed = run_parallel('start', stopped, "🚀 Starting containers…")
+    lab_state(project).refresh(*stopped)
+    wire_veth_links(project)
+    if not failed:
+        cprint("✅ All stopped containers started.", Colors.GREEN)
 
+@instrumentation.timed
 def stop_lab_containers():
     project = get_project_name()
-    running = [c for c in list_containers(project) if container_is_running(c)]
+    running = [c for c, up in container_states(project).items() if up]
     if not running:
         cprint_centered("🛑 Lab is already stopped", Colors.YELLOW, fill='-')
         print("👉 You can start the lab from the main menu if you want to bring it up.\n")
         return
-    for c in running:
-        run_with_spinner(['docker', 'stop', c], f"🛑 Stopping {c}…")
-    cprint("✅ All lab containers stopped (but not removed).", Colors.GREEN)
+    failed = run_parallel('stop', running, "🛑 Stopping containers…")
+    lab_state(project).refresh(*running)
+    if not failed:
+        cprint("✅ All lab containers stopped (but not removed).", Colors.GREEN)
 
 
+@instrumentation.timed
 def delete_lab():
     project = get_project_name()
 
@@ -140,12 +390,17 @@ def delete_lab():
         return
 
     run_with_spinner(['docker-compose', 'down'], "🗑️ Deleting lab…")
+    lab_state(project).seed()
     cprint("✅ Lab deleted (containers & networks removed).", Colors.GREEN)
 
+@instrumentation.timed
 def restart_container(container):
     run_with_spinner(['docker', 'restart', container], f"🔄 Restarting {container}…")
+    lab_state().refresh(container)
+    wire_veth_links(get_project_name())
     cprint(f"✅ {container} restarted.", Colors.GREEN)
 
+@instrumentation.timed
 def start_container(container):
     project = get_project_name()
     containers = list_containers(project)
@@ -155,23 +410,84 @@ def start_container(container):
         cprint("\nℹ️ No containers found.", Colors.BOLD)
         return
     run_with_spinner(['docker', 'start', container], f"🚀 Starting {container}…")
+    lab_state().refresh(container)
+    wire_veth_links(get_project_name())
     cprint(f"✅ {container} started.", Colors.GREEN)
 
+@instrumentation.timed
 def stop_container(container):
     run_with_spinner(['docker', 'stop', container], f"🛑 Stopping {container}…")
+    lab_state().refresh(container)
     cprint(f"✅ {container} stopped.", Colors.GREEN)
 
+@instrumentation.timed
+def verify_wiring():
+    """
+    Compare LLDP neighbors with the topology and record each device's time-to-ready.
+    """
+    topology = load_compiled_topology()
+    if not topology:
+        cprint(f"\n❌ {TOPOLOGY} not found or invalid.", Colors.RED)
+        return
+    project = get_project_name()
+    states = container_states(project)
+    running = {s: c for s, c in compose_containers(project).items() if states.get(c)}
+    if not running:
+        cprint("\nℹ️ No running containers.", Colors.BOLD)
+        return
+    verifier = lldp_verify.WiringVerifier(topology, running, jobs=JOBS)
+    cprint(f"\n🧭 Waiting for {len(running)} devices to converge…", Colors.CYAN)
+    links = verifier.run()
+    verifier.save()
+    cprint_centered("🧭 Wiring and time-to-ready", Colors.CYAN, fill='=')
+    print(verifier.report())
+    if all(status == 'ok' for _, status, _ in links):
+        cprint("✅ Wiring matches the topology.", Colors.GREEN)
+    print(f"ℹ️ Timeline saved to {lldp_verify.TIMELINE}")
+
+def telemetry_view():
+    """
+    Sample link throughput and device CPU/memory in the background; redraw on Enter.
+    """
+    topology = load_compiled_topology()
+    if not topology:
+        cprint(f"\n❌ {TOPOLOGY} not found or invalid.", Colors.RED)
+        return
+    leases.apply_names(topology)
+    project = get_project_name()
+    states = container_states(project)
+    running = {s: c for s, c in compose_containers(project).items() if states.get(c)}
+    if not running:
+        cprint("\nℹ️ No running containers.", Colors.BOLD)
+        return
+    collector = telemetry.Collector(topology, running).start()
+    cprint(f"\n📈 Sampling {len(running)} devices every {collector.interval:.0f}s…", Colors.CYAN)
+    try:
+        while True:
+            choice = input("👉 Enter to refresh, e to export, q to go back: ").strip().lower()
+            if choice == 'q':
+                return
+            if choice == 'e':
+                collector.export('telemetry.json')
+                cprint(f"💾 {collector.times.count} samples written to telemetry.json", Colors.GREEN)
+                continue
+            cprint_centered("📈 Telemetry (last 10 samples)", Colors.CYAN, fill='=')
+            print(collector.report())
+    finally:
+        collector.stop()
+
 # === STATUS ===
+@instrumentation.timed
 def lab_status():
     project = get_project_name()
-    containers = list_containers(project)
-    if not containers:
+    states = container_states(project)
+    if not states:
         cprint("\nℹ️ No containers found.", Colors.BOLD)
         return
     cprint_centered(f"🧩 Lab Name: {project}", Colors.YELLOW, fill='-')
     print("📊 Lab Status:")
-    for c in containers:
-        status = "🟢 running" if container_is_running(c) else "🔴 stopped"
+    for c, up in states.items():
+        status = "🟢 running" if up else "🔴 stopped"
         print(f"  {c} — {status}")
 
 # === CONTROL PANEL ===
@@ -182,9 +498,10 @@ def lab_control_panel():
         cprint_centered("ℹ️ No containers to control", Colors.YELLOW, fill='-')
         return
     while True:
+        states = container_states(project)
         print("\n📋 Containers:")
         for idx, c in enumerate(containers, 1):
-            status = "🟢 (running)" if container_is_running(c) else "🔴 (stopped)"
+            status = "🟢 (running)" if states.get(c) else "🔴 (stopped)"
             print(f"  {idx}. {c} {status}")
         print("  a. 🔄 Restart ALL")
         print("  q. 🔙 Back")
@@ -192,8 +509,11 @@ def lab_control_panel():
         if choice == 'q':
             return
         elif choice == 'a':
-            for c in containers:
-                restart_container(c)
+            failed = run_parallel('restart', containers, "🔄 Restarting containers…")
+            lab_state(project).refresh(*containers)
+            wire_veth_links(project)
+            if not failed:
+                cprint("✅ All containers restarted.", Colors.GREEN)
         elif choice.isdigit() and 1 <= int(choice) <= len(containers):
             container_action(containers[int(choice)-1])
         else:
@@ -233,24 +553,25 @@ def choose_method(methods):
         print("⚠️ Invalid choice.")
 
 def start_tmux_session(project):
-    result = subprocess.run(['tmux', 'ls'], capture_output=True, text=True)
+    result = instrumentation.run(['tmux', 'ls'], capture_output=True, text=True)
     if project in result.stdout:
-        subprocess.run(['tmux', 'attach-session', '-t', project])
+        instrumentation.run(['tmux', 'attach-session', '-t', project])
     else:
-        subprocess.Popen([
+        instrumentation.run([
             'tmux', 'new-session', '-s', project,
             f'python3 {sys.argv[0]} --method tmux --action connect'
-        ]).wait()
+        ])
 
 def container_menu(method, project):
     while True:
-        containers = list_containers(project)
+        states = container_states(project)
+        containers = list(states)
         if not containers:
             print("❌ No containers found.")
             return
         print("\n📋 Available containers:")
         for idx, c in enumerate(containers, 1):
-            status = "🟢 (running)" if container_is_running(c) else "🔴 (stopped)"
+            status = "🟢 (running)" if states[c] else "🔴 (stopped)"
             print(f"  {idx}. {c} {status}")
         print("  a. Connect to ALL")
         print("  q. Back & close tmux (if any)")
@@ -258,7 +579,7 @@ def container_menu(method, project):
         if choice == 'q':
             if method == 'tmux' and 'TMUX' in os.environ:
                 cprint("\n🛑 Closing tmux session…", Colors.YELLOW)
-                subprocess.run(['tmux', 'kill-session', '-t', project])
+                instrumentation.run(['tmux', 'kill-session', '-t', project])
             return
         elif choice == 'a':
             for c in containers:
@@ -302,10 +623,10 @@ def container_action(container):
 
 def connect(container, method, project):
     if method == 'tmux':
-        subprocess.Popen(['tmux', 'split-window', '-v', f"docker exec -it {container} Cli"])
-        subprocess.Popen(['tmux', 'select-layout', 'tiled'])
+        instrumentation.popen(['tmux', 'split-window', '-v', f"docker exec -it {container} Cli"])
+        instrumentation.popen(['tmux', 'select-layout', 'tiled'])
     else:
-        subprocess.run(['docker', 'exec', '-it', container, 'Cli'])
+        instrumentation.run(['docker', 'exec', '-it', container, 'Cli'])
 
 def show_tmux_cheat_sheet():
     sheet = "\n🎹 Tmux Cheat Sheet\n" + "-"*30 + """
@@ -353,29 +674,24 @@ def lab_network_tools():
             cprint("\n⚠️ Invalid choice.", Colors.YELLOW)
 
 def list_lab_bridges(lab):
-    output = subprocess.check_output(["docker", "network", "ls"]).decode()
-    pattern = r'{}_(?!default\b)\S+'.format(lab)
-    lab_items = re.findall(pattern, output)
-    bridges = []
-    for line in output.splitlines():
-        for item in lab_items:
-            if item in line:
-                bridges.append(line.split()[0])
-    return bridges
+    return list(net_tools.lab_bridges(lab).values())
 
 def fix_lldp(bridges):
-    for b in bridges:
-        print(f"🔷 Enabling LLDP on br-{b}")
-        subprocess.run(f"echo 16384 > /sys/class/net/br-{b}/bridge/group_fwd_mask", shell=True)
+    masks, failed = net_tools.enable_lldp(bridges)
+    for b, mask in masks.items():
+        if b in failed:
+            cprint(f"⚠️ Failed to enable LLDP on {b}", Colors.RED)
+        else:
+            print(f"🔷 LLDP enabled on {b} (group_fwd_mask={mask})")
 
 def set_mtu(bridges, mtu_size):
-    for b in bridges:
-        out = subprocess.check_output(f"brctl show br-{b}", shell=True).decode()
-        for line in out.splitlines():
-            matches = re.findall(r've\w+', line)
-            for iface in matches:
-                print(f"🔷 Setting MTU {mtu_size} on {iface}")
-                subprocess.run(["ip", "link", "set", "dev", iface, "mtu", str(mtu_size)])
+    ifaces = [i for b in bridges for i in net_tools.bridge_members(b)]
+    failed = net_tools.set_mtu(ifaces, mtu_size)
+    for iface in ifaces:
+        if iface in failed:
+            cprint(f"⚠️ Failed to set MTU {mtu_size} on {iface}", Colors.RED)
+        else:
+            print(f"🔷 MTU {mtu_size} set on {iface}")
 
 def report_mtu(bridges):
     """
@@ -383,42 +699,36 @@ def report_mtu(bridges):
     """
     cprint_centered("📋 Current MTU Settings", Colors.CYAN, fill='=')
     for b in bridges:
-        cprint(f"\n🔷 Bridge: br-{b}", Colors.BOLD)
-        try:
-            output = subprocess.check_output(f"brctl show br-{b}", shell=True).decode()
-            for line in output.splitlines():
-                matches = re.findall(r'(ve\w+)', line)
-                for iface in matches:
-                    mtu = get_interface_mtu(iface)
-                    print(f"   {iface}: {mtu}")
-        except subprocess.CalledProcessError as e:
-            cprint(f"⚠️ Failed to inspect bridge br-{b}: {e}", Colors.RED)
+        cprint(f"\n🔷 Bridge: {b}", Colors.BOLD)
+        for iface in net_tools.bridge_members(b):
+            print(f"   {iface}: {get_interface_mtu(iface)}")
 
 def get_interface_mtu(interface):
     """
     Get the MTU of a given interface.
     """
-    try:
-        output = subprocess.check_output(
-            ["ip", "-o", "link", "show", interface],
-            text=True
-        )
-        m = re.search(r"mtu (\d+)", output)
-        if m:
-            return m.group(1)
-        return "unknown"
-    except subprocess.CalledProcessError:
-        return "unknown"
+    mtu = net_tools.get_mtu(interface)
+    return str(mtu) if mtu is not None else "unknown"
 
 # === MAIN ===
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument('--method', choices=['tmux', 'inline'])
     parser.add_argument('--action', choices=['connect'])
+    parser.add_argument('--jobs', type=int, default=JOBS, help=f'Containers to start/stop/restart in parallel (default: {JOBS})')
+    parser.add_argument('--topology', default=TOPOLOGY, help=f'Topology YAML file (default: {TOPOLOGY})')
+    parser.add_argument('--devices', metavar='SELECTION',
+                        help='Run only these devices and the links between them, e.g. "SPINE1+1" or "+LEAF3" (then exit)')
+    instrumentation.add_arguments(parser)
     args = parser.parse_args()
+    instrumentation.setup(args, 'start-lab')
+    JOBS = args.jobs
+    TOPOLOGY = args.topology
 
     if args.action == 'connect' and args.method == 'tmux':
         connect_to_lab(method='tmux')
+    elif args.devices:
+        start_lab_partial(args.devices)
     else:
         while True:
             print("\n📋 What would you like to do?")
@@ -430,6 +740,11 @@ if __name__ == "__main__":
             print("  6. 🔄 Lab control panel (restart/shutdown containers)")
             print("  7. 📊 Lab status")
             print("  8. ⚙️ Lab network tools (LLDP & MTU)")
+            print("  9. 🌊 Staged start (boot in waves, spines first)")
+            print(" 10. ⚡ Fast fresh start (parallel deploy, no docker-compose)")
+            print(" 11. 🧭 Verify wiring (LLDP) & time-to-ready")
+            print(" 12. 📈 Telemetry (link throughput, CPU & memory)")
+            print(" 13. 🧩 Partial lab (start/add/remove selected devices)")
             print("  q. ❌ Quit")
             choice = input("👉 Your choice: ").strip().lower()
             if choice == '1':
@@ -448,6 +763,16 @@ if __name__ == "__main__":
                 lab_status()
             elif choice == '8':
                 lab_network_tools()
+            elif choice == '9':
+                start_lab_staged()
+            elif choice == '10':
+                start_lab_native()
+            elif choice == '11':
+                verify_wiring()
+            elif choice == '12':
+                telemetry_view()
+            elif choice == '13':
+                start_lab_partial()
             elif choice == 'q':
                 cprint("👋 Goodbye!", Colors.CYAN)
                 sys.exit(0)
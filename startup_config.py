@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+
+import functools
+import hashlib
+import os
+import string
+from itertools import islice
+
+from boot_scheduler import device_role
+from lab_utils import STATE_DIR, load_json, save_json
+
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates')
+# Digest of the startup-config last written per device, to tell generated files from saved ones
+STARTUP_STATE = os.path.join(STATE_DIR, 'startup-config.json')
+
+
+@functools.lru_cache(maxsize=None)
+def load_template(template_dir, role):
+    """
+    Compiled template for a role: <role>.cfg if it exists, else default.cfg.
+    """
+    path = os.path.join(template_dir, f'{role}.cfg')
+    if not os.path.isfile(path):
+        path = os.path.join(template_dir, 'default.cfg')
+    with open(path) as f:
+        return string.Template(f.read())
+
+
+def link_addresses(link):
+    """
+    The two point-to-point addresses of a link, for endpoints a and b.
+    Docker takes the first host address of a bridge network as its gateway;
+    veth links use the subnet from its first host address (both on a /31).
+    """
+    skip = 1 if link.mode == 'bridge' else 0
+    return list(islice(link.subnet.hosts(), skip, skip + 2))
+
+
+def render_interfaces(device):
+    blocks = []
+    for intf in device.interfaces:
+        link = intf.link
+        peer = link.peer(device)
+        lines = [f"interface {intf.name}", f"   description to {peer.device.name} {peer.name}", "   no switchport"]
+        if link.subnet is not None:
+            addresses = link_addresses(link)
+            slot = 0 if link.a is intf else 1
+            if slot < len(addresses):
+                lines.append(f"   ip address {addresses[slot]}/{link.prefixlen}")
+        blocks.append("\n".join(lines) + "\n!\n")
+    return "".join(blocks)
+
+
+def render(device, topo, mgmt_net, mgmt_address=None):
+    """
+    Fill the device's role template from the compiled topology.
+    """
+    role = device_role(device.name, topo)
+    template = load_template(topo.get('templates') or TEMPLATE_DIR, role)
+    return template.safe_substitute(
+        hostname=device.name,
+        role=role,
+        mgmt_description=f"mgmt {mgmt_net}",
+        mgmt_address=f"   ip address {mgmt_address}\n" if mgmt_address else "",
+        interfaces=render_interfaces(device),
+    )
+
+
+def _digest(content):
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+class StartupConfigs:
+    """
+    Guards startup-config files that cEOS may have rewritten (`write memory`):
+    a file is only replaced if it is still exactly what was generated last time.
+    """
+
+    def __init__(self, path=STARTUP_STATE):
+        self.path = path
+        self.generated = load_json(path, {})
+        self.kept = []
+
+    def writable(self, device, path):
+        if not os.path.exists(path):
+            return True
+        with open(path) as f:
+            if _digest(f.read()) == self.generated.get(device):
+                return True
+        self.kept.append(device)
+        return False
+
+    def written(self, device, content):
+        self.generated[device] = _digest(content)
+
+    def save(self):
+        save_json(self.path, self.generated)
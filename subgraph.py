@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+
+import argparse
+import fnmatch
+import re
+import sys
+
+import yaml
+
+
+HOPS = re.compile(r'(.+?)\+(\d+)')
+
+
+def neighbourhood(topology, devices, hops):
+    """
+    The devices plus every device within `hops` links of one of them.
+    """
+    seen = set(devices)
+    frontier = list(seen)
+    for _ in range(hops):
+        reached = []
+        for name in frontier:
+            for link in topology.links_of(name):
+                peer = link.peer(topology.devices[name]).device.name
+                if peer not in seen:
+                    seen.add(peer)
+                    reached.append(peer)
+        frontier = reached
+    return seen
+
+
+def select(topology, spec):
+    """
+    Devices chosen by a selection such as "SPINE1+1, LEAF2*": device names and
+    shell globs (case-insensitive), and NAME+N for a device plus everything
+    within N hops of it.
+    """
+    chosen = set()
+    for token in re.split(r'[,\s]+', spec.strip()):
+        if not token:
+            continue
+        match = HOPS.fullmatch(token)
+        pattern, hops = (match.group(1), int(match.group(2))) if match else (token, 0)
+        matched = [d for d in topology.devices if fnmatch.fnmatchcase(d.upper(), pattern.upper())]
+        if not matched:
+            raise ValueError(f"No device matches '{pattern}'")
+        chosen |= neighbourhood(topology, matched, hops)
+    return chosen
+
+
+def induced_links(topology, devices):
+    """
+    Links with both ends on the selected devices.
+    """
+    return [link for link in topology.links if link.a.device.name in devices and link.b.device.name in devices]
+
+
+def summary(topology, devices):
+    links = induced_links(topology, devices)
+    return (f"{len(devices)} of {len(topology.devices)} devices, "
+            f"{len(links)} of {len(topology.links)} links: {' '.join(sorted(devices))}")
+
+
+def main():
+    from leases import apply_names
+    from topology import Topology, TopologyError
+
+    parser = argparse.ArgumentParser(description="Show the devices and links a selection brings up (offline).")
+    parser.add_argument('topology', nargs='?', default='topology.yml', help='Topology YAML file (default: topology.yml)')
+    parser.add_argument('selection', help='Device names, globs or NAME+N (N hops), e.g. "SPINE1+1"')
+    args = parser.parse_args()
+
+    with open(args.topology) as f:
+        raw = yaml.safe_load(f)
+    try:
+        topology = apply_names(Topology.compile(raw))
+        devices = select(topology, args.selection)
+    except (TopologyError, ValueError) as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    print(f"🧩 {summary(topology, devices)}")
+    for link in induced_links(topology, devices):
+        print(f"   {link.net_name}: {link.a.device.name}:{link.a.name} ↔ {link.b.device.name}:{link.b.name}")
+
+
+if __name__ == "__main__":
+    main()
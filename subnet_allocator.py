@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+
+import heapq
+import ipaddress
+
+
+# A Docker bridge network needs room for the gateway plus both containers.
+MAX_BRIDGE_PREFIXLEN = 29
+
+
+def parse_prefixlen(value):
+    """
+    Accept 29, '29' or '/29' and return the prefix length as an int.
+    """
+    text = str(value).strip().lstrip('/')
+    if not text.isdigit():
+        raise ValueError(f"Invalid prefix length: {value!r}")
+    return int(text)
+
+
+class SubnetAllocator:
+    """
+    Free-space allocator over a subnet pool.
+
+    Free space is kept as aligned CIDR blocks in one min-heap per prefix length,
+    built once from the pool minus the reserved (e.g. existing Docker) subnets.
+    An allocation pops the lowest-addressed smallest block that fits and splits
+    it down to the requested size, so each call is O(log n).
+    """
+
+    def __init__(self, pool, reserved=()):
+        self.pool = ipaddress.ip_network(pool)
+        self._free = {p: [] for p in range(self.pool.prefixlen, self.pool.max_prefixlen + 1)}
+        for block in self._free_blocks(reserved):
+            self._free[block.prefixlen].append(int(block.network_address))
+        for heap in self._free.values():
+            heapq.heapify(heap)
+
+    def _free_blocks(self, reserved):
+        start, end = int(self.pool.network_address), int(self.pool.broadcast_address)
+        used = sorted(
+            (max(int(r.network_address), start), min(int(r.broadcast_address), end))
+            for r in reserved if r.version == self.pool.version and r.overlaps(self.pool)
+        )
+        cursor = start
+        for lo, hi in used:
+            if lo > cursor:
+                yield from self._summarize(cursor, lo - 1)
+            cursor = max(cursor, hi + 1)
+        if cursor <= end:
+            yield from self._summarize(cursor, end)
+
+    def _summarize(self, lo, hi):
+        addr = type(self.pool.network_address)
+        return ipaddress.summarize_address_range(addr(lo), addr(hi))
+
+    def allocate(self, prefixlen=24):
+        if not self.pool.prefixlen <= prefixlen <= self.pool.max_prefixlen:
+            raise ValueError(f"/{prefixlen} does not fit in pool {self.pool}")
+        for p in range(prefixlen, self.pool.prefixlen - 1, -1):
+            if self._free[p]:
+                addr = heapq.heappop(self._free[p])
+                break
+        else:
+            raise RuntimeError("No more available subnets!")
+        # Split the block, returning the upper halves to the free lists.
+        while p < prefixlen:
+            p += 1
+            heapq.heappush(self._free[p], addr + (1 << (self.pool.max_prefixlen - p)))
+        return ipaddress.ip_network((addr, prefixlen))
+
+    def free_addresses(self):
+        return sum(len(heap) << (self.pool.max_prefixlen - p) for p, heap in self._free.items())
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+Sample per-link throughput and per-device CPU and memory of a running lab.
+
+    python3 telemetry.py [topology.yml] --interval 1 --duration 60 --output telemetry.json
+
+Interface counters come from each container's /proc/<pid>/net/dev (the
+netns view of /sys/class/net/*/statistics, which also covers veth links
+that never appear on the host), CPU and memory from the container's
+cgroup v2 cpu.stat, memory.current and memory.stat. Samples go into
+fixed-size array-backed ring buffers.
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from array import array
+
+import yaml
+
+from lab_utils import atomic_write, compose_project
+from veth_links import container_pids
+
+
+CGROUP_ROOT = '/sys/fs/cgroup'
+DEFAULT_INTERVAL = 1.0
+DEFAULT_CAPACITY = 300     # samples kept per series (5 minutes at 1s)
+
+
+class Ring:
+    """
+    Fixed-capacity ring buffer of doubles.
+    """
+    __slots__ = ('data', 'start', 'count')
+
+    def __init__(self, capacity):
+        self.data = array('d', bytes(8 * capacity))
+        self.start = 0
+        self.count = 0
+
+    def append(self, value):
+        capacity = len(self.data)
+        self.data[(self.start + self.count) % capacity] = value
+        if self.count < capacity:
+            self.count += 1
+        else:
+            self.start = (self.start + 1) % capacity
+
+    def values(self):
+        capacity = len(self.data)
+        return [self.data[(self.start + i) % capacity] for i in range(self.count)]
+
+    def last(self, default=0.0):
+        return self.data[(self.start + self.count - 1) % len(self.data)] if self.count else default
+
+    def mean(self, n):
+        values = self.values()[-n:]
+        return sum(values) / len(values) if values else 0.0
+
+
+def read_netdev(pid):
+    """
+    {interface: (rx_bytes, tx_bytes)} inside the process's network namespace.
+    """
+    counters = {}
+    with open(f'/proc/{pid}/net/dev') as f:
+        for line in f.readlines()[2:]:
+            name, _, fields = line.partition(':')
+            fields = fields.split()
+            counters[name.strip()] = (int(fields[0]), int(fields[8]))
+    return counters
+
+
+def cgroup_dir(pid):
+    """
+    The process's cgroup v2 directory, from the '0::<path>' line of /proc/<pid>/cgroup.
+    """
+    # Hybrid hosts mount the v2 hierarchy under unified/
+    root = CGROUP_ROOT if os.path.exists(os.path.join(CGROUP_ROOT, 'cgroup.controllers')) else os.path.join(CGROUP_ROOT, 'unified')
+    with open(f'/proc/{pid}/cgroup') as f:
+        for line in f:
+            if line.startswith('0::'):
+                path = os.path.join(root, line[3:].strip().lstrip('/'))
+                if os.path.exists(os.path.join(path, 'cpu.stat')):
+                    return path
+    raise OSError(f"No cgroup v2 entry with cpu.stat for pid {pid}")
+
+
+def read_cgroup(path):
+    """
+    (cpu usage in µs, memory.current, anon bytes, file bytes).
+    """
+    usage = 0
+    with open(os.path.join(path, 'cpu.stat')) as f:
+        for line in f:
+            if line.startswith('usage_usec '):
+                usage = int(line.split()[1])
+                break
+    with open(os.path.join(path, 'memory.current')) as f:
+        current = int(f.read())
+    stat = {}
+    with open(os.path.join(path, 'memory.stat')) as f:
+        for line in f:
+            key, _, value = line.partition(' ')
+            if key in ('anon', 'file'):
+                stat[key] = int(value)
+    return usage, current, stat.get('anon', 0), stat.get('file', 0)
+
+
+class Collector:
+    """
+    Sample the lab every `interval` seconds. Each link has a bytes/s series
+    per direction (a->b from a's tx, b->a from b's tx); each device has CPU %
+    (of one core), memory.current, anon and file series.
+    """
+
+    DEVICE_SERIES = ('cpu', 'mem', 'anon', 'file')
+
+    def __init__(self, topology, containers, interval=DEFAULT_INTERVAL, capacity=DEFAULT_CAPACITY):
+        # containers: {device: container name}
+        self.topology = topology
+        self.containers = containers
+        self.interval = interval
+        self.times = Ring(capacity)
+        self.links = {link.net_name: (Ring(capacity), Ring(capacity)) for link in topology.links}
+        self.devices = {d: {s: Ring(capacity) for s in self.DEVICE_SERIES} for d in containers}
+        self.pids = {}
+        self.cgroups = {}
+        self.previous = {}      # device -> (time, netdev counters, cpu usage, memory...)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def resolve(self):
+        self.pids = container_pids(self.containers)
+        self.cgroups = {}
+        for device, pid in self.pids.items():
+            try:
+                self.cgroups[device] = cgroup_dir(pid)
+            except OSError:
+                pass
+
+    def sample(self):
+        now = time.monotonic()
+        current = {}
+        stale = False
+        for device, pid in self.pids.items():
+            try:
+                netdev = read_netdev(pid)
+            except (OSError, ValueError, IndexError):
+                # Stopped or restarted: a new PID and cgroup next time
+                stale = True
+                continue
+            try:
+                usage, mem, anon, file = read_cgroup(self.cgroups[device]) if device in self.cgroups else (0, 0, 0, 0)
+            except (OSError, ValueError):
+                # No v2 cpu/memory controllers for this cgroup: network counters only
+                self.cgroups.pop(device, None)
+                usage, mem, anon, file = 0, 0, 0, 0
+            current[device] = (now, netdev, usage, mem, anon, file)
+
+        for device, series in self.devices.items():
+            # Every series gets a sample each interval, so all of them line up with `times`
+            cur, prev = current.get(device), self.previous.get(device)
+            series['cpu'].append(max(0, cur[2] - prev[2]) / 1e4 / (cur[0] - prev[0]) if cur and prev else 0.0)
+            for i, key in enumerate(('mem', 'anon', 'file'), 3):
+                series[key].append(cur[i] if cur else 0.0)
+
+        for link in self.topology.links:
+            rings = self.links[link.net_name]
+            for ring, intf in zip(rings, (link.a, link.b)):
+                cur, prev = current.get(intf.device.name), self.previous.get(intf.device.name)
+                name = f'eth{intf.eth}'
+                if cur and prev and name in cur[1] and name in prev[1]:
+                    ring.append(max(0, cur[1][name][1] - prev[1][name][1]) / (cur[0] - prev[0]))
+                else:
+                    ring.append(0.0)
+        self.times.append(time.time())
+        self.previous = current
+        if stale:
+            self.resolve()
+
+    def _loop(self):
+        next_at = time.monotonic()
+        while not self._stop.is_set():
+            self.sample()
+            next_at += self.interval
+            self._stop.wait(max(0.0, next_at - time.monotonic()))
+
+    def start(self):
+        self.resolve()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    def report(self, window=10):
+        """
+        Busiest links and devices, averaged over the last `window` samples.
+        """
+        def rate(value):
+            for unit in ('B/s', 'KB/s', 'MB/s', 'GB/s'):
+                if value < 1024:
+                    return f"{value:.0f} {unit}" if unit == 'B/s' else f"{value:.1f} {unit}"
+                value /= 1024
+            return f"{value:.1f} TB/s"
+
+        lines = [f"{'Link':<10} {'Endpoints':<44} {'a→b':>11} {'b→a':>11}"]
+        by_link = {link.net_name: link for link in self.topology.links}
+        ranked = sorted(self.links.items(), key=lambda kv: -(kv[1][0].mean(window) + kv[1][1].mean(window)))
+        for name, (ab, ba) in ranked:
+            link = by_link[name]
+            ends = f"{link.a.device.name}:{link.a.name} ↔ {link.b.device.name}:{link.b.name}"
+            lines.append(f"{name:<10} {ends:<44} {rate(ab.mean(window)):>11} {rate(ba.mean(window)):>11}")
+        lines.append(f"\n{'Device':<20} {'CPU':>7} {'Memory':>10} {'Anon':>10} {'File':>10}")
+        for device, s in sorted(self.devices.items(), key=lambda kv: -kv[1]['cpu'].mean(window)):
+            mb = lambda ring: f"{ring.last() / (1 << 20):.0f} MB"
+            lines.append(f"{device:<20} {s['cpu'].mean(window):>6.1f}% {mb(s['mem']):>10} {mb(s['anon']):>10} {mb(s['file']):>10}")
+        return "\n".join(lines)
+
+    def export(self, path):
+        data = {
+            'interval': self.interval,
+            'times': self.times.values(),
+            'links': {name: {'a_to_b': ab.values(), 'b_to_a': ba.values()} for name, (ab, ba) in self.links.items()},
+            'devices': {d: {k: ring.values() for k, ring in s.items()} for d, s in self.devices.items()},
+        }
+        atomic_write(path, json.dumps(data, separators=(',', ':')) + "\n")
+
+
+def main():
+    from deployer import project_containers
+    from leases import apply_names
+    from topology import Topology, TopologyError
+
+    parser = argparse.ArgumentParser(description="Sample link throughput and device CPU/memory of a running lab.")
+    parser.add_argument('topology', nargs='?', default='topology.yml', help='Topology YAML file (default: topology.yml)')
+    parser.add_argument('--interval', type=float, default=DEFAULT_INTERVAL, help=f'Seconds between samples (default: {DEFAULT_INTERVAL})')
+    parser.add_argument('--duration', type=float, default=60, help='Seconds to sample (default: 60)')
+    parser.add_argument('--output', default='telemetry.json', help='JSON file with every series (default: telemetry.json)')
+    args = parser.parse_args()
+
+    with open(args.topology) as f:
+        raw = yaml.safe_load(f)
+    try:
+        topology = apply_names(Topology.compile(raw))
+    except TopologyError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    project = compose_project()
+    containers = project_containers(project, all=False)
+    capacity = max(2, int(args.duration / args.interval) + 1)
+    collector = Collector(topology, containers, args.interval, capacity).start()
+    try:
+        time.sleep(args.duration)
+    except KeyboardInterrupt:
+        pass
+    collector.stop()
+    collector.export(args.output)
+    print(collector.report(window=capacity))
+    print(f"\n💾 {collector.times.count} samples written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The lab scripts are flat modules in the repository root; the fake Engine lives in benchmarks/
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, 'benchmarks')]
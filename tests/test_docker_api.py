@@ -0,0 +1,160 @@
+import inspect
+import os
+import socket
+import threading
+
+import pytest
+
+import docker_api
+from fake_docker import FakeDockerServer, Inventory
+
+
+class CountingServer(FakeDockerServer):
+    """
+    The fake Engine, counting accepted connections and keeping their sockets
+    so a test can hang up on the client.
+    """
+
+    def __init__(self, socket_path, inventory):
+        super().__init__(socket_path, inventory)
+        self.accepted = []
+
+    def get_request(self):
+        request, address = super().get_request()
+        self.accepted.append(request)
+        return request, address
+
+    def hang_up(self):
+        for sock in self.accepted:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+
+@pytest.fixture
+def server(tmp_path):
+    with CountingServer(str(tmp_path / 'docker.sock'), Inventory(networks=5, containers=3)) as server:
+        yield server
+
+
+@pytest.fixture
+def client(server):
+    return docker_api.DockerAPI(server.socket_path, timeout=5)
+
+
+@pytest.fixture
+def fresh_client(monkeypatch):
+    monkeypatch.setattr(docker_api, '_client', None)
+
+
+def test_calls_reuse_one_connection(server, client):
+    assert client.ping()
+    assert len(client.networks()) == 5
+    assert len(client.containers()) == 3
+    client.inspect_container('ceos-lab_docker-DEV0001-1')
+    assert len(server.accepted) == 1
+
+
+def test_each_thread_has_its_own_connection(server, client):
+    client.ping()
+    thread = threading.Thread(target=client.networks)
+    thread.start()
+    thread.join()
+    assert len(server.accepted) == 2
+
+
+def test_retries_once_after_the_daemon_hangs_up(server, client):
+    client.ping()
+    server.hang_up()
+    assert len(client.networks()) == 5
+    assert len(server.accepted) == 2
+
+
+def test_error_status_raises_docker_error(client):
+    with pytest.raises(docker_api.DockerError, match=r'\(404\).*No such container'):
+        client.inspect_container('missing')
+
+
+def test_conflict_raises_docker_error(client):
+    body = {'Name': 'net0001', 'Driver': 'bridge'}
+    with pytest.raises(docker_api.DockerError, match=r'\(409\)'):
+        client.create_network(body)
+
+
+def test_network_ids(client):
+    assert client.network_ids() == sorted(n['Id'] for n in client.networks())
+
+
+def test_get_client_uses_the_api_when_the_socket_answers(server, fresh_client, monkeypatch):
+    monkeypatch.setenv('DOCKER_HOST', f'unix://{server.socket_path}')
+    assert isinstance(docker_api.get_client(), docker_api.DockerAPI)
+
+
+def test_get_client_falls_back_without_a_socket(tmp_path, fresh_client, monkeypatch):
+    monkeypatch.setenv('DOCKER_HOST', f"unix://{tmp_path / 'missing.sock'}")
+    assert isinstance(docker_api.get_client(), docker_api.DockerCLI)
+
+
+def test_get_client_falls_back_when_the_socket_is_not_http(tmp_path, fresh_client, monkeypatch):
+    path = str(tmp_path / 'garbage.sock')
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(path)
+    listener.listen(1)
+
+    def answer():
+        conn, _ = listener.accept()
+        conn.recv(4096)
+        conn.sendall(b'not http\r\n')
+        conn.close()
+
+    thread = threading.Thread(target=answer, daemon=True)
+    thread.start()
+    monkeypatch.setenv('DOCKER_HOST', f'unix://{path}')
+    try:
+        assert isinstance(docker_api.get_client(), docker_api.DockerCLI)
+    finally:
+        thread.join(5)
+        listener.close()
+        os.unlink(path)
+
+
+def test_cli_fallback_has_the_api_interface():
+    public = {name for name, _ in inspect.getmembers(docker_api.DockerAPI, inspect.isfunction)
+              if not name.startswith('_')} - {'request', 'ping'}
+    missing = {name for name in public if not hasattr(docker_api.DockerCLI, name)}
+    assert not missing
+
+
+def test_cli_create_container_translates_the_body(monkeypatch):
+    calls = []
+
+    def run(cmd, **kwargs):
+        calls.append(cmd)
+        return docker_api.subprocess.CompletedProcess(cmd, 0, 'abc123\n', '')
+
+    monkeypatch.setattr(docker_api.instrumentation, 'run', run)
+    created = docker_api.DockerCLI().create_container('lab-LEAF1-1', {
+        'Image': 'ceos:4.34.1F', 'Hostname': 'LEAF1', 'Env': ['CEOS=1'], 'Cmd': ['/sbin/init'],
+        'Labels': {'com.docker.compose.service': 'LEAF1'},
+        'HostConfig': {'Privileged': True, 'Memory': 1 << 30, 'NanoCpus': 1500000000,
+                       'Mounts': [{'Type': 'bind', 'Source': '/x', 'Target': '/y', 'ReadOnly': True}]},
+        'NetworkingConfig': {'EndpointsConfig': {'lab_mgmt': {'Aliases': ['LEAF1'],
+                                                              'IPAMConfig': {'IPv4Address': '10.0.0.5'}}}},
+    })
+    assert created['Id'] == 'abc123'
+    assert calls == [['docker', 'create', '--name', 'lab-LEAF1-1', '--hostname', 'LEAF1', '--env=CEOS=1',
+                      '--label=com.docker.compose.service=LEAF1', '--privileged',
+                      '--mount=type=bind,source=/x,target=/y,readonly', f'--memory={1 << 30}', '--cpus=1.5',
+                      '--network=lab_mgmt', '--network-alias=LEAF1', '--ip=10.0.0.5',
+                      'ceos:4.34.1F', '/sbin/init']]
+
+
+def test_connection_is_replaced_after_a_timeout(tmp_path):
+    inventory = Inventory(networks=5, containers=3, action_latency=0.5)
+    with CountingServer(str(tmp_path / 'docker.sock'), inventory) as server:
+        client = docker_api.DockerAPI(server.socket_path, timeout=0.1)
+        with pytest.raises(TimeoutError):
+            client.stop('ceos-lab_docker-DEV0001-1')
+        assert len(client.networks()) == 5
+        assert len(server.accepted) == 2
@@ -0,0 +1,147 @@
+import os
+
+import pytest
+import yaml
+
+import sharding
+from lab_utils import compose_project
+from topology import Topology
+
+
+def clusters():
+    """
+    Two full meshes of four devices (A1-A4, B1-B4) joined by one link, A1 <-> B1.
+    """
+    connections = []
+    for side in 'AB':
+        names = [f'{side}{i}' for i in range(1, 5)]
+        for i, a in enumerate(names):
+            for b in names[i + 1:]:
+                connections.append({'device1': a, 'intf1': f'Ethernet{b[1]}', 'device2': b, 'intf2': f'Ethernet{a[1]}'})
+    connections.append({'device1': 'A1', 'intf1': 'Ethernet9', 'device2': 'B1', 'intf2': 'Ethernet9'})
+    return Topology.compile({'connections': connections})
+
+
+def hosts(*capacities):
+    return [sharding.Host(f'lab{i}', c, f'10.1.0.{i}') for i, c in enumerate(capacities, 1)]
+
+
+def placed(assignment, host):
+    return sorted(d for d, h in assignment.items() if h == host)
+
+
+def test_parse_hosts_from_string_and_list():
+    parsed = sharding.parse_hosts('lab1:12:10.1.0.1,lab2:8')
+    assert [(h.name, h.capacity, h.address) for h in parsed] == [('lab1', 12, '10.1.0.1'), ('lab2', 8, None)]
+    assert sharding.parse_hosts([{'host': 'lab1', 'capacity': '4'}])[0].capacity == 4
+    with pytest.raises(ValueError, match='Duplicate'):
+        sharding.parse_hosts('lab1:4,lab1:4')
+    with pytest.raises(ValueError, match='Invalid capacity'):
+        sharding.parse_hosts('lab1:many')
+
+
+def test_partition_keeps_clusters_together():
+    topology = clusters()
+    assignment = sharding.partition(topology, hosts(4, 4))
+    assert {tuple(placed(assignment, 'lab1')), tuple(placed(assignment, 'lab2'))} == {
+        ('A1', 'A2', 'A3', 'A4'), ('B1', 'B2', 'B3', 'B4')}
+    assert [link.net_name for link in sharding.cut_links(topology, assignment)] == ['link13']
+
+
+def test_partition_balances_by_capacity_within_limits():
+    topology = clusters()
+    assignment = sharding.partition(topology, hosts(2, 6, 4))
+    loads = [len(placed(assignment, h)) for h in ('lab1', 'lab2', 'lab3')]
+    assert sum(loads) == 8
+    # Shares of 8 devices in proportion 2:6:4, rounded up and capped by capacity
+    assert loads[0] <= 2 and loads[1] <= 4 and loads[2] <= 3
+
+
+def test_partition_rejects_too_little_capacity():
+    with pytest.raises(ValueError, match='do not fit'):
+        sharding.partition(clusters(), hosts(3, 3))
+    with pytest.raises(ValueError, match='No shard hosts'):
+        sharding.partition(clusters(), [])
+
+
+def test_partition_is_deterministic():
+    topology = clusters()
+    assert sharding.partition(topology, hosts(5, 5)) == sharding.partition(topology, hosts(5, 5))
+
+
+def test_cut_links():
+    topology = clusters()
+    assignment = {d: 'lab1' for d in topology.devices}
+    assert sharding.cut_links(topology, assignment) == []
+    assignment['A4'] = 'lab2'
+    assert sorted(link.net_name for link in sharding.cut_links(topology, assignment)) == ['link03', 'link05', 'link06']
+
+
+def test_vni_is_base_plus_link_index():
+    topology = clusters()
+    assignment = {d: 'lab1' if d.startswith('A') else 'lab2' for d in topology.devices}
+    assignment['A4'] = 'lab2'
+    defs = sharding.tunnels(topology, assignment, hosts(4, 4), vni_base=5000)
+    assert [(t['link'], t['vni']) for t in defs] == [('link03', 5003), ('link05', 5005), ('link06', 5006),
+                                                      ('link13', 5013)]
+    assert defs[-1]['ends'] == {
+        'lab1': {'device': 'A1', 'interface': 'Ethernet9', 'bridge': 'vx-link13', 'local': '10.1.0.1', 'remote': '10.1.0.2'},
+        'lab2': {'device': 'B1', 'interface': 'Ethernet9', 'bridge': 'vx-link13', 'local': '10.1.0.2', 'remote': '10.1.0.1'},
+    }
+
+
+def compose_for(topology):
+    return {
+        'version': '2.4',
+        'services': {name: {'image': 'ceos:4.34.1F', 'networks': [link.net_name for link in device.links]}
+                     for name, device in topology.devices.items()},
+        'networks': {link.net_name: {'driver': 'bridge'} for link in topology.links},
+    }
+
+
+def test_write_shards(tmp_path):
+    topology = clusters()
+    topology.raw['vni_base'] = 10000
+    assignment = {d: 'lab1' if d.startswith('A') else 'lab2' for d in topology.devices}
+    outdir = str(tmp_path / 'shards')
+    sharding.write_shards(compose_for(topology), topology, assignment, hosts(4, 4), outdir=outdir, project='mylab')
+
+    with open(os.path.join(outdir, 'lab1', 'tunnels.sh')) as f:
+        assert f.read() == (
+            "#!/bin/sh\n"
+            "# vxlan tunnels for shard lab1 (generated by generate-lab.py)\n"
+            "# Run after `docker-compose up -d` on this host.\n"
+            "set -e\n"
+            "# link13: A1 Ethernet9\n"
+            "ip link del vx10013 2>/dev/null || true\n"
+            "ip link add vx10013 type vxlan id 10013 remote 10.1.0.2 local 10.1.0.1 dstport 4789 nolearning\n"
+            "ip link set vx10013 master vx-link13 up\n"
+        )
+    assert os.access(os.path.join(outdir, 'lab2', 'tunnels.sh'), os.X_OK)
+
+    with open(os.path.join(outdir, 'plan.yml')) as f:
+        plan = yaml.safe_load(f)
+    assert plan['project'] == 'mylab'
+    assert plan['hosts'] == {'lab1': ['A1', 'A2', 'A3', 'A4'], 'lab2': ['B1', 'B2', 'B3', 'B4']}
+    assert [(t['link'], t['vni']) for t in plan['tunnels']] == [('link13', 10013)]
+
+    with open(os.path.join(outdir, 'lab2', 'docker-compose.yml')) as f:
+        compose = yaml.safe_load(f)
+    assert sorted(compose['services']) == ['B1', 'B2', 'B3', 'B4']
+    assert compose['networks']['link13']['driver_opts'] == {'com.docker.network.bridge.name': 'vx-link13'}
+    assert 'link01' not in compose['networks']
+    with open(os.path.join(outdir, 'lab2', '.env')) as f:
+        assert f.read() == "COMPOSE_PROJECT_NAME=mylab\n"
+    # The shard directory is named after the host; start-lab and compose take the project from .env
+    assert compose_project(os.path.join(outdir, 'lab2')) == 'mylab'
+
+
+def test_write_shards_gretap_needs_addresses(tmp_path):
+    topology = clusters()
+    topology.raw['tunnel_type'] = 'gretap'
+    assignment = {d: 'lab1' if d.startswith('A') else 'lab2' for d in topology.devices}
+    with pytest.raises(ValueError, match='need an address'):
+        sharding.write_shards(compose_for(topology), topology, assignment,
+                              [sharding.Host('lab1', 4), sharding.Host('lab2', 4)], outdir=str(tmp_path))
+    script = sharding.render_tunnel_script('lab2', sharding.tunnels(topology, assignment, hosts(4, 4)), 'gretap')
+    assert "ip link add gt10013 type gretap remote 10.1.0.1 local 10.1.0.2 key 10013\n" in script
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+
+from subnet_allocator import parse_prefixlen, MAX_BRIDGE_PREFIXLEN
+
+
+DEFAULT_LINK_PREFIX = 24
+# bridge: one Docker bridge network per link; veth: a direct veth pair wired after start
+LINK_MODES = ('bridge', 'veth')
+
+
+class TopologyError(ValueError):
+    pass
+
+
+class Device:
+    __slots__ = ('name', 'interfaces', 'links', 'mgmt_address', 'limits')
+
+    def __init__(self, name):
+        self.name = name
+        self.interfaces = []   # in ethN order: bridge links first, then veth links
+        self.links = []
+        self.mgmt_address = None
+        self.limits = None       # compose resource keys (mem_limit, cpuset)
+
+
+class Interface:
+    __slots__ = ('device', 'name', 'eth', 'link')
+
+    def __init__(self, device, name, eth, link):
+        self.device = device
+        self.name = name
+        self.eth = eth
+        self.link = link
+
+
+class Link:
+    __slots__ = ('index', 'a', 'b', 'mode', 'prefixlen', 'subnet', 'net_name')
+
+    def __init__(self, index, mode, prefixlen):
+        self.index = index
+        self.a = None
+        self.b = None
+        self.mode = mode
+        self.prefixlen = prefixlen
+        self.subnet = None
+        self.net_name = f'link{index:02d}'
+
+    @property
+    def endpoints(self):
+        return (self.a, self.b)
+
+    def peer(self, device):
+        return self.b if self.a.device is device else self.a
+
+
+class Topology:
+    """
+    Compiled view of topology.yml, built in one linear pass.
+
+    Holds slotted Device/Interface/Link records plus the device -> links and
+    (device, interface) -> link indexes every generation stage reads from.
+    """
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.devices = {}
+        self.links = []
+        self.by_interface = {}
+
+    @classmethod
+    def compile(cls, raw):
+        if not isinstance(raw, dict):
+            raise TopologyError("Topology file is not a YAML dictionary")
+        connections = raw.get('connections')
+        if not isinstance(connections, list):
+            raise TopologyError("Missing or invalid 'connections' section")
+
+        topo = cls(raw)
+        default_prefix = raw.get('link_prefix', DEFAULT_LINK_PREFIX)
+        default_mode = raw.get('link_mode', 'bridge')
+        errors = []
+        for idx, conn in enumerate(connections, 1):
+            if not isinstance(conn, dict) or not all(k in conn for k in ('device1', 'intf1', 'device2', 'intf2')):
+                errors.append(f"Invalid connection entry: {conn}")
+                continue
+            try:
+                prefixlen = parse_prefixlen(conn.get('prefix', default_prefix))
+            except ValueError as e:
+                errors.append(f"{e}: {conn}")
+                continue
+            mode = conn.get('mode', default_mode)
+            if mode not in LINK_MODES:
+                errors.append(f"Unknown link mode '{mode}' (expected {' or '.join(LINK_MODES)}): {conn}")
+                continue
+            if mode == 'bridge' and prefixlen > MAX_BRIDGE_PREFIXLEN:
+                errors.append(f"/{prefixlen} is too small for a Docker bridge link (max /{MAX_BRIDGE_PREFIXLEN}): {conn}")
+                continue
+            link = Link(idx, mode, prefixlen)
+            ends = ((str(conn['device1']), str(conn['intf1'])), (str(conn['device2']), str(conn['intf2'])))
+            if ends[0] == ends[1]:
+                errors.append(f"Connection {idx} links {ends[0][1]} on {ends[0][0]} to itself")
+                continue
+            clash = [f"{intf} on {dev} is already used by connection {topo.by_interface[(dev, intf)].index}"
+                     for dev, intf in ends if (dev, intf) in topo.by_interface]
+            if clash:
+                errors.extend(f"Connection {idx}: {c}" for c in clash)
+                continue
+            for (dev_name, intf_name), slot in zip(ends, ('a', 'b')):
+                device = topo.devices.get(dev_name)
+                if device is None:
+                    device = topo.devices[dev_name] = Device(dev_name)
+                intf = Interface(device, intf_name, None, link)
+                device.interfaces.append(intf)
+                if not device.links or device.links[-1] is not link:
+                    device.links.append(link)
+                topo.by_interface[(dev_name, intf_name)] = link
+                setattr(link, slot, intf)
+            topo.links.append(link)
+        if errors:
+            raise TopologyError("\n   ".join(errors))
+        topo._number_interfaces()
+        return topo
+
+    def _number_interfaces(self):
+        # Docker attaches bridge networks as eth1..ethN in order, so bridge links
+        # take the first ethN slots and veth links the ones after them.
+        for device in self.devices.values():
+            ordered = [i for i in device.interfaces if i.link.mode == 'bridge']
+            ordered += [i for i in device.interfaces if i.link.mode != 'bridge']
+            for eth, intf in enumerate(ordered, 1):
+                intf.eth = eth
+            device.interfaces = ordered
+
+    def to_bridge(self, links):
+        """
+        Turn veth links into bridge links (e.g. links that cross hosts) and renumber interfaces.
+        """
+        changed = [link for link in links if link.mode != 'bridge']
+        for link in changed:
+            link.mode = 'bridge'
+            link.prefixlen = min(link.prefixlen, MAX_BRIDGE_PREFIXLEN)
+        if changed:
+            self._number_interfaces()
+        return changed
+
+    def clone(self):
+        """
+        A copy with its own Device/Interface/Link records, so subnets, network
+        names and addresses can differ between copies, without compiling again.
+        """
+        topo = Topology(self.raw)
+        links = {}
+        for old in self.links:
+            link = links[old.index] = Link(old.index, old.mode, old.prefixlen)
+            link.subnet, link.net_name = old.subnet, old.net_name
+            topo.links.append(link)
+        for old in self.devices.values():
+            device = topo.devices[old.name] = Device(old.name)
+            device.mgmt_address, device.limits = old.mgmt_address, old.limits
+            device.links = [links[link.index] for link in old.links]
+            for intf in old.interfaces:
+                link = links[intf.link.index]
+                new = Interface(device, intf.name, intf.eth, link)
+                device.interfaces.append(new)
+                setattr(link, 'a' if intf is intf.link.a else 'b', new)
+        topo.by_interface = {key: links[link.index] for key, link in self.by_interface.items()}
+        return topo
+
+    @property
+    def bridge_links(self):
+        return [link for link in self.links if link.mode == 'bridge']
+
+    @property
+    def veth_links(self):
+        return [link for link in self.links if link.mode == 'veth']
+
+    def links_of(self, device):
+        return self.devices[device].links
+
+    def link_at(self, device, interface):
+        return self.by_interface.get((device, interface))
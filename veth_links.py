@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+
+import subprocess
+
+import docker_api
+import instrumentation
+
+
+def netns_interfaces(pid):
+    """
+    Interface names inside a process's network namespace, from /proc/<pid>/net/dev.
+    """
+    try:
+        with open(f'/proc/{pid}/net/dev') as f:
+            return {line.split(':', 1)[0].strip() for line in f.readlines()[2:]}
+    except OSError:
+        return set()
+
+
+def container_pids(containers):
+    """
+    Map {device: container name} to {device: PID} for running containers only.
+    """
+    client = docker_api.get_client()
+    pids = {}
+    for device, container in containers.items():
+        try:
+            state = client.inspect_container(container).get('State', {})
+        except docker_api.DockerError:
+            continue
+        if state.get('Running') and state.get('Pid'):
+            pids[device] = state['Pid']
+    return pids
+
+
+def plan(topology, pids):
+    """
+    Return the veth links that can be wired now: both containers running and
+    neither end present yet. Links with only one end present are reported as
+    half-wired so they can be fixed by hand.
+    """
+    present = {device: netns_interfaces(pid) for device, pid in pids.items()}
+    todo, half = [], []
+    for link in topology.veth_links:
+        a, b = link.a, link.b
+        if a.device.name not in pids or b.device.name not in pids:
+            continue
+        have_a = f'eth{a.eth}' in present[a.device.name]
+        have_b = f'eth{b.eth}' in present[b.device.name]
+        if not have_a and not have_b:
+            todo.append(link)
+        elif have_a != have_b:
+            half.append(link)
+    return todo, half
+
+
+def wire(topology, containers, mtu=None):
+    """
+    Create a veth pair directly between the two containers' network namespaces
+    for every veth link, named after EosIntfMapping.json (ethN on both ends).
+    All pairs are created in one `ip -batch` call and brought up with one
+    `nsenter ... ip -batch` per container. Returns (wired, failed) link lists.
+    """
+    pids = container_pids(containers)
+    todo, half = plan(topology, pids)
+    if not todo:
+        return [], half
+
+    mtu_opt = f" mtu {mtu}" if mtu else ""
+    batch = "".join(
+        f"link add name eth{l.a.eth}{mtu_opt} netns {pids[l.a.device.name]} "
+        f"type veth peer name eth{l.b.eth}{mtu_opt} netns {pids[l.b.device.name]}\n"
+        for l in todo
+    )
+    instrumentation.run(['ip', '-force', '-batch', '-'], input=batch, text=True,
+                        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    up = {}
+    for l in todo:
+        for intf in l.endpoints:
+            up.setdefault(intf.device.name, []).append(f"link set dev eth{intf.eth} up\n")
+    for device, lines in up.items():
+        instrumentation.run(['nsenter', '-t', str(pids[device]), '-n', 'ip', '-force', '-batch', '-'],
+                            input="".join(lines), text=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    wired, failed = [], list(half)
+    for l in todo:
+        ok = all(f'eth{i.eth}' in netns_interfaces(pids[i.device.name]) for i in l.endpoints)
+        (wired if ok else failed).append(l)
+    return wired, failed